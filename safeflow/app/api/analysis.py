@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Response, UploadFile, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import os
+import uuid
+import orjson
+
+from app.db import database
+from app.schemas import analysis as analysis_schema, user as user_schema
+from app.crud import analysis as crud_analysis, camera as crud_camera
+from app.core.dependencies import get_current_active_user
+from app.core.config import settings
+from app.services import video_analysis
+router = APIRouter()
+
+UPLOAD_COPY_BYTES = 1024 * 1024
+RESULT_FIELDS = ("second", "samples", "person_count_max", "person_count_avg", "density_avg",
+                 "entry_count", "exit_count", "occupancy", "alert")
+
+def _job_view(job) -> analysis_schema.AnalysisJob:
+    view = analysis_schema.AnalysisJob.model_validate(job)
+    if job.status == "done":
+        view.progress = 1.0
+    elif job.total_frames:
+        view.progress = round(min(1.0, job.processed_frames / job.total_frames), 4)
+    elif job.chunks_total:
+        view.progress = round(job.chunks_done / job.chunks_total, 4)
+    if job.processing_fps and job.fps:
+        view.speed = round(job.processing_fps / job.fps, 1)
+    return view
+
+def _get_job_or_404(db: Session, job_id: int):
+    job = crud_analysis.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
+
+@router.post("/jobs", response_model=analysis_schema.AnalysisJob, status_code=status.HTTP_202_ACCEPTED)
+def create_analysis_job(
+    file: UploadFile = File(...),
+    camera_id: Optional[int] = Form(None, description="Apply this camera's mode, thresholds and tripwires"),
+    area_sq_meters: Optional[float] = Form(None, gt=0),
+    db: Session = Depends(database.get_db),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    # The upload is copied to disk in 1 MiB pieces and analysed from there; the request returns
+    # as soon as the job is queued. Poll GET /jobs/{id} for progress.
+    db_camera = None
+    if camera_id is not None:
+        db_camera = crud_camera.get_camera(db, camera_id)
+        if db_camera is None:
+            raise HTTPException(status_code=404, detail="Camera not found")
+    os.makedirs(settings.ANALYSIS_UPLOAD_DIR, exist_ok=True)
+    extension = os.path.splitext(file.filename or "")[1][:10]
+    path = os.path.join(settings.ANALYSIS_UPLOAD_DIR, f"{uuid.uuid4().hex}{extension}")
+    max_bytes = settings.ANALYSIS_MAX_UPLOAD_MB * 1024 * 1024
+    written = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                piece = file.file.read(UPLOAD_COPY_BYTES)
+                if not piece:
+                    break
+                written += len(piece)
+                if written > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File larger than {settings.ANALYSIS_MAX_UPLOAD_MB} MB")
+                out.write(piece)
+        video_analysis.probe(path) # Reject what OpenCV can't open before queueing it
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    job = crud_analysis.create_job(db, filename=file.filename or os.path.basename(path), path=path,
+                                   config=video_analysis.job_config(db_camera, area_sq_meters),
+                                   camera_id=camera_id, owner_id=current_user.id)
+    video_analysis.wake() # Only where the queue runs; elsewhere its next poll picks the job up
+    return _job_view(job)
+
+@router.get("/jobs", response_model=List[analysis_schema.AnalysisJob])
+def list_analysis_jobs(
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    job_status: Optional[str] = Query(None, alias="status"),
+    db: Session = Depends(database.get_read_db),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    return [_job_view(job) for job in crud_analysis.get_jobs(db, skip=skip, limit=limit, status=job_status)]
+
+@router.get("/jobs/{job_id}", response_model=analysis_schema.AnalysisJob)
+def read_analysis_job(
+    job_id: int,
+    db: Session = Depends(database.get_read_db),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    return _job_view(_get_job_or_404(db, job_id))
+
+@router.get("/jobs/{job_id}/results", response_model=List[analysis_schema.AnalysisResult])
+def read_analysis_results(
+    job_id: int,
+    start_second: int = Query(0, ge=0),
+    limit: int = Query(3600, ge=1, le=86400),
+    db: Session = Depends(database.get_read_db),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    # Per-second counts, available for the finished leading part of a running job too
+    _get_job_or_404(db, job_id)
+    rows = crud_analysis.get_results(db, job_id, start_second=start_second, limit=limit)
+    return Response(content=orjson.dumps([dict(zip(RESULT_FIELDS, row)) for row in rows]), media_type="application/json")
+
+@router.post("/jobs/{job_id}/cancel", response_model=analysis_schema.AnalysisJob)
+def cancel_analysis_job(
+    job_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    job = _get_job_or_404(db, job_id)
+    if job.owner_id not in (None, current_user.id) and current_user.role != user_schema.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not your analysis job")
+    was_queued = job.status == "queued"
+    if not crud_analysis.cancel_job(db, job_id):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    if was_queued: # Never picked up, so the queue won't remove the file
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+    db.refresh(job)
+    return _job_view(job)
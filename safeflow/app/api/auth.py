@@ -14,7 +14,7 @@ from app.core.dependencies import get_current_admin_user, get_current_active_use
 router = APIRouter()
 
 @router.post("/token", response_model=token_schema.Token)
-async def login_for_access_token(
+def login_for_access_token( # sync: bcrypt + DB run in the threadpool, not on the event loop
     db: Session = Depends(database.get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
@@ -53,7 +53,7 @@ async def read_users_me(current_user: user_schema.User = Depends(get_current_act
 def read_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_admin: user_schema.User = Depends(get_current_admin_user) # Admin only
 ):
     users = crud_user.get_users(db, skip=skip, limit=limit)
@@ -1,23 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Any
+import asyncio
+import datetime
+import orjson
 
 from app.db import database, models # Ensure 'models' is used if CameraMode enum is needed here
 from app.schemas import camera as camera_schema, user as user_schema
 from app.crud import camera as crud_camera
-from app.core.dependencies import get_current_admin_user, get_current_active_user
+from app.core.dependencies import get_current_admin_user, get_current_active_user, get_user_from_token
 from app.core.config import settings # Added in case settings.DEFAULT_CAMERA_ID is used in schema defaults
-from app.services import live_status_manager
+from app.services import live_status_manager, camera_worker, alert_engine, alert_dispatcher, alert_outbox, background_owner
+from app.services.status_hub import hub
 from app.schemas.camera import Camera
 router = APIRouter()
 @router.get("/live_statuses/", response_model=dict[int, Any]) # Define a proper response model if needed
 def get_all_statuses(current_user: user_schema.User = Depends(get_current_active_user)):
     return live_status_manager.get_all_live_statuses()
 
+@router.get("/live_metrics/", response_model=dict[int, Any])
+def get_all_rolling_metrics(current_user: user_schema.User = Depends(get_current_active_user)):
+    # { camera_id: { "10s": {"mean", "p95", "peak", "entries_per_minute", ...}, "60s": ..., ... } }
+    return live_status_manager.get_rolling_metrics()
+
+@router.get("/{camera_id}/live_metrics", response_model=dict[str, Any])
+def get_camera_rolling_metrics(camera_id: int, current_user: user_schema.User = Depends(get_current_active_user)):
+    metrics = live_status_manager.get_rolling_metrics(camera_id).get(camera_id)
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="No live metrics for this camera (unknown, inactive or not streaming)")
+    return metrics
+
+@router.get("/alerts/active", response_model=List[dict[str, Any]])
+def get_active_alerts(current_user: user_schema.User = Depends(get_current_active_user)):
+    # Open incidents (one per camera and alert type) known to the alert engine
+    return alert_engine.active_incidents()
+
+@router.get("/alerts/stats", response_model=dict[str, Any])
+def get_alert_stats(current_user: user_schema.User = Depends(get_current_admin_user)):
+    # Raw events vs. notifications sent (dedup/digest effect) and per-channel delivery counters
+    if not background_owner.is_owner(): # The counters live in the process running the engine and delivery
+        return {"engine": None, "dispatch": None, "outbox": None}
+    return {"engine": alert_engine.get_engine().stats(), "dispatch": alert_dispatcher.get_dispatcher().stats(),
+            "outbox": alert_outbox.start().stats()}
+
+@router.get("/alerts/delivery", response_model=dict[str, Any])
+def get_alert_delivery(
+    hours: float = Query(24, gt=0, le=24 * 90),
+    db: Session = Depends(database.get_read_db),
+    current_user: user_schema.User = Depends(get_current_admin_user)
+):
+    # Per channel: outbox rows by status and created-to-delivered latency over the last `hours`
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+    return alert_outbox.delivery_stats(db, since)
+
+# --- Live status push ---
+# Clients get one full snapshot, then only changed fields of changed cameras:
+#   {"type": "snapshot", "cameras": {id: status}}
+#   {"type": "delta", "cameras": {id: {changed fields}}, "removed": [ids]}
+#   {"type": "keepalive"}
+# The token is checked once per connection, so there is no per-update auth or DB work.
+
+def _status_message(message_type: str, cameras=None, removed=None) -> bytes:
+    message = {"type": message_type}
+    if cameras is not None:
+        message["cameras"] = cameras
+    if removed:
+        message["removed"] = removed
+    return orjson.dumps(message, default=dict, option=orjson.OPT_NON_STR_KEYS) # default: read-only snapshot mappings
+
+async def _status_messages(subscriber):
+    """Snapshot first, then coalesced deltas; keepalives while nothing changes."""
+    yield _status_message("snapshot", live_status_manager.get_all_live_statuses())
+    while True:
+        try:
+            cameras, removed = await asyncio.wait_for(subscriber.next_batch(), settings.STATUS_PUSH_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield _status_message("keepalive")
+            continue
+        yield _status_message("delta", cameras, removed)
+
+@router.websocket("/live_statuses/ws")
+async def live_statuses_ws(websocket: WebSocket, token: str = Query(...)):
+    try:
+        await run_in_threadpool(get_user_from_token, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = hub.subscribe() # Before the snapshot, so no change can fall in between
+    try:
+        async for message in _status_messages(subscriber):
+            # A client that can't take a message within the timeout is dropped; until then its
+            # updates keep merging in the subscriber instead of queueing up
+            await asyncio.wait_for(websocket.send_text(message.decode()), settings.STATUS_PUSH_SEND_TIMEOUT_SECONDS)
+    except (WebSocketDisconnect, asyncio.TimeoutError, RuntimeError):
+        pass
+    finally:
+        hub.unsubscribe(subscriber)
+
+@router.get("/live_statuses/events")
+async def live_statuses_sse(request: Request, token: str = Query(...)):
+    await run_in_threadpool(get_user_from_token, token)
+    subscriber = hub.subscribe()
+
+    async def event_stream():
+        try:
+            async for message in _status_messages(subscriber):
+                if await request.is_disconnected():
+                    break
+                yield b"data: " + message + b"\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.post("/", response_model=camera_schema.Camera, status_code=status.HTTP_201_CREATED)
 def create_camera_route(camera: camera_schema.CameraCreate, db: Session = Depends(database.get_db), current_user: user_schema.User = Depends(get_current_admin_user)): # Renamed to avoid conflict
     db_camera = crud_camera.create_camera(db=db, camera=camera)
     live_status_manager.update_camera_config(db_camera.id, db_camera) # Update manager
+    camera_worker.sync_worker(db_camera) # Active cameras are processed whether or not anyone watches
     return db_camera
 
 @router.put("/{camera_id}", response_model=camera_schema.Camera)
@@ -25,6 +129,7 @@ def update_camera_route(camera_id: int, camera_update: camera_schema.CameraUpdat
     db_camera = crud_camera.update_camera(db, camera_id=camera_id, camera_update=camera_update)
     if db_camera:
         live_status_manager.update_camera_config(db_camera.id, db_camera) # Update manager
+        camera_worker.sync_worker(db_camera) # Running stream picks up new thresholds/source; (de)activation starts/stops it
     return db_camera
 
 @router.delete("/{camera_id}", response_model=camera_schema.Camera)
@@ -32,6 +137,7 @@ def delete_camera_route(camera_id: int, db: Session = Depends(database.get_db),
     deleted_camera = crud_camera.delete_camera(db, camera_id=camera_id)
     if deleted_camera:
         live_status_manager.remove_camera_config(camera_id) # Remove from manager
+        camera_worker.stop_worker(camera_id)
     return deleted_camera
 @router.post("/", response_model=camera_schema.Camera, status_code=status.HTTP_201_CREATED)
 def create_camera(
@@ -46,7 +152,7 @@ def create_camera(
 def read_cameras(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: user_schema.User = Depends(get_current_active_user) # Any active user can see cameras
 ):
     cameras = crud_camera.get_cameras(db, skip=skip, limit=limit)
@@ -55,7 +161,7 @@ def read_cameras(
 @router.get("/{camera_id}", response_model=camera_schema.Camera)
 def read_camera(
     camera_id: int,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: user_schema.User = Depends(get_current_active_user)
 ):
     db_camera = crud_camera.get_camera(db, camera_id=camera_id)
@@ -82,16 +188,44 @@ def set_tripwire_for_camera(
     db: Session = Depends(database.get_db),
     current_user: user_schema.User = Depends(get_current_admin_user) # Or any user who can configure
 ):
+    # tripwire.camera_lines() skips malformed lines, so reject them here instead of never counting
+    for line in tripwire_coords.additional_lines or []:
+        if len(line) != 4:
+            raise HTTPException(status_code=400, detail="Each additional line needs exactly four integers [x1, y1, x2, y2]")
     camera_update_data = camera_schema.CameraUpdate(
         tripwire_line_x1=tripwire_coords.x1,
         tripwire_line_y1=tripwire_coords.y1,
         tripwire_line_x2=tripwire_coords.x2,
         tripwire_line_y2=tripwire_coords.y2,
+        tripwire_lines=tripwire_coords.additional_lines,
         mode=models.CameraMode.TRIPWIRE # Switch to tripwire mode when setting line
     )
     db_camera = crud_camera.update_camera(db, camera_id=camera_id, camera_update=camera_update_data)
     if db_camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
+    live_status_manager.update_camera_config(db_camera.id, db_camera)
+    camera_worker.reload_worker(db_camera.id)
+    return db_camera
+
+@router.post("/{camera_id}/set_roi", response_model=camera_schema.Camera)
+def set_roi_for_camera(
+    camera_id: int,
+    roi_setup: camera_schema.RoiSetup,
+    db: Session = Depends(database.get_db),
+    current_user: user_schema.User = Depends(get_current_admin_user)
+):
+    # Detection then runs on the regions' bounding rectangle only; counts and density are per region
+    for region in roi_setup.regions:
+        if len(region.points) < 3 or any(len(point) != 2 for point in region.points):
+            raise HTTPException(status_code=400, detail="Each region needs at least three [x, y] points")
+        if region.area_sq_meters is not None and region.area_sq_meters <= 0:
+            raise HTTPException(status_code=400, detail="area_sq_meters must be positive")
+    camera_update_data = camera_schema.CameraUpdate(roi_regions=roi_setup.regions or None)
+    db_camera = crud_camera.update_camera(db, camera_id=camera_id, camera_update=camera_update_data)
+    if db_camera is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    live_status_manager.update_camera_config(db_camera.id, db_camera)
+    camera_worker.reload_worker(db_camera.id)
     return db_camera
 
 @router.delete("/{camera_id}", response_model=camera_schema.Camera)
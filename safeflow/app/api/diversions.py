@@ -5,7 +5,7 @@ from pydantic import BaseModel
 import math
 import requests # For OSRM if you use it
 
-from app.db.database import get_db
+from app.db.database import get_read_db
 from app.schemas import user as user_schema # For auth
 # from app.schemas.diversion import DiversionSuggestionResponse # Define this Pydantic model
 from app.core.dependencies import get_current_active_user
@@ -33,9 +33,9 @@ class DiversionSuggestionResponse(BaseModel): # Example schema
 OSRM_ROUTE_URL = "http://router.project-osrm.org/route/v1/driving/" # Public demo server
 
 @router.post("/suggest_diversion/", response_model=DiversionSuggestionResponse)
-async def suggest_diversion_route(
+def suggest_diversion_route( # sync: the OSRM call uses blocking requests
     crowded_camera_id: int, # Pass as body or query param
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schema.User = Depends(get_current_active_user)
 ):
     all_statuses = live_status_manager.get_all_live_statuses()
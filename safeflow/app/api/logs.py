@@ -1,71 +1,127 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 import datetime
+import orjson
 
 from app.db import database
 from app.schemas import log as log_schema, user as user_schema
 from app.crud import log as crud_log
 from app.core.dependencies import get_current_active_user
 from app.db import models as db_models
+from app.services import log_writer, log_rollup, log_export
 router = APIRouter()
 
+PREDICTION_DEFAULT_DAYS = 30 # History window of /prediction_data when no start_date is given
+
+def log_rows_response(rows, headers: Optional[Dict[str, str]] = None) -> Response:
+    # Column tuples from crud_log (columns_only=True) straight to JSON bytes. Returning a Response
+    # skips FastAPI's per-row response_model validation; the response_model stays for the docs
+    # and the shape is the same as log_schema.DetectionLog.
+    fields = crud_log.LOG_FIELDS
+    return Response(content=orjson.dumps([dict(zip(fields, row)) for row in rows]),
+                    media_type="application/json", headers=headers)
+
 @router.get("/", response_model=List[log_schema.DetectionLog]) 
 def read_logs(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
     area_name: Optional[str] = Query(None),
     start_date: Optional[datetime.date] = Query(None),
     end_date: Optional[datetime.date] = Query(None),
     order_by: Optional[str] = Query(None), # If you added sorting
     order_dir: Optional[str] = Query("desc"), # If you added sorting
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: user_schema.User = Depends(get_current_active_user)
 ):
-    # Fetch logs using your CRUD function
-    if area_name or start_date or end_date or order_by:
-        # Assuming get_logs_filtered now accepts order_by and order_dir
-        db_logs_sqla = crud_log.get_logs_filtered(db, area_name=area_name, start_date=start_date, end_date=end_date, order_by=order_by, order_dir=order_dir, skip=skip, limit=limit)
+    # Keyset pagination for time-ordered pages: the next page's cursor is returned in X-Next-Cursor.
+    # skip (OFFSET) is still honoured for old clients and for ordering by other columns.
+    if cursor is not None and order_by not in (None, "timestamp"):
+        raise HTTPException(status_code=400, detail="cursor pagination is only supported when ordering by timestamp")
+    if cursor is not None and skip:
+        raise HTTPException(status_code=400, detail="cursor and skip cannot be combined; the cursor already marks the page start")
+    next_cursor = None
+    if skip == 0 and order_by in (None, "timestamp"):
+        try:
+            db_logs_sqla, next_cursor = crud_log.get_logs_page(db, area_name=area_name, start_date=start_date, end_date=end_date, order_dir=order_dir, cursor=cursor, limit=limit, columns_only=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif area_name or start_date or end_date or order_by:
+        db_logs_sqla = crud_log.get_logs_filtered(db, area_name=area_name, start_date=start_date, end_date=end_date, order_by=order_by, order_dir=order_dir, skip=skip, limit=limit, columns_only=True)
     else:
-        # Assuming get_logs now accepts order_by and order_dir
-        db_logs_sqla = crud_log.get_logs(db, order_by=order_by, order_dir=order_dir, skip=skip, limit=limit)
+        db_logs_sqla = crud_log.get_logs(db, skip=skip, limit=limit, columns_only=True) # get_logs takes no ordering arguments
 
-    print(f"--- API /logs: Fetched {len(db_logs_sqla)} SQLAlchemy log objects from CRUD ---")
-    problematic_logs_found = False
-    for index, log_sqla_obj in enumerate(db_logs_sqla):
-        if not isinstance(log_sqla_obj.camera_id, int) and log_sqla_obj.camera_id is not None: # Check for non-int but not None (unlikely)
-             print(f"!!! API /logs: Log at index {index} has camera_id of type {type(log_sqla_obj.camera_id)} value {log_sqla_obj.camera_id}")
-             problematic_logs_found = True
-        elif log_sqla_obj.camera_id is None:
-            print(f"!!! API /logs: Log at index {index} (ID: {log_sqla_obj.id}) has camera_id = None. Timestamp: {log_sqla_obj.timestamp}")
-            problematic_logs_found = True
-    
-    if problematic_logs_found:
-        print("!!! API /logs: Problematic logs (camera_id is None) found before Pydantic validation !!!")
-        # For extreme debugging, you could filter them out here, but this hides the root cause:
-        # db_logs_sqla = [log for log in db_logs_sqla if log.camera_id is not None]
-        # print(f"--- API /logs: After filtering, returning {len(db_logs_sqla)} logs ---")
+    return log_rows_response(db_logs_sqla, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
+@router.get("/aggregate", response_model=log_schema.LogAggregate)
+def get_log_aggregate(
+    area_name: Optional[str] = Query(None),
+    camera_id: Optional[int] = Query(None),
+    start_date: Optional[datetime.date] = Query(None),
+    end_date: Optional[datetime.date] = Query(None),
+    resolution: Optional[str] = Query(None, description="1m, 1h or 1d; picked from the range when omitted"),
+    max_points: int = Query(log_rollup.DEFAULT_MAX_POINTS, ge=1, le=10000),
+    db: Session = Depends(database.get_read_db),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    # Time-bucketed history from the pre-computed rollups; never scans detection_logs
+    return _rollup_aggregate(db, area_name, camera_id, start_date, end_date, resolution, max_points, default_days=1)
 
-    # FastAPI will now take db_logs_sqla and try to validate each against log_schema.DetectionLog
-    return db_logs_sqla
+def _rollup_aggregate(db: Session, area_name, camera_id, start_date, end_date, resolution, max_points,
+                      default_days: int) -> log_schema.LogAggregate:
+    end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min) if end_date \
+        else datetime.datetime.utcnow()
+    start = datetime.datetime.combine(start_date, datetime.time.min) if start_date else end - datetime.timedelta(days=default_days)
+    if resolution is None:
+        resolution = log_rollup.choose_resolution(start, end, max_points)
+    elif resolution not in log_rollup.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(log_rollup.RESOLUTIONS)}")
+    buckets = log_rollup.get_buckets(db, resolution, start, end, area_name=area_name, camera_id=camera_id)
+    return log_schema.LogAggregate(resolution=resolution, start=start, end=end, area_name=area_name,
+                                   camera_id=camera_id, buckets=buckets)
 
-# Example for prediction support API - serving aggregated data could go here
-# For now, just use the filtered logs.
-@router.get("/prediction_data", response_model=List[log_schema.DetectionLog])
-def get_prediction_input_data(
+@router.get("/export")
+def export_logs(
+    format: str = Query("ndjson", description="ndjson, csv, parquet or arrow (the last two need pyarrow)"),
     area_name: Optional[str] = Query(None),
+    camera_id: Optional[int] = Query(None),
     start_date: Optional[datetime.date] = Query(None),
     end_date: Optional[datetime.date] = Query(None),
-    db: Session = Depends(database.get_db),
     current_user: user_schema.User = Depends(get_current_active_user)
 ):
-    # This could be enhanced to return aggregated counts per hour/day etc.
-    logs = crud_log.get_logs_filtered(
-        db,
-        area_name=area_name,
-        start_date=start_date,
-        end_date=end_date,
-        limit=10000  # Get more data for prediction
+    # Streams the rows chunk by chunk from one DB cursor; nothing is built up in memory
+    if format not in log_export.CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(log_export.CONTENT_TYPES)}")
+    if format in ("parquet", "arrow") and not log_export.pyarrow_available():
+        raise HTTPException(status_code=400, detail=f"{format} export requires pyarrow to be installed")
+    start = datetime.datetime.combine(start_date, datetime.time.min) if start_date else None
+    end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min) if end_date else None
+    filename = f"detection_logs.{log_export.FILE_EXTENSIONS[format]}"
+    return StreamingResponse(
+        log_export.export_logs(format, area_name=area_name, camera_id=camera_id, start=start, end=end),
+        media_type=log_export.CONTENT_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    return logs
+
+@router.get("/writer_stats", response_model=Dict[str, Any])
+def get_log_writer_stats(current_user: user_schema.User = Depends(get_current_active_user)):
+    # Backpressure view of the detection log writer: queue depth, drops, batch sizes and flush time
+    return log_writer.get_writer().stats()
+
+@router.get("/prediction_data", response_model=log_schema.LogAggregate)
+def get_prediction_input_data(
+    area_name: Optional[str] = Query(None),
+    camera_id: Optional[int] = Query(None),
+    start_date: Optional[datetime.date] = Query(None),
+    end_date: Optional[datetime.date] = Query(None),
+    resolution: Optional[str] = Query(None, description="1m, 1h or 1d; picked from the range when omitted"),
+    max_points: int = Query(log_rollup.DEFAULT_MAX_POINTS, ge=1, le=10000),
+    db: Session = Depends(database.get_read_db),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    # Input series for prediction: counts per bucket over the whole range (the last
+    # PREDICTION_DEFAULT_DAYS by default) from the rollups, instead of up to 10,000 raw rows
+    return _rollup_aggregate(db, area_name, camera_id, start_date, end_date, resolution, max_points,
+                             default_days=PREDICTION_DEFAULT_DAYS)
@@ -1,133 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-import cv2
-import time
+from typing import Any, Dict
 import asyncio
-import numpy as np  # Needed for error frame generation
 
-from app.db import database, models
-from app.crud import camera as crud_camera, log as crud_log
-from app.schemas import camera as camera_schema, log as log_schema, alert as alert_schema, user as user_schema
-from app.services import video_processing, alert_service
-from app.core.dependencies import get_current_active_user
+from app.db import database
+from app.schemas import user as user_schema
+from app.crud import camera as crud_camera
 from app.core.config import settings
+from app.core.dependencies import get_current_admin_user, get_current_active_user, get_user_from_token
+from app.services import camera_worker, frame_publisher
 
 router = APIRouter()
 
-# In-memory store for last alert times per camera to avoid spamming
-last_alert_times = {}
-ALERT_COOLDOWN_SECONDS = 60  # Send alert at most once per minute per camera
+FRAME_WAIT_TIMEOUT = 1.0  # Re-check that the worker is still alive at least this often
 
-async def generate_frames(camera_id: int, db: Session):
-    db_camera = crud_camera.get_camera(db, camera_id)
-    if not db_camera:
-        print(f"Camera {camera_id} not found in DB for streaming.")
-        return
 
-    if not db_camera.is_active:
-        print(f"Camera {camera_id} is not active.")
-        return
+def _max_fps(fps: float) -> float:
+    rates = [rate for rate in (fps, settings.STREAM_MAX_FPS) if rate > 0]
+    return min(rates) if rates else 0.0
 
-    try:
-        cam_source = int(db_camera.source)
-    except ValueError:
-        print(f"Invalid camera source for {db_camera.name}: {db_camera.source}. Assuming it's an IP stream URL.")
-        cam_source = db_camera.source
-
-    cap = cv2.VideoCapture(cam_source)
-    if not cap.isOpened():
-        print(f"Error: Could not open video source for camera ID {camera_id} (source: {cam_source})")
-        error_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        cv2.putText(error_frame, f"Error: Cannot open camera {cam_source}", (50, 240),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        _, encoded_image = cv2.imencode('.jpg', error_frame)
-        frame_bytes = encoded_image.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        cap.release()
-        return
 
-    frame_count = 0
-    log_interval = 30
-
-    while True:
-        success, frame = cap.read()
-        if not success:
-            print(f"Failed to grab frame from camera ID {camera_id}")
-            if isinstance(cam_source, int):
-                cap.release()
-                await asyncio.sleep(1)
-                cap = cv2.VideoCapture(cam_source)
-                if not cap.isOpened():
-                    print(f"Failed to reopen camera ID {camera_id}. Stopping stream.")
-                    break
-                else:
-                    print(f"Reopened camera ID {camera_id}.")
-                    continue
-            else:
-                break
-
-        frame_count += 1
-
-        processed_frame, persons, density, entries, exits, alert, alert_msg, current_occupancy_live = \
-            video_processing.process_frame(frame.copy(), db_camera, db_camera_obj=db_camera)
-
-        if frame_count % log_interval == 0:
-            log_entry = log_schema.DetectionLogCreate(
-                camera_id=db_camera.id,
-                area_name=db_camera.area_name,
-                mode=db_camera.mode,
-                person_count=persons,
-                density=density,
-                entry_count=entries,
-                exit_count=exits
-            )
-            crud_log.create_log(db, log=log_entry)
-
-            if db_camera.mode == models.CameraMode.TRIPWIRE:
-                db.commit()
-
-        if alert:
-            current_time = time.time()
-            last_alert = last_alert_times.get(db_camera.id, 0)
-            if current_time - last_alert > ALERT_COOLDOWN_SECONDS:
-                alert_data = alert_schema.AlertData(
-                    camera_id=db_camera.id,
-                    camera_name=db_camera.name,
-                    area_name=db_camera.area_name,
-                    mode=db_camera.mode,
-                    message=alert_msg,
-                    current_value=persons if db_camera.mode == models.CameraMode.GENERAL else current_occupancy_live,
-                    threshold_value=db_camera.crowd_threshold if db_camera.mode == models.CameraMode.GENERAL else db_camera.occupancy_threshold
-                )
-                alert_service.trigger_alerts(alert_data)
-                last_alert_times[db_camera.id] = current_time
-
-        try:
-            _, encoded_image = cv2.imencode('.jpg', processed_frame)
-            frame_bytes = encoded_image.tobytes()
-        except Exception as e:
-            print(f"Error encoding frame: {e}")
-            continue
-
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
-        await asyncio.sleep(0.03)
-
-    cap.release()
-    print(f"Released video capture for camera ID {camera_id}")
+async def generate_frames(camera_id: int, variant: str = frame_publisher.DEFAULT_VARIANT,
+                          max_fps: float = 0.0, client: str = ""):
+    # Only awaits and byte shipping happen here; capture, inference, encoding and DB writes
+    # all run on the camera's worker thread, which never waits for this viewer. A slow viewer
+    # gets the newest frame each time it is ready; the ones in between are dropped and counted.
+    worker = camera_worker.get_worker(camera_id)
+    subscriber = worker.buffer.subscribe(variant, max_fps, client)
+    try:
+        async for part in worker.buffer.frames(subscriber, lambda: worker.stopped, timeout=FRAME_WAIT_TIMEOUT):
+            yield part
+    finally:
+        worker.buffer.unsubscribe(subscriber)
 
 
 @router.get("/video_feed/{camera_id}")
-async def video_feed(camera_id: int, db: Session = Depends(database.get_db)):
+def video_feed(
+    camera_id: int,
+    request: Request,
+    variant: str = Query(frame_publisher.DEFAULT_VARIANT, description="Resolution/quality variant, see STREAM_VARIANTS"),
+    fps: float = Query(0, ge=0, le=120, description="Frame rate cap for this viewer; 0 = camera rate"),
+    db: Session = Depends(database.get_read_db)
+):
+    # Sync endpoint: FastAPI runs the DB lookup in its threadpool instead of on the event loop
     # current_user: user_schema.User = Depends(get_current_active_user)
+    if variant not in frame_publisher.VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Unknown variant; available: {', '.join(frame_publisher.VARIANTS)}")
     db_camera = crud_camera.get_camera(db, camera_id)
     if not db_camera:
         raise HTTPException(status_code=404, detail="Camera not found")
     if not db_camera.is_active:
         raise HTTPException(status_code=400, detail="Camera is not active")
+    if frame_publisher.render_mode(db_camera) == frame_publisher.RENDER_HEADLESS:
+        raise HTTPException(status_code=409, detail="Camera is headless (no video); use the overlay channel")
 
-    return StreamingResponse(generate_frames(camera_id, db),
+    client = f"{request.client.host}:{request.client.port}" if request.client else ""
+    return StreamingResponse(generate_frames(camera_id, variant, _max_fps(fps), client),
                              media_type='multipart/x-mixed-replace; boundary=frame')
+
+
+def _get_streamable_camera(camera_id: int):
+    db = database.ReadSessionLocal()
+    try:
+        db_camera = crud_camera.get_camera(db, camera_id)
+        return db_camera if db_camera and db_camera.is_active else None
+    finally:
+        db.close()
+
+
+# --- Overlay side channel ---
+# Per frame, what the annotated stream would draw, for the client to draw on a canvas over a
+# "raw" stream (or on its own for "headless" cameras):
+#   {"seq", "width", "height", "mode", "boxes": [[x1, y1, x2, y2, track_id]], "tripwires": [[x1, y1, x2, y2]],
+#    "crossings": [[x1, y1, x2, y2, +1|-1]], "person_count", "density", "entries", "exits", "occupancy",
+#    "alert", "alert_message"}
+# Each message is serialized once per frame and shared by all overlay clients of the camera.
+@router.websocket("/overlay/{camera_id}/ws")
+async def overlay_ws(websocket: WebSocket, camera_id: int, token: str = Query(...), fps: float = Query(0, ge=0, le=120)):
+    try:
+        await run_in_threadpool(get_user_from_token, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if await run_in_threadpool(_get_streamable_camera, camera_id) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    worker = camera_worker.get_worker(camera_id)
+    client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else ""
+    subscriber = worker.buffer.subscribe(frame_publisher.OVERLAY, _max_fps(fps), client)
+    try:
+        async for message in worker.buffer.frames(subscriber, lambda: worker.stopped, timeout=FRAME_WAIT_TIMEOUT):
+            await asyncio.wait_for(websocket.send_bytes(message), settings.STATUS_PUSH_SEND_TIMEOUT_SECONDS)
+    except (WebSocketDisconnect, asyncio.TimeoutError, RuntimeError):
+        pass
+    finally:
+        worker.buffer.unsubscribe(subscriber)
+
+
+@router.get("/overlay/{camera_id}", response_model=Dict[str, Any])
+def get_overlay(camera_id: int, current_user: user_schema.User = Depends(get_current_active_user)):
+    # Latest overlay of a running camera (not JSON-serialized on the hot path: no overlay viewer needed)
+    worker = camera_worker.get_running_worker(camera_id)
+    if worker is None or worker.buffer.overlay is None:
+        raise HTTPException(status_code=404, detail="No overlay for this camera (unknown, inactive or not streaming)")
+    return {"seq": worker.buffer.seq, **worker.buffer.overlay}
+
+
+@router.get("/stats", response_model=Dict[int, Dict[str, Any]])
+def get_stream_stats(current_user: user_schema.User = Depends(get_current_admin_user)):
+    # Per camera: encodes per variant and per viewer sent/dropped/fps-capped frames, send time and frame age
+    return camera_worker.stream_stats()
@@ -23,7 +23,7 @@ def create_zone(
 def read_zones(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: user_schema.User = Depends(get_current_active_user)  # Any active user
 ):
     zones = crud_zone.get_zones(db, skip=skip, limit=limit)
@@ -33,7 +33,7 @@ def read_zones(
 @router.get("/{zone_id}", response_model=zone_schema.Zone)
 def read_zone(
     zone_id: int,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: user_schema.User = Depends(get_current_active_user)
 ):
     db_zone = crud_zone.get_zone(db, zone_id=zone_id)
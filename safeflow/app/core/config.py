@@ -9,6 +9,13 @@ class Settings(BaseSettings):
     PROJECT_VERSION: str = "1.0.0"
 
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./safeflow.db")
+    # SQLite connection tuning (applied as pragmas on every new connection)
+    DB_WRITER_POOL_SIZE: int = int(os.getenv("DB_WRITER_POOL_SIZE", 1))
+    DB_READER_POOL_SIZE: int = int(os.getenv("DB_READER_POOL_SIZE", 8))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+    DB_MMAP_SIZE_BYTES: int = int(os.getenv("DB_MMAP_SIZE_BYTES", 256 * 1024 * 1024))
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", 64 * 1024))
     
     SECRET_KEY: str = os.getenv("SECRET_KEY", "default_secret_key")
     ALGORITHM: str = "HS256"
@@ -20,14 +27,115 @@ class Settings(BaseSettings):
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD")
     ALERT_EMAIL_RECEIVER: str = os.getenv("ALERT_EMAIL_RECEIVER")
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
 
     # Telegram
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN")
     TELEGRAM_CHAT_ID: str = os.getenv("TELEGRAM_CHAT_ID")
+    TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+    # Alert dispatch (frame loops only enqueue; delivery, retries and rate limits run in the background)
+    ALERT_QUEUE_SIZE: int = int(os.getenv("ALERT_QUEUE_SIZE", 1000)) # Per channel; alerts beyond this are dropped and counted
+    ALERT_MAX_ATTEMPTS: int = int(os.getenv("ALERT_MAX_ATTEMPTS", 5))
+    ALERT_RETRY_BASE_SECONDS: float = float(os.getenv("ALERT_RETRY_BASE_SECONDS", 2)) # Doubles per attempt
+    ALERT_RETRY_MAX_SECONDS: float = float(os.getenv("ALERT_RETRY_MAX_SECONDS", 300))
+    ALERT_EMAIL_RATE_PER_MINUTE: float = float(os.getenv("ALERT_EMAIL_RATE_PER_MINUTE", 30)) # 0 = unlimited
+    ALERT_TELEGRAM_RATE_PER_MINUTE: float = float(os.getenv("ALERT_TELEGRAM_RATE_PER_MINUTE", 20))
+    ALERT_SMTP_CONNECTIONS: int = int(os.getenv("ALERT_SMTP_CONNECTIONS", 1)) # Persistent connections / parallel sends
+    ALERT_SMTP_IDLE_SECONDS: float = float(os.getenv("ALERT_SMTP_IDLE_SECONDS", 60)) # Reconnect after this long unused
+    ALERT_SEND_TIMEOUT_SECONDS: float = float(os.getenv("ALERT_SEND_TIMEOUT_SECONDS", 15))
+
+    # Alert engine: one notification per incident (camera + alert type), again on escalation or as a reminder
+    ALERT_DIGEST_WINDOW_SECONDS: float = float(os.getenv("ALERT_DIGEST_WINDOW_SECONDS", 5)) # Alerts due together go out as one digest
+    ALERT_DEDUP_SECONDS: float = float(os.getenv("ALERT_DEDUP_SECONDS", 600)) # Reminder interval for an ongoing incident
+    ALERT_RESOLVE_SECONDS: float = float(os.getenv("ALERT_RESOLVE_SECONDS", 120)) # Quiet this long = incident over
+    ALERT_CRITICAL_RATIO: float = float(os.getenv("ALERT_CRITICAL_RATIO", 1.5)) # Value >= threshold * ratio is critical
+
+    # Alert outbox: notifications are stored with the detection logs, then delivered and marked sent
+    ALERT_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("ALERT_OUTBOX_MAX_ATTEMPTS", 3)) # Deliveries (each with ALERT_MAX_ATTEMPTS sends) before a row fails
+    ALERT_OUTBOX_RETRY_SECONDS: float = float(os.getenv("ALERT_OUTBOX_RETRY_SECONDS", 30)) # Doubles per delivery attempt
+    # A row "sending" this long is claimed again. The delivery worker renews the lease of rows the
+    # dispatcher still holds every third of it, so this only bounds recovery after a crash; it need
+    # not cover ALERT_MAX_ATTEMPTS sends with backoff, rate limits and retry-after waits
+    ALERT_OUTBOX_LEASE_SECONDS: float = float(os.getenv("ALERT_OUTBOX_LEASE_SECONDS", 300))
+    ALERT_OUTBOX_RETENTION_DAYS: float = float(os.getenv("ALERT_OUTBOX_RETENTION_DAYS", 30)) # Sent/failed rows kept this long; 0 = forever
     
     # YOLO
     YOLO_MODEL_PATH: str = os.getenv("YOLO_MODEL_PATH", "yolov8n.pt")
 
+    # Batched multi-camera inference (general-mode cameras share one detector batch)
+    INFERENCE_BATCHING: bool = os.getenv("INFERENCE_BATCHING", "true").lower() == "true"
+    INFERENCE_MAX_BATCH_SIZE: int = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 8))
+    INFERENCE_MAX_WAIT_MS: float = float(os.getenv("INFERENCE_MAX_WAIT_MS", 10))
+
+    # Adaptive frame skipping (detector runs every N frames; N adapts to load vs. threshold)
+    INFERENCE_MIN_FRAME_INTERVAL: int = int(os.getenv("INFERENCE_MIN_FRAME_INTERVAL", 1))
+    INFERENCE_MAX_FRAME_INTERVAL: int = int(os.getenv("INFERENCE_MAX_FRAME_INTERVAL", 8))
+    INFERENCE_TARGET_FPS: float = float(os.getenv("INFERENCE_TARGET_FPS", 0)) # 0 = no per-camera cap
+    INFERENCE_MOTION_THRESHOLD: float = float(os.getenv("INFERENCE_MOTION_THRESHOLD", 12)) # Mean abs pixel diff; 0 disables
+
+    # Multi-process inference (0 = run pipelines on threads in the API process)
+    INFERENCE_WORKER_PROCESSES: int = int(os.getenv("INFERENCE_WORKER_PROCESSES", 0))
+    SHM_RING_SLOTS: int = int(os.getenv("SHM_RING_SLOTS", 4))
+    SHM_MAX_FRAME_BYTES: int = int(os.getenv("SHM_MAX_FRAME_BYTES", 1920 * 1080 * 3))
+    SHM_MAX_JPEG_BYTES: int = int(os.getenv("SHM_MAX_JPEG_BYTES", 2 * 1024 * 1024))
+
+    # Detection log writer (rows are queued and bulk-inserted every N rows or T ms)
+    LOG_WRITER_BATCH_SIZE: int = int(os.getenv("LOG_WRITER_BATCH_SIZE", 500))
+    LOG_WRITER_FLUSH_MS: float = float(os.getenv("LOG_WRITER_FLUSH_MS", 1000))
+    LOG_WRITER_MAX_QUEUE: int = int(os.getenv("LOG_WRITER_MAX_QUEUE", 10000)) # Rows beyond this are dropped and counted
+
+    # Detection log retention (0 = keep everything in detection_logs). Expired rows are moved to
+    # monthly archive files in LOG_ARCHIVE_DIR, or deleted when no archive directory is set.
+    LOG_RETENTION_DAYS: int = int(os.getenv("LOG_RETENTION_DAYS", 0))
+    LOG_ARCHIVE_DIR: str = os.getenv("LOG_ARCHIVE_DIR", "./log_archive")
+    LOG_ARCHIVE_RETENTION_MONTHS: int = int(os.getenv("LOG_ARCHIVE_RETENTION_MONTHS", 12)) # 0 = keep archives forever
+    LOG_RETENTION_CHECK_HOURS: float = float(os.getenv("LOG_RETENTION_CHECK_HOURS", 24))
+    # Expired rows are moved/deleted this many per transaction, and the single writer connection is
+    # released for LOG_RETENTION_SLICE_PAUSE_MS between slices so the log writer is never starved
+    LOG_RETENTION_SLICE_ROWS: int = int(os.getenv("LOG_RETENTION_SLICE_ROWS", 5000))
+    LOG_RETENTION_SLICE_PAUSE_MS: float = float(os.getenv("LOG_RETENTION_SLICE_PAUSE_MS", 50))
+    LOG_ROLLUP_MINUTE_RETENTION_DAYS: int = int(os.getenv("LOG_ROLLUP_MINUTE_RETENTION_DAYS", 14)) # 1-minute buckets only
+
+    # Live status push (WebSocket/SSE): deltas per client are merged for at least this long between pushes
+    STATUS_PUSH_MIN_INTERVAL_MS: float = float(os.getenv("STATUS_PUSH_MIN_INTERVAL_MS", 250))
+    STATUS_PUSH_KEEPALIVE_SECONDS: float = float(os.getenv("STATUS_PUSH_KEEPALIVE_SECONDS", 15))
+    STATUS_PUSH_SEND_TIMEOUT_SECONDS: float = float(os.getenv("STATUS_PUSH_SEND_TIMEOUT_SECONDS", 5))
+
+    # Live status sharing across API processes (e.g. uvicorn --workers N); empty = this process only.
+    # Also shares the latest frame of each camera, so processes that don't run it can stream it
+    LIVE_STATUS_SHM_NAME: str = os.getenv("LIVE_STATUS_SHM_NAME", "")
+    LIVE_STATUS_SHM_CAPACITY: int = int(os.getenv("LIVE_STATUS_SHM_CAPACITY", 256)) # Max cameras
+
+    # Camera workers and singleton jobs (alert engine and delivery, log retention and rollup backfill,
+    # video analysis) run in one API process: "auto" = whichever process holds BACKGROUND_LOCK_FILE
+    # (freed when the owner exits, taken by the next process to start), "true"/"false" = force it per process.
+    # The other processes serve the API and read live status and frames from the owner
+    RUN_BACKGROUND_SERVICES: str = os.getenv("RUN_BACKGROUND_SERVICES", "auto")
+    BACKGROUND_LOCK_FILE: str = os.getenv("BACKGROUND_LOCK_FILE", "./safeflow.background.lock")
+    # Every process re-reads the cameras table this often to follow edits made through another process
+    CAMERA_SYNC_SECONDS: float = float(os.getenv("CAMERA_SYNC_SECONDS", 2)) # 0 = only at startup
+
+    # Rolling live metrics (mean, p95, peak, entry/exit rates) per camera over these windows
+    LIVE_METRIC_WINDOWS_SECONDS: str = os.getenv("LIVE_METRIC_WINDOWS_SECONDS", "10,60,300")
+    # General-mode crowd threshold is checked against the mean person count over this window (0 = last frame only)
+    LIVE_THRESHOLD_WINDOW_SECONDS: int = int(os.getenv("LIVE_THRESHOLD_WINDOW_SECONDS", 10))
+
+    # MJPEG stream variants, name=max_width:jpeg_quality (width 0 = source resolution); picked with
+    # /video_feed/{id}?variant=name. Each frame is encoded once per variant that has viewers.
+    STREAM_VARIANTS: str = os.getenv("STREAM_VARIANTS", "full=0:90,medium=640:80,thumb=320:70")
+    STREAM_MAX_FPS: float = float(os.getenv("STREAM_MAX_FPS", 0)) # Per-viewer cap (also for ?fps= above it); 0 = camera rate
+
+    # Offline video analysis: an uploaded file is split into chunks that worker processes decode in parallel
+    ANALYSIS_UPLOAD_DIR: str = os.getenv("ANALYSIS_UPLOAD_DIR", "./uploaded_videos") # Files are deleted when their job ends
+    ANALYSIS_MAX_UPLOAD_MB: int = int(os.getenv("ANALYSIS_MAX_UPLOAD_MB", 2048))
+    ANALYSIS_WORKER_PROCESSES: int = int(os.getenv("ANALYSIS_WORKER_PROCESSES", max(1, (os.cpu_count() or 2) // 2)))
+    ANALYSIS_CHUNK_SECONDS: float = float(os.getenv("ANALYSIS_CHUNK_SECONDS", 30)) # Video time per chunk (unit of work and progress)
+    ANALYSIS_SAMPLE_FPS: float = float(os.getenv("ANALYSIS_SAMPLE_FPS", 5)) # Frames per video second run through detection; 0 = all
+    ANALYSIS_WARMUP_SECONDS: float = float(os.getenv("ANALYSIS_WARMUP_SECONDS", 2)) # Tracked, not counted, before each chunk
+    ANALYSIS_BATCH_SIZE: int = int(os.getenv("ANALYSIS_BATCH_SIZE", 8)) # Frames per detector call
+    ANALYSIS_JOB_LEASE_SECONDS: float = float(os.getenv("ANALYSIS_JOB_LEASE_SECONDS", 600)) # A "running" job not updated this long is picked up again
+
     DEFAULT_AREA_SQ_METERS: float = float(os.getenv("DEFAULT_AREA_SQ_METERS", 20.0))
     DEFAULT_CAMERA_ID: int = int(os.getenv("DEFAULT_CAMERA_ID", 0))
 
@@ -8,12 +8,12 @@ from app.db import models
 from app.schemas import token as token_schema
 from app.schemas import user as user_schema
 from app.crud import user as crud_user
-from app.db.database import get_db
+from app.db.database import get_read_db, ReadSessionLocal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token") # Path to your token endpoint
 
-async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+def get_current_user( # sync: the user lookup is a blocking DB query
+    db: Session = Depends(get_read_db), token: str = Depends(oauth2_scheme)
 ) -> user_schema.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -37,6 +37,18 @@ async def get_current_user(
     return user_schema.User.from_orm(user)
 
 
+def get_user_from_token(token: str) -> user_schema.User:
+    """For WebSocket/EventSource clients, which can't send an Authorization header: the token comes as a query parameter."""
+    db = ReadSessionLocal()
+    try:
+        user = get_current_user(db=db, token=token)
+    finally:
+        db.close()
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+
 async def get_current_active_user(
     current_user: user_schema.User = Depends(get_current_user),
 ) -> user_schema.User:
@@ -0,0 +1,39 @@
+import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.db import models
+
+def get_job(db: Session, job_id: int):
+    return db.query(models.AnalysisJob).filter(models.AnalysisJob.id == job_id).first()
+
+def get_jobs(db: Session, skip: int = 0, limit: int = 50, status: Optional[str] = None):
+    query = db.query(models.AnalysisJob)
+    if status:
+        query = query.filter(models.AnalysisJob.status == status)
+    return query.order_by(models.AnalysisJob.id.desc()).offset(skip).limit(limit).all()
+
+def create_job(db: Session, filename: str, path: str, config: Dict[str, Any],
+               camera_id: Optional[int] = None, owner_id: Optional[int] = None):
+    db_job = models.AnalysisJob(filename=filename, path=path, config=config, camera_id=camera_id,
+                                owner_id=owner_id, status="queued")
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def cancel_job(db: Session, job_id: int) -> bool:
+    # Only queued or running jobs; a running job stops at its next finished chunk
+    table = models.AnalysisJob
+    now = datetime.datetime.utcnow()
+    result = db.execute(update(table).where(table.id == job_id, table.status.in_(("queued", "running")))
+                        .values(status="cancelled", finished_at=now, updated_at=now))
+    db.commit()
+    return result.rowcount > 0
+
+def get_results(db: Session, job_id: int, start_second: int = 0, limit: int = 3600):
+    table = models.AnalysisResult
+    return (db.query(table.second, table.samples, table.person_count_max, table.person_count_avg, table.density_avg,
+                     table.entry_count, table.exit_count, table.occupancy, table.alert)
+            .filter(table.job_id == job_id, table.second >= start_second)
+            .order_by(table.second).limit(limit).all())
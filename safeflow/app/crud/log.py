@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, tuple_
+import base64
+import json
 from app.db import models
 from app.schemas import log as log_schema
 import datetime
 from sqlalchemy import asc # Add asc import
-from typing import Optional # Make sure Optional is imported
+from typing import Optional, List, Tuple # Make sure Optional is imported
 from pydantic import BaseModel # Import BaseModel from pydantic
 
 class DetectionLogBase(BaseModel):
@@ -29,11 +31,21 @@ def create_log(db: Session, log: log_schema.DetectionLogCreate):
     db.refresh(db_log)
     return db_log
 
-def get_logs(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.DetectionLog).order_by(desc(models.DetectionLog.timestamp)).offset(skip).limit(limit).all()
+# Plain column tuples for the read API: no ORM identity map or attribute instrumentation per row
+LOG_COLUMNS = (
+    models.DetectionLog.id, models.DetectionLog.timestamp, models.DetectionLog.camera_id,
+    models.DetectionLog.area_name, models.DetectionLog.mode, models.DetectionLog.person_count,
+    models.DetectionLog.density, models.DetectionLog.entry_count, models.DetectionLog.exit_count,
+)
+LOG_FIELDS = tuple(column.key for column in LOG_COLUMNS)
 
-def get_logs_filtered(db: Session, area_name: str = None, start_date: datetime.date = None, end_date: datetime.date = None, order_by: str = None, order_dir: str = "desc", skip: int = 0, limit: int = 100):
-    query = db.query(models.DetectionLog)
+def _log_query(db: Session, columns_only: bool):
+    return db.query(*LOG_COLUMNS) if columns_only else db.query(models.DetectionLog)
+
+def get_logs(db: Session, skip: int = 0, limit: int = 100, columns_only: bool = False):
+    return _log_query(db, columns_only).order_by(desc(models.DetectionLog.timestamp)).offset(skip).limit(limit).all()
+
+def _filter_logs(query, area_name: str = None, start_date: datetime.date = None, end_date: datetime.date = None):
     if area_name:
         query = query.filter(models.DetectionLog.area_name == area_name)
     if start_date:
@@ -41,6 +53,10 @@ def get_logs_filtered(db: Session, area_name: str = None, start_date: datetime.d
     if end_date:
         # Add 1 day to end_date to include the whole day
         query = query.filter(models.DetectionLog.timestamp < datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min))
+    return query
+
+def get_logs_filtered(db: Session, area_name: str = None, start_date: datetime.date = None, end_date: datetime.date = None, order_by: str = None, order_dir: str = "desc", skip: int = 0, limit: int = 100, columns_only: bool = False):
+    query = _filter_logs(_log_query(db, columns_only), area_name, start_date, end_date)
     if order_by and hasattr(models.DetectionLog, order_by):
         column_to_order = getattr(models.DetectionLog, order_by)
         if order_dir == "asc":
@@ -51,3 +67,36 @@ def get_logs_filtered(db: Session, area_name: str = None, start_date: datetime.d
             query = query.order_by(desc(models.DetectionLog.timestamp)) # Default sort
 
     return query.offset(skip).limit(limit).all()
+
+# --- Keyset pagination ---
+# The cursor is the (timestamp, id) of the last row of a page. Fetching the next page is an
+# index range seek from that position, so page 10,000 costs the same as page 1 (OFFSET has to
+# walk and discard every skipped row).
+
+def encode_cursor(timestamp: datetime.datetime, log_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), log_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, log_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(timestamp), int(log_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def get_logs_page(db: Session, area_name: str = None, start_date: datetime.date = None, end_date: datetime.date = None, order_dir: str = "desc", cursor: Optional[str] = None, limit: int = 100, columns_only: bool = False) -> Tuple[List[models.DetectionLog], Optional[str]]:
+    """One page ordered by (timestamp, id); returns (logs, next_cursor or None on the last page)."""
+    query = _filter_logs(_log_query(db, columns_only), area_name, start_date, end_date)
+    position = tuple_(models.DetectionLog.timestamp, models.DetectionLog.id)
+    if cursor:
+        cursor_key = tuple_(*decode_cursor(cursor))
+        query = query.filter(position > cursor_key if order_dir == "asc" else position < cursor_key)
+    if order_dir == "asc":
+        query = query.order_by(asc(models.DetectionLog.timestamp), asc(models.DetectionLog.id))
+    else:
+        query = query.order_by(desc(models.DetectionLog.timestamp), desc(models.DetectionLog.id))
+    logs = query.limit(limit + 1).all() # One extra row tells whether another page exists
+    next_cursor = encode_cursor(logs[limit - 1].timestamp, logs[limit - 1].id) if len(logs) > limit else None
+    return logs[:limit], next_cursor
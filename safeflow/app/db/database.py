@@ -1,19 +1,85 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False} # Needed for SQLite
-)
+def _apply_sqlite_pragmas(dbapi_connection, read_only: bool):
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL") # Persistent in the file; readers pick it up
+        cursor.execute("PRAGMA synchronous=NORMAL") # Durable at checkpoints; safe with WAL
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.DB_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.DB_MMAP_SIZE_BYTES)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.DB_CACHE_SIZE_KB)}") # Negative = KiB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+def create_engines(url: str):
+    """
+    Returns (writer_engine, reader_engine). SQLite allows one writer at a time, so writes go
+    through a small dedicated pool (one connection by default) and wait their turn in Python
+    instead of failing with "database is locked". Reads use a separate read-only pool; with
+    WAL they neither block nor are blocked by the writer. Other databases get one engine.
+    """
+    if not url.startswith("sqlite"):
+        shared = create_engine(url)
+        return shared, shared
+    writer = create_engine(
+        url, connect_args={"check_same_thread": False}, # Needed for SQLite
+        pool_size=settings.DB_WRITER_POOL_SIZE, max_overflow=0, pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    )
+    reader = create_engine(
+        url, connect_args={"check_same_thread": False},
+        pool_size=settings.DB_READER_POOL_SIZE, max_overflow=settings.DB_READER_POOL_SIZE,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    )
+    event.listen(writer, "connect", lambda dbapi_connection, record: _apply_sqlite_pragmas(dbapi_connection, read_only=False))
+    event.listen(reader, "connect", lambda dbapi_connection, record: _apply_sqlite_pragmas(dbapi_connection, read_only=True))
+    return writer, reader
+
+engine, read_engine = create_engines(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
+def ensure_columns(bind=None):
+    """Add nullable columns introduced after a table was created (create_all never alters existing tables)."""
+    bind = bind or engine
+    with bind.begin() as conn:
+        inspector = inspect(conn) # Same connection: the writer pool may hold only one
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    col_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+
+def ensure_indexes(bind=None):
+    """Create indexes added to existing tables (create_all only creates indexes with new tables)."""
+    bind = bind or engine
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    """Session on the read-only pool; use for endpoints that never write."""
+    db = ReadSessionLocal()
     try:
         yield db
     finally:
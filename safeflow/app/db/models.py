@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, Enum as SAEnum
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, JSON, Index, UniqueConstraint, Enum as SAEnum
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -13,6 +13,11 @@ class CameraMode(str, enum.Enum):
     GENERAL = "general"
     TRIPWIRE = "tripwire"
 
+class RenderMode(str, enum.Enum):
+    ANNOTATED = "annotated" # Boxes, ids, tripwires and counts drawn into the streamed frame
+    RAW = "raw" # Unannotated frame; overlay metadata is sent separately and drawn by the client
+    HEADLESS = "headless" # No frame at all (counting only); overlay metadata only
+
 class ZoneType(str, enum.Enum):
     OVERCROWDED = "overcrowded"
     LOCKDOWN = "lockdown"
@@ -44,6 +49,7 @@ class Camera(Base):
     last_density = Column(Float, nullable=True)
     last_status_update_time = Column(DateTime, nullable=True)
     is_over_threshold = Column(Boolean, default=False, nullable=True)
+    render_mode = Column(SAEnum(RenderMode), default=RenderMode.ANNOTATED, nullable=True) # NULL (older rows) = annotated
     
     # General Mode
     crowd_threshold = Column(Integer, default=10)
@@ -56,6 +62,8 @@ class Camera(Base):
     tripwire_line_y1 = Column(Integer, nullable=True)
     tripwire_line_x2 = Column(Integer, nullable=True)
     tripwire_line_y2 = Column(Integer, nullable=True)
+    tripwire_lines = Column(JSON, nullable=True) # Additional tripwires: [[x1, y1, x2, y2], ...]
+    roi_regions = Column(JSON, nullable=True) # Regions of interest: [{"name", "points": [[x, y], ...], "area_sq_meters"}, ...]
     
     is_active = Column(Boolean, default=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Optional: if cameras are user-specific
@@ -66,16 +74,144 @@ class Camera(Base):
 
 class DetectionLog(Base):
     __tablename__ = "detection_logs"
+    __table_args__ = (
+        # History queries filter on area or camera plus a time range and order by time
+        Index("ix_detection_logs_area_name_timestamp", "area_name", "timestamp"),
+        Index("ix_detection_logs_camera_id_timestamp", "camera_id", "timestamp"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False, index=True) # Unfiltered history and retention
     camera_id = Column(Integer, ForeignKey("cameras.id"), nullable=False) # ENSURE THIS IS nullable=False
-    area_name = Column(String, index=True, nullable=False)
+    area_name = Column(String, nullable=False) # Leading column of ix_detection_logs_area_name_timestamp
     mode = Column(SAEnum(CameraMode), nullable=False) # ENSURE THIS IS nullable=False
     person_count = Column(Integer, default=0, nullable=False)
     density = Column(Float, default=0.0, nullable=False)
     entry_count = Column(Integer, default=0, nullable=False)
     exit_count = Column(Integer, default=0, nullable=False)
     camera = relationship("Camera", back_populates="logs")
+
+
+class DetectionLogRollup(Base):
+    # Pre-aggregated detection logs per time bucket, maintained incrementally by the log writer.
+    # camera_id = 0 marks the area-level row that aggregates all cameras of area_name.
+    __tablename__ = "detection_log_rollups"
+    __table_args__ = (
+        UniqueConstraint("resolution", "area_name", "camera_id", "bucket_start", name="uq_detection_log_rollups_bucket"),
+        Index("ix_detection_log_rollups_camera_bucket", "resolution", "camera_id", "bucket_start"),
+    )
+    id = Column(Integer, primary_key=True)
+    resolution = Column(String, nullable=False) # "1m", "1h" or "1d"
+    bucket_start = Column(DateTime, nullable=False)
+    area_name = Column(String, nullable=False)
+    camera_id = Column(Integer, nullable=False, default=0)
+    samples = Column(Integer, nullable=False, default=0)
+    person_count_min = Column(Integer, nullable=False, default=0)
+    person_count_max = Column(Integer, nullable=False, default=0)
+    person_count_sum = Column(Integer, nullable=False, default=0)
+    density_sum = Column(Float, nullable=False, default=0.0)
+    entry_count_sum = Column(Integer, nullable=False, default=0)
+    exit_count_sum = Column(Integer, nullable=False, default=0)
+
+class RollupBackfill(Base):
+    # Progress of folding the raw logs that predate the rollups into them (a single row), so an
+    # interrupted backfill resumes where it stopped instead of being skipped or double counted
+    __tablename__ = "rollup_backfill"
+    id = Column(Integer, primary_key=True)
+    up_to_id = Column(Integer, nullable=False) # Raw logs above this id are rolled up by the log writer
+    last_id = Column(Integer, nullable=False, default=0) # Backfilled through this id
+
+class AlertState(Base):
+    # One open incident per (camera, alert type), kept by the alert engine so dedup and
+    # escalation survive restarts and are shared by every process using this database
+    __tablename__ = "alert_states"
+    __table_args__ = (
+        UniqueConstraint("camera_id", "alert_type", name="uq_alert_states_camera_type"),
+    )
+    id = Column(Integer, primary_key=True)
+    camera_id = Column(Integer, nullable=False)
+    alert_type = Column(String, nullable=False) # "crowd" or "occupancy"
+    camera_name = Column(String, nullable=False)
+    area_name = Column(String, nullable=False)
+    severity = Column(Integer, nullable=False, default=1) # Current: 1 warning, 2 critical
+    notified_severity = Column(Integer, nullable=False, default=0) # Highest severity already notified
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+    last_notified = Column(DateTime, nullable=True)
+    occurrences = Column(Integer, nullable=False, default=0) # Raw threshold events in this incident
+    suppressed = Column(Integer, nullable=False, default=0) # Raw events not notified since last_notified
+    peak_value = Column(Float, nullable=False, default=0.0)
+    current_value = Column(Float, nullable=False, default=0.0)
+    threshold_value = Column(Float, nullable=False, default=0.0)
+    message = Column(String, nullable=True)
+
+class AlertOutbox(Base):
+    # Alert messages per channel, written in the same transaction as the alert state (and the
+    # detection logs of that flush) and delivered from here, so a crash can't lose or forget them
+    __tablename__ = "alert_outbox"
+    __table_args__ = (
+        Index("ix_alert_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    id = Column(Integer, primary_key=True)
+    dedup_key = Column(String, nullable=False, unique=True) # "<notification id>:<channel>"; re-writes are no-ops
+    channel = Column(String, nullable=False) # "email" or "telegram"
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending") # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0) # Delivery claims
+    created_at = Column(DateTime, nullable=False, index=True)
+    next_attempt_at = Column(DateTime, nullable=False)
+    claimed_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+class AnalysisJob(Base):
+    # Offline analysis of an uploaded video file, queued and processed by app.services.video_analysis
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        Index("ix_analysis_jobs_status_id", "status", "id"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, nullable=False) # As uploaded
+    path = Column(String, nullable=False) # Stored copy, removed when the job ends
+    status = Column(String, nullable=False, default="queued") # queued, running, done, failed, cancelled
+    camera_id = Column(Integer, nullable=True) # Camera whose mode, thresholds and tripwires are applied
+    config = Column(JSON, nullable=False) # Pipeline settings captured at upload
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    fps = Column(Float, nullable=True) # Source frame rate
+    total_frames = Column(Integer, nullable=True)
+    processed_frames = Column(Integer, nullable=False, default=0) # Source frames decoded (sampled or skipped)
+    chunks_total = Column(Integer, nullable=False, default=0)
+    chunks_done = Column(Integer, nullable=False, default=0)
+    processing_fps = Column(Float, nullable=True) # Source frames per wall-clock second
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(String, nullable=True)
+    max_persons = Column(Integer, nullable=True)
+    avg_density = Column(Float, nullable=True)
+    total_entries = Column(Integer, nullable=True)
+    total_exits = Column(Integer, nullable=True)
+    final_occupancy = Column(Integer, nullable=True)
+
+class AnalysisResult(Base):
+    # Per-second counts of an analysis job (second = offset into the video)
+    __tablename__ = "analysis_results"
+    __table_args__ = (
+        UniqueConstraint("job_id", "second", name="uq_analysis_results_job_second"),
+    )
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("analysis_jobs.id", ondelete="CASCADE"), nullable=False)
+    second = Column(Integer, nullable=False)
+    samples = Column(Integer, nullable=False, default=0) # Frames analysed in this second
+    person_count_max = Column(Integer, nullable=False, default=0)
+    person_count_avg = Column(Float, nullable=False, default=0.0)
+    density_avg = Column(Float, nullable=False, default=0.0)
+    entry_count = Column(Integer, nullable=False, default=0)
+    exit_count = Column(Integer, nullable=False, default=0)
+    occupancy = Column(Integer, nullable=False, default=0) # Net entries since the start of the video, at the end of this second
+    alert = Column(Boolean, nullable=False, default=False) # The camera's threshold was exceeded in this second
+
 class Zone(Base):
     __tablename__ = "zones"
     id = Column(Integer, primary_key=True, index=True)
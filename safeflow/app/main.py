@@ -5,13 +5,13 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from pathlib import Path
 from sqlalchemy.orm import Session
 
-from app.db.database import engine, Base, get_db, SessionLocal
-from app.api import auth, cameras, logs, zones, stream
+from app.db.database import engine, Base, SessionLocal, ReadSessionLocal, ensure_columns, ensure_indexes
+from app.api import auth, cameras, logs, zones, stream, analysis
 from app.core.config import settings
 from app.core.dependencies import get_current_user, get_current_admin_user, get_current_active_user
 from app.schemas import user as user_schema
 from app.crud import user as crud_user
-from app.services import live_status_manager
+from app.services import live_status_manager, camera_worker, inference_engine, process_pool, log_writer, log_retention, log_rollup, alert_dispatcher, alert_engine, alert_outbox, video_analysis, background_owner
 from app.crud import camera as crud_camera # for fetching all cameras
 from app.api import diversions # Add this
 
@@ -33,6 +33,7 @@ app.include_router(logs.router, prefix="/api/logs", tags=["Detection Logs"])
 app.include_router(zones.router, prefix="/api/zones", tags=["Zones"])
 app.include_router(stream.router, prefix="/api/stream", tags=["Video Stream & Processing"])
 app.include_router(diversions.router, prefix="/api/diversions", tags=["Diversions"])
+app.include_router(analysis.router, prefix="/api/analysis", tags=["Video File Analysis"])
 # --- Startup Hook ---
 @app.on_event("startup")
 async def on_startup():
@@ -47,6 +48,8 @@ async def on_startup():
     print("SafeFlow Application Started")
 def create_db_and_tables():
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
     db = SessionLocal()
     try:
         admin_user = crud_user.get_user_by_email(db, email="admin@example.com")
@@ -64,10 +67,30 @@ def create_db_and_tables():
 @app.on_event("startup")
 async def on_startup():
     create_db_and_tables()
+    if background_owner.is_owner(): # One process of a multi-worker deployment, see RUN_BACKGROUND_SERVICES
+        log_rollup.start_backfill() # Before any worker writes logs
+        log_retention.start()
+        alert_outbox.start() # Delivers notifications left undelivered by a previous run
+        video_analysis.start() # Picks up queued jobs (and ones a previous run left unfinished)
+    camera_worker.start_sync() # Owner: active cameras detect, log and alert without a viewer; all: follow camera edits
     print("SafeFlow Application Started")
     print("Default Admin: admin@example.com / adminpassword (if created)")
     print("Access at http://localhost:8000")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    camera_worker.stop_all_workers()
+    inference_engine.shutdown()
+    process_pool.shutdown()
+    video_analysis.shutdown() # An unfinished job is resumed from scratch after its lease
+    alert_engine.shutdown() # Last evaluation of pending alert events, handed to the log writer
+    log_writer.shutdown() # After the workers and the engine, so their last queued rows are flushed
+    alert_outbox.shutdown() # Stop claiming; rows still in flight are reclaimed after their lease
+    alert_dispatcher.shutdown() # Delivers what was already queued (bounded wait)
+    log_retention.shutdown()
+    live_status_manager.shutdown()
+    background_owner.release()
+
 # --- HTML Pages ---
 @app.get("/", response_class=HTMLResponse, name="root")
 async def serve_login_page(request: Request):
@@ -93,12 +116,12 @@ async def dashboard_page(request: Request):
     })
 
 @app.get("/tripwire-setup/{camera_id}", response_class=HTMLResponse, name="tripwire_setup")
-async def tripwire_setup_page(
+def tripwire_setup_page(
     request: Request,
     camera_id: int,
     current_user: user_schema.User = Depends(get_current_admin_user)
 ):
-    db: Session = next(get_db())
+    db: Session = ReadSessionLocal()
     try:
         camera = cameras.read_camera(camera_id=camera_id, db=db, current_user=current_user)
     finally:
@@ -0,0 +1,45 @@
+from pydantic import BaseModel
+import datetime
+from typing import Optional
+
+
+class AnalysisJob(BaseModel):
+    id: int
+    filename: str
+    status: str # queued, running, done, failed, cancelled
+    camera_id: Optional[int] = None
+    fps: Optional[float] = None
+    total_frames: Optional[int] = None
+    processed_frames: int = 0
+    chunks_total: int = 0
+    chunks_done: int = 0
+    progress: float = 0.0 # 0..1
+    processing_fps: Optional[float] = None # Source frames per second of wall-clock time
+    speed: Optional[float] = None # Multiple of real time
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+    error: Optional[str] = None
+    max_persons: Optional[int] = None
+    avg_density: Optional[float] = None
+    total_entries: Optional[int] = None
+    total_exits: Optional[int] = None
+    final_occupancy: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AnalysisResult(BaseModel):
+    second: int # Offset into the video
+    samples: int
+    person_count_max: int
+    person_count_avg: float
+    density_avg: float
+    entry_count: int
+    exit_count: int
+    occupancy: int
+    alert: bool
+
+    class Config:
+        from_attributes = True
@@ -1,8 +1,13 @@
 from pydantic import BaseModel
-from typing import Optional
-from app.db.models import CameraMode
+from typing import Optional, List
+from app.db.models import CameraMode, RenderMode
 from app.core.config import settings  # Assuming you're using settings.DEFAULT_CAMERA_ID
 import datetime
+class RoiRegion(BaseModel):
+    name: Optional[str] = None
+    points: List[List[int]] # Polygon in frame pixels, at least three [x, y] points
+    area_sq_meters: Optional[float] = None # Ground area covered, for the region's density
+
 class CameraBase(BaseModel):
     name: str
     area_name: str
@@ -17,6 +22,7 @@ class CameraBase(BaseModel):
     last_density: Optional[float] = None
     last_status_update_time: Optional[datetime.datetime] = None
     is_over_threshold: Optional[bool] = False
+    render_mode: Optional[RenderMode] = RenderMode.ANNOTATED
 
 class CameraCreate(CameraBase):
     source: Optional[str] = f"{settings.DEFAULT_CAMERA_ID}"  # Default to webcam 0
@@ -33,10 +39,13 @@ class CameraUpdate(CameraBase):
     last_density: Optional[float] = None
     last_status_update_time: Optional[datetime.datetime] = None
     is_over_threshold: Optional[bool] = False
+    render_mode: Optional[RenderMode] = None
     tripwire_line_x1: Optional[int] = None
     tripwire_line_y1: Optional[int] = None
     tripwire_line_x2: Optional[int] = None
     tripwire_line_y2: Optional[int] = None
+    tripwire_lines: Optional[List[List[int]]] = None
+    roi_regions: Optional[List[RoiRegion]] = None
 
 class Camera(CameraBase):
     id: int
@@ -46,6 +55,8 @@ class Camera(CameraBase):
     tripwire_line_y1: Optional[int]
     tripwire_line_x2: Optional[int]
     tripwire_line_y2: Optional[int]
+    tripwire_lines: Optional[List[List[int]]] = None
+    roi_regions: Optional[List[RoiRegion]] = None
 
     class Config:
         from_attributes = True
@@ -55,3 +66,7 @@ class TripwireSetup(BaseModel):
     y1: int
     x2: int
     y2: int
+    additional_lines: Optional[List[List[int]]] = None # Extra tripwires as [x1, y1, x2, y2]
+
+class RoiSetup(BaseModel):
+    regions: List[RoiRegion] # Empty list = whole frame again
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 import datetime
 from app.db.models import CameraMode
-from typing import Optional
+from typing import Optional, List
 
 
 class DetectionLogBase(BaseModel):
@@ -23,4 +23,24 @@ class DetectionLog(DetectionLogBase):
     timestamp: datetime.datetime
 
     class Config:
-        from_attributes = True 
+        from_attributes = True
+
+
+class LogBucket(BaseModel):
+    bucket_start: datetime.datetime
+    samples: int
+    person_count_min: int
+    person_count_max: int
+    person_count_avg: float
+    density_avg: float
+    entry_count: int
+    exit_count: int
+
+
+class LogAggregate(BaseModel):
+    resolution: str # "1m", "1h" or "1d"
+    start: datetime.datetime
+    end: datetime.datetime
+    area_name: Optional[str] = None
+    camera_id: Optional[int] = None
+    buckets: List[LogBucket]
@@ -0,0 +1,397 @@
+# app/services/alert_dispatcher.py
+import asyncio
+import http.client
+import json
+import queue
+import random
+import smtplib
+import threading
+import time
+import logging
+from email.mime.text import MIMEText
+from typing import Dict, Any, Callable, List, Optional
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RetryAfter(Exception):
+    """The channel asked us to back off for `delay` seconds (e.g. Telegram 429)."""
+
+    def __init__(self, delay: float, message: str = ""):
+        super().__init__(message or f"Retry after {delay} s")
+        self.delay = delay
+
+
+class PermanentError(Exception):
+    """Retrying will not help (bad credentials, unknown chat, ...)."""
+
+
+class TokenBucket:
+    """Per-channel rate limit: `rate_per_minute` sends, bursts of up to `burst`."""
+
+    def __init__(self, rate_per_minute: float, burst: int = 5):
+        self.rate = max(rate_per_minute, 0.0) / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return # Unlimited
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class EmailChannel:
+    """
+    SMTP delivery over a small pool of persistent connections: STARTTLS and login happen once
+    per connection, not per email. A pooled connection is checked with NOOP before reuse and
+    replaced when the server dropped it or it sat idle longer than `idle_seconds`.
+    """
+
+    name = "email"
+
+    def __init__(self, host: Optional[str], port: int, username: Optional[str], password: Optional[str],
+                 receiver: Optional[str], starttls: bool = True, timeout: float = 15.0, idle_seconds: float = 60.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.receiver = receiver
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._pool: "queue.LifoQueue" = queue.LifoQueue() # (smtp, last_used)
+        self.connections_opened = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.host and self.receiver)
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connections_opened += 1
+        return smtp
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                smtp, last_used = self._pool.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used > self.idle_seconds:
+                self._quit(smtp)
+                continue
+            try:
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._quit(smtp)
+
+    @staticmethod
+    def _quit(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def send_blocking(self, subject: str, body: str):
+        msg = MIMEText(body)
+        msg['Subject'] = subject
+        msg['From'] = self.username or f"safeflow@{self.host}"
+        msg['To'] = self.receiver
+        smtp = self._checkout()
+        try:
+            smtp.sendmail(msg['From'], [self.receiver], msg.as_string())
+        except smtplib.SMTPAuthenticationError as e:
+            self._quit(smtp)
+            raise PermanentError(str(e))
+        except smtplib.SMTPResponseException as e:
+            self._quit(smtp)
+            if 500 <= e.smtp_code < 600:
+                raise PermanentError(f"SMTP {e.smtp_code}: {e.smtp_error!r}")
+            raise
+        except Exception:
+            smtp.close() # Connection state unknown; don't return it to the pool
+            raise
+        self._pool.put((smtp, time.monotonic()))
+
+    async def send(self, subject: str, body: str):
+        await asyncio.to_thread(self.send_blocking, subject, body)
+
+    def close(self):
+        while True:
+            try:
+                smtp, _ = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(smtp)
+
+
+class TelegramChannel:
+    """
+    Telegram Bot API sendMessage over one persistent HTTP(S) connection per worker.
+    `api_url` can point at a local stand-in for testing.
+    """
+
+    name = "telegram"
+
+    def __init__(self, token: Optional[str], chat_id: Optional[str], api_url: str = "https://api.telegram.org", timeout: float = 15.0):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self._connections: "queue.LifoQueue" = queue.LifoQueue()
+        self.connections_opened = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token and self.chat_id)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        parts = urlsplit(self.api_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.connections_opened += 1
+        return connection_class(parts.netloc, timeout=self.timeout)
+
+    def send_blocking(self, subject: str, body: str):
+        try:
+            connection = self._connections.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        path = f"{urlsplit(self.api_url).path}/bot{self.token}/sendMessage"
+        payload = json.dumps({"chat_id": self.chat_id, "text": body}).encode()
+        try:
+            connection.request("POST", path, body=payload, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close() # Dropped keep-alive connection; the retry opens a new one
+            raise
+        self._connections.put(connection)
+        if response.status == 200:
+            return
+        try:
+            description = json.loads(data)
+        except ValueError:
+            description = {}
+        if response.status == 429:
+            raise RetryAfter(float(description.get("parameters", {}).get("retry_after", 5)), "Telegram rate limit")
+        if 400 <= response.status < 500:
+            raise PermanentError(f"Telegram {response.status}: {description.get('description', data[:200])}")
+        raise ConnectionError(f"Telegram {response.status}")
+
+    async def send(self, subject: str, body: str):
+        await asyncio.to_thread(self.send_blocking, subject, body)
+
+    def close(self):
+        while True:
+            try:
+                self._connections.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class AlertDispatcher:
+    """
+    Delivers alerts off the frame loop. submit() is thread-safe and only enqueues; a background
+    thread runs an event loop with one bounded queue and `workers` tasks per channel. Failed
+    sends are retried with exponential backoff and jitter (honouring the channel's retry-after)
+    up to `max_attempts`; each channel is rate-limited by a token bucket. When a channel's queue
+    is full, new alerts for it are dropped and counted. An optional `on_result(ok, error, retryable)`
+    callback reports the outcome of each send (the outbox uses it to mark rows delivered).
+    """
+
+    def __init__(self, channels: List[Any], max_queue: int = 1000, max_attempts: int = 5,
+                 retry_base_seconds: float = 2.0, retry_max_seconds: float = 300.0,
+                 rates_per_minute: Optional[Dict[str, float]] = None, workers: Optional[Dict[str, int]] = None):
+        self.channels = [channel for channel in channels if channel.configured]
+        self.max_queue = max_queue
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._rates = rates_per_minute or {}
+        self._workers = workers or {}
+        self._stats = {channel.name: {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+                       for channel in self.channels}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5.0)
+        for channel in channels:
+            if not channel.configured:
+                logger.warning(f"{channel.name} alerts not configured; skipped.")
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        for channel in self.channels:
+            self._queues[channel.name] = asyncio.Queue(maxsize=self.max_queue)
+            bucket = TokenBucket(self._rates.get(channel.name, 0))
+            for _ in range(max(1, self._workers.get(channel.name, 1))):
+                self._tasks.append(loop.create_task(self._worker(channel, bucket)))
+        self._ready.set()
+        try:
+            loop.run_forever()
+            for task in self._tasks: # Alerts still retrying at shutdown are abandoned
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*self._tasks, return_exceptions=True))
+        finally:
+            loop.close()
+
+    def submit(self, subject: str, body: str, channel: Optional[str] = None,
+               on_result: Optional[Callable[[bool, Optional[str], bool], Any]] = None) -> bool:
+        """Queue one alert for `channel` (every configured channel if None). Never blocks on the network."""
+        if self._loop is None or self._loop.is_closed():
+            return False
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, subject, body, time.time(), channel, on_result)
+        except RuntimeError:
+            return False # Loop already stopped (shutdown)
+        return True
+
+    @staticmethod
+    def _report(on_result, ok: bool, error: Optional[str] = None, retryable: bool = False):
+        if on_result is None:
+            return
+        try:
+            on_result(ok, error, retryable)
+        except Exception as e:
+            logger.error(f"Alert result callback failed: {e}")
+
+    def _enqueue(self, subject: str, body: str, submitted_at: float, name: Optional[str] = None, on_result=None):
+        if name is not None and name not in self._queues:
+            self._report(on_result, False, f"{name} alerts not configured")
+            return
+        for channel in self.channels:
+            if name is not None and channel.name != name:
+                continue
+            try:
+                self._queues[channel.name].put_nowait((subject, body, submitted_at, on_result))
+                self._stats[channel.name]["queued"] += 1
+            except asyncio.QueueFull:
+                self._stats[channel.name]["dropped"] += 1
+                logger.warning(f"{channel.name} alert queue full; alert dropped: {subject}")
+                self._report(on_result, False, "Queue full", retryable=True)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0) # Jitter, so retries of many alerts don't line up
+
+    async def _worker(self, channel, bucket: TokenBucket):
+        alert_queue = self._queues[channel.name]
+        stats = self._stats[channel.name]
+        while True:
+            subject, body, submitted_at, on_result = await alert_queue.get()
+            try:
+                for attempt in range(1, self.max_attempts + 1):
+                    await bucket.acquire()
+                    try:
+                        await channel.send(subject, body)
+                        stats["sent"] += 1
+                        logger.info(f"{channel.name} alert sent after {time.time() - submitted_at:.1f} s: {subject}")
+                        self._report(on_result, True)
+                        break
+                    except PermanentError as e:
+                        stats["failed"] += 1
+                        logger.error(f"{channel.name} alert failed permanently: {e}")
+                        self._report(on_result, False, str(e))
+                        break
+                    except Exception as e:
+                        if attempt == self.max_attempts:
+                            stats["failed"] += 1
+                            logger.error(f"{channel.name} alert failed after {attempt} attempts: {e}")
+                            self._report(on_result, False, str(e), retryable=True)
+                            break
+                        delay = e.delay if isinstance(e, RetryAfter) else self._backoff(attempt)
+                        stats["retried"] += 1
+                        logger.warning(f"{channel.name} alert attempt {attempt} failed ({e}); retrying in {delay:.1f} s")
+                        await asyncio.sleep(delay)
+            finally:
+                alert_queue.task_done()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: {**values, "queue_depth": self._queues[name].qsize() if name in self._queues else 0}
+                for name, values in self._stats.items()}
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued alert was delivered or given up on."""
+        if self._loop is None or self._loop.is_closed():
+            return True
+
+        async def _join():
+            await asyncio.gather(*(q.join() for q in self._queues.values()))
+        try:
+            asyncio.run_coroutine_threadsafe(_join(), self._loop).result(timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    def stop(self, timeout: float = 10.0):
+        self.drain(timeout)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=timeout)
+        for channel in self.channels:
+            channel.close()
+
+
+def default_channels() -> List[Any]:
+    return [
+        EmailChannel(settings.SMTP_SERVER, settings.SMTP_PORT, settings.SMTP_USERNAME, settings.SMTP_PASSWORD,
+                     settings.ALERT_EMAIL_RECEIVER, starttls=settings.SMTP_STARTTLS,
+                     timeout=settings.ALERT_SEND_TIMEOUT_SECONDS, idle_seconds=settings.ALERT_SMTP_IDLE_SECONDS),
+        TelegramChannel(settings.TELEGRAM_BOT_TOKEN, settings.TELEGRAM_CHAT_ID, settings.TELEGRAM_API_URL,
+                        timeout=settings.ALERT_SEND_TIMEOUT_SECONDS),
+    ]
+
+
+_dispatcher: Optional[AlertDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> AlertDispatcher:
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher(
+                default_channels(),
+                max_queue=settings.ALERT_QUEUE_SIZE,
+                max_attempts=settings.ALERT_MAX_ATTEMPTS,
+                retry_base_seconds=settings.ALERT_RETRY_BASE_SECONDS,
+                retry_max_seconds=settings.ALERT_RETRY_MAX_SECONDS,
+                rates_per_minute={"email": settings.ALERT_EMAIL_RATE_PER_MINUTE, "telegram": settings.ALERT_TELEGRAM_RATE_PER_MINUTE},
+                workers={"email": settings.ALERT_SMTP_CONNECTIONS, "telegram": 1},
+            )
+        return _dispatcher
+
+
+def shutdown():
+    """Deliver what is still queued (bounded wait) and stop the dispatcher thread."""
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.stop()
@@ -0,0 +1,355 @@
+# app/services/alert_engine.py
+import datetime
+import threading
+import time
+import uuid
+import logging
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.database import ReadSessionLocal
+from app.schemas.alert import AlertData
+from app.services import alert_dispatcher, alert_outbox, log_writer
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_WARNING = 1
+SEVERITY_CRITICAL = 2
+SEVERITY_NAMES = {SEVERITY_WARNING: "WARNING", SEVERITY_CRITICAL: "CRITICAL"}
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def alert_type_for(mode) -> str:
+    mode = mode.value if hasattr(mode, "value") else mode
+    return "occupancy" if mode == models.CameraMode.TRIPWIRE.value else "crowd"
+
+
+def severity_for(value: float, threshold: float, critical_ratio: float) -> int:
+    if threshold and value >= threshold * critical_ratio:
+        return SEVERITY_CRITICAL
+    return SEVERITY_WARNING
+
+
+def _to_datetime(timestamp: float) -> Optional[datetime.datetime]:
+    return datetime.datetime.utcfromtimestamp(timestamp) if timestamp else None
+
+
+def _to_timestamp(value: Optional[datetime.datetime]) -> float:
+    return (value - _EPOCH).total_seconds() if value else 0.0
+
+
+class _Incident:
+    """An open alert for one (camera, alert type): raw events keep extending it until they stop."""
+
+    __slots__ = ("camera_id", "alert_type", "camera_name", "area_name", "severity", "notified_severity",
+                 "first_seen", "last_seen", "last_notified", "occurrences", "suppressed",
+                 "peak_value", "current_value", "threshold_value", "message")
+
+    def __init__(self, camera_id: int, alert_type: str, first_seen: float):
+        self.camera_id = camera_id
+        self.alert_type = alert_type
+        self.camera_name = ""
+        self.area_name = ""
+        self.severity = SEVERITY_WARNING
+        self.notified_severity = 0 # 0 = never notified
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.last_notified = 0.0
+        self.occurrences = 0
+        self.suppressed = 0
+        self.peak_value = 0.0
+        self.current_value = 0.0
+        self.threshold_value = 0.0
+        self.message = ""
+
+    @classmethod
+    def from_row(cls, row: models.AlertState) -> "_Incident":
+        incident = cls(row.camera_id, row.alert_type, _to_timestamp(row.first_seen))
+        for name in ("camera_name", "area_name", "severity", "notified_severity", "occurrences", "suppressed",
+                     "peak_value", "current_value", "threshold_value", "message"):
+            setattr(incident, name, getattr(row, name))
+        incident.last_seen = _to_timestamp(row.last_seen)
+        incident.last_notified = _to_timestamp(row.last_notified)
+        return incident
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            "camera_id": self.camera_id, "alert_type": self.alert_type,
+            "camera_name": self.camera_name, "area_name": self.area_name,
+            "severity": self.severity, "notified_severity": self.notified_severity,
+            "first_seen": _to_datetime(self.first_seen), "last_seen": _to_datetime(self.last_seen),
+            "last_notified": _to_datetime(self.last_notified),
+            "occurrences": self.occurrences, "suppressed": self.suppressed,
+            "peak_value": self.peak_value, "current_value": self.current_value,
+            "threshold_value": self.threshold_value, "message": self.message,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**self.to_row(), "severity_name": SEVERITY_NAMES.get(self.severity, str(self.severity))}
+
+
+def format_single(incident: _Incident, reason: str, suppressed: int):
+    severity = SEVERITY_NAMES.get(incident.severity, str(incident.severity))
+    prefix = {"escalated": "ESCALATED ", "ongoing": "ONGOING "}.get(reason, "")
+    subject = f"SafeFlow {prefix}{severity} Alert: {incident.message} in {incident.area_name}"
+    body = (
+        f"SafeFlow System Alert ({prefix}{severity}):\n\n"
+        f"Camera: {incident.camera_name} (ID: {incident.camera_id})\n"
+        f"Area: {incident.area_name}\n"
+        f"Type: {incident.alert_type}\n"
+        f"Alert: {incident.message}\n"
+        f"Current Value: {incident.current_value}\n"
+        f"Peak Value: {incident.peak_value}\n"
+        f"Threshold: {incident.threshold_value}\n"
+        f"Since: {_to_datetime(incident.first_seen):%Y-%m-%d %H:%M:%S} UTC\n"
+    )
+    if suppressed > 1:
+        body += f"Threshold events since last notice: {suppressed}\n"
+    return subject, body
+
+
+def format_digest(entries: List[Tuple[_Incident, str, int]]):
+    areas: Dict[str, List[Tuple[_Incident, str, int]]] = {}
+    for entry in entries:
+        areas.setdefault(entry[0].area_name, []).append(entry)
+    critical = sum(1 for incident, _, _ in entries if incident.severity >= SEVERITY_CRITICAL)
+    subject = f"SafeFlow Alert digest: {len(entries)} alerts in {len(areas)} area(s)" + (f", {critical} critical" if critical else "")
+    lines = ["SafeFlow System Alert digest:", ""]
+    for area_name in sorted(areas):
+        lines.append(f"Area: {area_name}")
+        for incident, reason, suppressed in sorted(areas[area_name], key=lambda e: (-e[0].severity, e[0].camera_name)):
+            lines.append(
+                f"  - [{reason.upper()}] {SEVERITY_NAMES.get(incident.severity, incident.severity)} "
+                f"{incident.camera_name} (ID: {incident.camera_id}): {incident.message} "
+                f"(current {incident.current_value}, peak {incident.peak_value}, threshold {incident.threshold_value}, "
+                f"{suppressed} event(s))"
+            )
+        lines.append("")
+    return subject, "\n".join(lines)
+
+
+class AlertEngine:
+    """
+    Turns raw threshold events into notifications. submit() only merges the event into a
+    per-(camera, type) slot, so frame loops can report every over-threshold frame at any rate;
+    a background thread evaluates the slots every `window_seconds`:
+
+    - dedup: an open incident is notified once, then again only when its severity rises
+      (escalation) or every `dedup_seconds` while it lasts (reminder);
+    - an incident with no events for `resolve_seconds` is closed; the next event opens a new one;
+    - everything due in the same window goes out as one digest grouped by area, a single alert
+      when only one is due.
+
+    Each window's incident changes and notifications (one alert_outbox row per channel) are
+    handed to the detection log writer as one batch and committed together, so a notification
+    is recorded exactly when its incident state is; the outbox worker delivers it. alert_states
+    is re-read before notifying, so restarts and other processes sharing the database don't
+    re-fire alerts already sent.
+    """
+
+    def __init__(self, writer: Optional[log_writer.DetectionLogWriter] = None, channels: Optional[Sequence[str]] = None,
+                 session_factory: Callable[[], Session] = ReadSessionLocal,
+                 window_seconds: float = 5.0, dedup_seconds: float = 600.0, resolve_seconds: float = 120.0,
+                 critical_ratio: float = 1.5):
+        self.writer = writer or log_writer.get_writer()
+        self.channels = list(channels) if channels is not None else [channel.name for channel in alert_dispatcher.get_dispatcher().channels]
+        self.session_factory = session_factory
+        self.window_seconds = window_seconds
+        self.dedup_seconds = dedup_seconds
+        self.resolve_seconds = resolve_seconds
+        self.critical_ratio = critical_ratio
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, str], list] = {} # key -> [latest AlertData, peak, count, last_seen]
+        self._incidents: Dict[Tuple[int, str], _Incident] = {}
+        self._stop_event = threading.Event()
+        self.raw_events = 0
+        self.suppressed_events = 0
+        self.notifications = 0
+        self.digests = 0
+        self.resolved = 0
+        self._load()
+        self._thread = threading.Thread(target=self._run, name="alert-engine", daemon=True)
+        self._thread.start()
+
+    def submit(self, alert: AlertData, timestamp: Optional[float] = None):
+        """Record one raw threshold event. Thread-safe, O(1), never touches the network or DB."""
+        now = timestamp or time.time()
+        key = (alert.camera_id, alert_type_for(alert.mode))
+        with self._lock:
+            self.raw_events += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = [alert, alert.current_value, 1, now]
+            else:
+                pending[0] = alert
+                if alert.current_value > pending[1]:
+                    pending[1] = alert.current_value
+                pending[2] += 1
+                pending[3] = now
+
+    def _load(self):
+        db = self.session_factory()
+        try:
+            for row in db.execute(select(models.AlertState)).scalars():
+                self._incidents[(row.camera_id, row.alert_type)] = _Incident.from_row(row)
+        except Exception as e:
+            logger.error(f"Failed to load alert state: {e}")
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop_event.wait(self.window_seconds):
+            self._safe_tick()
+        self._safe_tick() # Evaluate what arrived since the last window before stopping
+
+    def _safe_tick(self):
+        try:
+            self.tick()
+        except Exception as e:
+            logger.exception(f"Alert engine tick failed: {e}")
+
+    def tick(self, now: Optional[float] = None):
+        now = now or time.time()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        due: Dict[Tuple[int, str], str] = {} # key -> reason
+        for key, (alert, peak, count, seen) in pending.items():
+            incident = self._incidents.get(key)
+            if incident is None or seen - incident.last_seen > self.resolve_seconds:
+                incident = self._incidents[key] = _Incident(key[0], key[1], seen)
+            incident.camera_name = alert.camera_name
+            incident.area_name = alert.area_name
+            incident.message = alert.message
+            incident.current_value = alert.current_value
+            incident.threshold_value = alert.threshold_value
+            incident.peak_value = max(incident.peak_value, peak)
+            # Never lowered while the incident is open: it reports the worst it has been, like peak_value
+            incident.severity = max(incident.severity, severity_for(peak, alert.threshold_value, self.critical_ratio))
+            incident.last_seen = max(incident.last_seen, seen)
+            incident.occurrences += count
+            incident.suppressed += count
+            if incident.notified_severity == 0:
+                due[key] = "new"
+            elif incident.severity > incident.notified_severity:
+                due[key] = "escalated"
+            elif now - incident.last_notified >= self.dedup_seconds:
+                due[key] = "ongoing"
+
+        resolved = [key for key, incident in self._incidents.items() if now - incident.last_seen > self.resolve_seconds]
+        for key in resolved:
+            del self._incidents[key]
+        self.resolved += len(resolved)
+
+        if due:
+            db = self.session_factory()
+            try:
+                self._adopt_notified_elsewhere(db, due, now)
+            finally:
+                db.close()
+        entries = []
+        for key, reason in due.items():
+            incident = self._incidents[key]
+            entries.append((incident, reason, incident.suppressed))
+            incident.notified_severity = max(incident.notified_severity, incident.severity)
+            incident.last_notified = now
+            incident.suppressed = 0
+        self.suppressed_events += sum(p[2] for key, p in pending.items() if key not in due)
+        messages = self._notification(entries, now) if entries else []
+        states = [self._incidents[key].to_row() for key in pending if key in self._incidents]
+        if states or resolved or messages:
+            self.writer.submit_alerts(alert_outbox.AlertBatch(states, resolved, messages))
+
+    def _adopt_notified_elsewhere(self, db: Session, due: Dict[Tuple[int, str], str], now: float):
+        """Skip incidents another process (or this one before a restart) already notified at this severity."""
+        table = models.AlertState
+        try:
+            rows = db.execute(select(table).where(tuple_(table.camera_id, table.alert_type).in_(list(due)))).scalars().all()
+        except Exception as e:
+            logger.error(f"Failed to read alert state: {e}")
+            return
+        for row in rows:
+            key = (row.camera_id, row.alert_type)
+            incident = self._incidents.get(key)
+            last_notified = _to_timestamp(row.last_notified)
+            if incident is None or last_notified <= incident.last_notified:
+                continue
+            if row.notified_severity >= incident.severity and now - last_notified < self.dedup_seconds:
+                incident.notified_severity = row.notified_severity
+                incident.last_notified = last_notified
+                incident.first_seen = min(incident.first_seen, _to_timestamp(row.first_seen))
+                del due[key]
+
+    def _notification(self, entries: List[Tuple[_Incident, str, int]], now: float) -> List[Dict[str, Any]]:
+        if len(entries) == 1:
+            subject, body = format_single(*entries[0])
+        else:
+            subject, body = format_digest(entries)
+            self.digests += 1
+        self.notifications += 1
+        logger.info(f"Alert notification: {subject}")
+        return alert_outbox.outbox_rows(uuid.uuid4().hex, subject, body, self.channels, _to_datetime(now))
+
+    def active_incidents(self) -> List[Dict[str, Any]]:
+        return [incident.as_dict() for incident in list(self._incidents.values())]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "raw_events": self.raw_events,
+            "open_incidents": len(self._incidents),
+            "notifications": self.notifications,
+            "digests": self.digests,
+            "suppressed_events": self.suppressed_events,
+            "resolved": self.resolved,
+        }
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+
+
+_engine: Optional[AlertEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AlertEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AlertEngine(
+                window_seconds=settings.ALERT_DIGEST_WINDOW_SECONDS,
+                dedup_seconds=settings.ALERT_DEDUP_SECONDS,
+                resolve_seconds=settings.ALERT_RESOLVE_SECONDS,
+                critical_ratio=settings.ALERT_CRITICAL_RATIO,
+            )
+        return _engine
+
+
+def active_incidents() -> List[Dict[str, Any]]:
+    """
+    Open incidents: the engine's own in the process running it, otherwise (another API process, or
+    before the first alert) as last committed to alert_states, without starting an engine here.
+    """
+    engine = _engine
+    if engine is not None:
+        return engine.active_incidents()
+    cutoff = time.time() - settings.ALERT_RESOLVE_SECONDS
+    db = ReadSessionLocal()
+    try:
+        incidents = [_Incident.from_row(row) for row in db.execute(select(models.AlertState)).scalars()]
+    finally:
+        db.close()
+    return [incident.as_dict() for incident in incidents if incident.last_seen >= cutoff]
+
+
+def shutdown():
+    """Evaluate pending events one last time and stop the engine thread (before the log writer)."""
+    global _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine is not None:
+        engine.stop()
@@ -0,0 +1,264 @@
+# app/services/alert_outbox.py
+import datetime
+import queue
+import threading
+import time
+import logging
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, or_, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+from app.services import alert_dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class AlertBatch(NamedTuple):
+    """What one alert engine window changed; written by the log writer in its flush transaction."""
+    states: List[Dict[str, Any]] # alert_states rows to upsert
+    resolved: List[Tuple[int, str]] # (camera_id, alert_type) of closed incidents
+    messages: List[Dict[str, Any]] # alert_outbox rows
+
+
+def outbox_rows(notification_id: str, subject: str, body: str, channels: Sequence[str],
+                created_at: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
+    created_at = created_at or datetime.datetime.utcnow()
+    return [{
+        "dedup_key": f"{notification_id}:{channel}", "channel": channel, "subject": subject, "body": body,
+        "status": "pending", "attempts": 0, "created_at": created_at, "next_attempt_at": created_at,
+    } for channel in channels]
+
+
+def write_alert_batch(db: Session, batch: AlertBatch):
+    """Apply an AlertBatch inside the caller's transaction. Re-writing the same batch is a no-op for the outbox."""
+    if batch.states:
+        table = models.AlertState
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["camera_id", "alert_type"],
+            set_={name: stmt.excluded[name] for name in batch.states[0] if name not in ("camera_id", "alert_type")},
+        )
+        db.execute(stmt, batch.states)
+    if batch.resolved:
+        table = models.AlertState
+        db.execute(delete(table).where(tuple_(table.camera_id, table.alert_type).in_(batch.resolved)))
+    if batch.messages:
+        db.execute(sqlite_insert(models.AlertOutbox).on_conflict_do_nothing(index_elements=["dedup_key"]), batch.messages)
+
+
+def delivery_stats(db: Session, since: datetime.datetime) -> Dict[str, Dict[str, Any]]:
+    """Per channel: message counts by status and created-to-sent latency (seconds) since `since`."""
+    table = models.AlertOutbox
+    channels: Dict[str, Dict[str, Any]] = {}
+    latencies: Dict[str, List[float]] = {}
+    for channel, status, created_at, sent_at, attempts in db.execute(
+        select(table.channel, table.status, table.created_at, table.sent_at, table.attempts).where(table.created_at >= since)
+    ):
+        stats = channels.setdefault(channel, {"pending": 0, "sending": 0, "sent": 0, "failed": 0, "attempts": 0})
+        stats[status] = stats.get(status, 0) + 1
+        stats["attempts"] += attempts
+        if status == "sent" and sent_at is not None:
+            latencies.setdefault(channel, []).append((sent_at - created_at).total_seconds())
+    for channel, stats in channels.items():
+        values = sorted(latencies.get(channel, []))
+        total = sum(stats[s] for s in ("pending", "sending", "sent", "failed"))
+        stats["avg_attempts"] = stats.pop("attempts") / total if total else 0.0
+        stats["latency_seconds"] = {
+            "mean": sum(values) / len(values) if values else None,
+            "p50": values[len(values) // 2] if values else None,
+            "p95": values[min(len(values) - 1, int(0.95 * len(values)))] if values else None,
+            "max": values[-1] if values else None,
+        }
+    return channels
+
+
+class OutboxDeliveryWorker:
+    """
+    Delivers alert_outbox rows through the alert dispatcher. Due rows are claimed in one UPDATE
+    (status "sending" with a lease); the dispatcher reports each result back and the row is marked
+    sent, rescheduled with backoff, or failed. While the dispatcher still holds a row (queued,
+    rate-limited or between retries, which can outlast any fixed lease) its lease is renewed,
+    so only rows of a process that died while sending expire and are claimed again: delivery
+    is at-least-once and a row marked sent is never resent. Wakes up when the log writer
+    commits new rows, and polls as a fallback.
+    """
+
+    def __init__(self, dispatcher: Optional[alert_dispatcher.AlertDispatcher] = None, session_factory=SessionLocal,
+                 batch_size: int = 100, poll_seconds: float = 2.0, lease_seconds: float = 300.0,
+                 max_attempts: int = 5, retry_seconds: float = 30.0, retention_days: float = 30.0):
+        self.dispatcher = dispatcher or alert_dispatcher.get_dispatcher()
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        self.retention_days = retention_days
+        self._results: "queue.Queue[Tuple[int, bool, Optional[str], bool, datetime.datetime]]" = queue.Queue()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._in_flight: set = set() # Row ids handed to the dispatcher, result not yet applied
+        self._last_renewal = time.monotonic()
+        self._last_purge = 0.0
+        self.claimed = 0
+        self.sent = 0
+        self.failed = 0
+        self.rescheduled = 0
+        self._thread = threading.Thread(target=self._run, name="alert-outbox", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _due(self, now: datetime.datetime):
+        table = models.AlertOutbox
+        return or_(
+            and_(table.status == "pending", table.next_attempt_at <= now),
+            and_(table.status == "sending", table.claimed_at < now - datetime.timedelta(seconds=self.lease_seconds)),
+        )
+
+    def _claim(self, db: Session, limit: int):
+        table = models.AlertOutbox
+        now = datetime.datetime.utcnow()
+        db.execute(update(table).where(self._due(now), table.attempts >= self.max_attempts)
+                   .values(status="failed", last_error=f"Gave up after {self.max_attempts} attempts"))
+        rows = db.execute(
+            update(table)
+            .where(table.id.in_(select(table.id).where(self._due(now)).order_by(table.id).limit(limit)))
+            .values(status="sending", claimed_at=now, attempts=table.attempts + 1)
+            .returning(table.id, table.channel, table.subject, table.body)
+        ).all()
+        db.commit()
+        return rows
+
+    def _on_result(self, row_id: int, ok: bool, error: Optional[str], retryable: bool):
+        # Called on the dispatcher's loop; the DB update happens on this worker's thread
+        self._results.put((row_id, ok, error, retryable, datetime.datetime.utcnow()))
+        self._wake.set()
+
+    def _apply_results(self, db: Session):
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        if not results:
+            return
+        table = models.AlertOutbox
+        sent = [{"id": row_id, "status": "sent", "sent_at": at, "last_error": None} for row_id, ok, _, _, at in results if ok]
+        if sent:
+            db.execute(update(table), sent) # Bulk UPDATE by primary key
+        for row_id, ok, error, retryable, at in results:
+            if ok:
+                continue
+            if retryable:
+                attempts = db.execute(select(table.attempts).where(table.id == row_id)).scalar() or 1
+                delay = min(self.retry_seconds * (2 ** (attempts - 1)), 3600)
+                db.execute(update(table).where(table.id == row_id).values(
+                    status="pending", next_attempt_at=at + datetime.timedelta(seconds=delay), last_error=error))
+                self.rescheduled += 1
+            else:
+                db.execute(update(table).where(table.id == row_id).values(status="failed", last_error=error))
+                self.failed += 1
+        db.commit()
+        self.sent += len(sent)
+        self._in_flight.difference_update(row_id for row_id, _, _, _, _ in results)
+
+    def _renew_leases(self, db: Session):
+        # A third of the lease between renewals leaves two missed passes of slack
+        if not self._in_flight or time.monotonic() - self._last_renewal < self.lease_seconds / 3:
+            return
+        self._last_renewal = time.monotonic()
+        table = models.AlertOutbox
+        db.execute(update(table).where(table.id.in_(list(self._in_flight)), table.status == "sending")
+                   .values(claimed_at=datetime.datetime.utcnow()))
+        db.commit()
+
+    def _purge(self, db: Session):
+        if self.retention_days <= 0 or time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        table = models.AlertOutbox
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=self.retention_days)
+        db.execute(delete(table).where(table.status.in_(("sent", "failed")), table.created_at < cutoff))
+        db.commit()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            db = self.session_factory()
+            try:
+                self._apply_results(db)
+                self._renew_leases(db)
+                self._purge(db)
+                # Bounded in-flight work: the dispatcher's queues stay small and results keep up
+                room = self.batch_size - len(self._in_flight)
+                if room > 0:
+                    rows = self._claim(db, room)
+                    self.claimed += len(rows)
+                    self._in_flight.update(row[0] for row in rows)
+                    for row_id, channel, subject, body in rows:
+                        self.dispatcher.submit(subject, body, channel=channel,
+                                               on_result=lambda ok, error, retryable, row_id=row_id: self._on_result(row_id, ok, error, retryable))
+                    if len(rows) == room:
+                        self._wake.set() # More may be due
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Alert outbox delivery pass failed: {e}")
+            finally:
+                db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"claimed": self.claimed, "sent": self.sent, "rescheduled": self.rescheduled,
+                "failed": self.failed, "in_flight": len(self._in_flight)}
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+        db = self.session_factory()
+        try:
+            self._apply_results(db) # Record what was delivered; the rest is reclaimed after its lease
+        except Exception as e:
+            logger.error(f"Failed to record alert deliveries at shutdown: {e}")
+        finally:
+            db.close()
+
+
+_worker: Optional[OutboxDeliveryWorker] = None
+_worker_lock = threading.Lock()
+
+
+def start() -> OutboxDeliveryWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = OutboxDeliveryWorker(
+                lease_seconds=settings.ALERT_OUTBOX_LEASE_SECONDS,
+                max_attempts=settings.ALERT_OUTBOX_MAX_ATTEMPTS,
+                retry_seconds=settings.ALERT_OUTBOX_RETRY_SECONDS,
+                retention_days=settings.ALERT_OUTBOX_RETENTION_DAYS,
+            )
+        return _worker
+
+
+def wake():
+    """New outbox rows were committed."""
+    worker = _worker
+    if worker is not None:
+        worker.wake()
+
+
+def shutdown():
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.stop()
@@ -0,0 +1,69 @@
+# app/services/background_owner.py
+import logging
+import threading
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_lock_file = None
+_owner: Optional[bool] = None
+
+
+def _try_lock(path: str):
+    """An open lock file this process now holds exclusively, or None when another process holds it."""
+    lock_file = open(path, "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def is_owner() -> bool:
+    """
+    Whether this API process runs the camera workers and the singleton background services.
+    Decided once per process (see RUN_BACKGROUND_SERVICES); in "auto" mode the first process to
+    lock BACKGROUND_LOCK_FILE wins and keeps the lock until it exits, even if it crashes.
+    """
+    global _owner, _lock_file
+    if _owner is None:
+        with _lock:
+            if _owner is None:
+                mode = settings.RUN_BACKGROUND_SERVICES.strip().lower()
+                if mode in ("true", "1", "yes"):
+                    owner = True
+                elif mode in ("false", "0", "no"):
+                    owner = False
+                else:
+                    _lock_file = _try_lock(settings.BACKGROUND_LOCK_FILE)
+                    owner = _lock_file is not None
+                logger.info("This process runs the cameras and background services" if owner
+                            else "Background services run in another process; serving shared status and frames only")
+                if not owner and not settings.LIVE_STATUS_SHM_NAME:
+                    logger.warning("LIVE_STATUS_SHM_NAME is not set: this process can't show live status or video")
+                _owner = owner
+    return _owner
+
+
+def release():
+    """Give up ownership at shutdown so a process started next can take it."""
+    global _owner, _lock_file
+    with _lock:
+        lock_file, _lock_file = _lock_file, None
+        _owner = None
+    if lock_file is not None:
+        lock_file.close() # Closing the file drops the lock
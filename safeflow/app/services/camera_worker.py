@@ -0,0 +1,545 @@
+# app/services/camera_worker.py
+import queue
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.db.database import ReadSessionLocal
+from app.db import models
+from app.crud import camera as crud_camera
+from app.schemas import log as log_schema, alert as alert_schema
+from app.services import video_processing, alert_service, inference_engine, frame_scheduler, frame_publisher
+from app.services import live_status_manager, process_pool, log_writer, background_owner, shm_frames
+
+logger = logging.getLogger(__name__)
+
+LOG_INTERVAL_FRAMES = 30
+REOPEN_DELAY_SECONDS = 1.0
+
+
+def _error_frame_jpeg(text: str) -> bytes:
+    error_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(error_frame, text, (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    _, encoded_image = cv2.imencode('.jpg', error_frame)
+    return encoded_image.tobytes()
+
+
+def _parse_source(source: str):
+    try:
+        return int(source)
+    except (TypeError, ValueError):
+        return source  # IP stream URL
+
+
+def _threshold_alert(db_camera, persons, current_occupancy_live, alert, alert_msg):
+    """
+    (alert, message, value) to notify with. Crowd counts are judged on the rolling mean the live
+    status uses (LIVE_THRESHOLD_WINDOW_SECONDS), so one noisy frame notifies nobody and alerts
+    agree with is_over_threshold; tripwire occupancy is an exact count and is judged as is.
+    """
+    if db_camera.mode != models.CameraMode.GENERAL:
+        return alert, alert_msg, current_occupancy_live
+    smoothed = live_status_manager.smoothed_person_count(db_camera.id)
+    window = settings.LIVE_THRESHOLD_WINDOW_SECONDS
+    if smoothed is None or window <= 0:
+        return alert, alert_msg, persons
+    if smoothed <= db_camera.crowd_threshold:
+        return False, "", round(smoothed, 1)
+    return True, f"Crowd threshold exceeded (avg {smoothed:.1f}/{db_camera.crowd_threshold} over {window} s)", round(smoothed, 1)
+
+
+def _with_alert(overlay, alert, alert_msg):
+    if overlay is None or (overlay.get("alert") == alert and overlay.get("alert_message") == alert_msg):
+        return overlay
+    return {**overlay, "alert": alert, "alert_message": alert_msg}
+
+
+class CameraWorker(threading.Thread):
+    """
+    Owns the capture device of one camera, runs inference once per frame and publishes the
+    result into a FramePublisher. Any number of /video_feed subscribers read from it, so
+    inference cost scales with cameras and encoding cost with variants, not with viewers.
+    """
+
+    def __init__(self, camera_id: int):
+        super().__init__(name=f"camera-worker-{camera_id}", daemon=True)
+        self.camera_id = camera_id
+        self.buffer = frame_publisher.FramePublisher()
+        self.pipeline = video_processing.CameraPipeline(camera_id)
+        self.scheduler = frame_scheduler.AdaptiveFrameScheduler()
+        self._stop_event = threading.Event()
+        self._reload_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def reload(self):
+        """Re-read the camera row (thresholds, tripwire, source) before the next frame."""
+        self._reload_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def run(self):
+        db = ReadSessionLocal(expire_on_commit=False) # Logs go through log_writer; this session only reads
+        cap = None
+        try:
+            db_camera = self._load_camera(db)
+            if not db_camera or not db_camera.is_active:
+                logger.warning(f"Camera {self.camera_id} missing or inactive; worker not started.")
+                return
+            cam_source = _parse_source(db_camera.source)
+            cap = cv2.VideoCapture(cam_source)
+            pacer = frame_scheduler.SourcePacer(cam_source)
+            frame_count = 0
+
+            while not self._stop_event.is_set():
+                if self._reload_event.is_set():
+                    self._reload_event.clear()
+                    db_camera = self._reload_camera(db, db_camera)
+                    if not db_camera or not db_camera.is_active:
+                        logger.info(f"Camera {self.camera_id} removed or deactivated; stopping worker.")
+                        break
+                    new_source = _parse_source(db_camera.source)
+                    if new_source != cam_source:
+                        cap.release()
+                        cam_source = new_source
+                        cap = cv2.VideoCapture(cam_source)
+                        pacer = frame_scheduler.SourcePacer(cam_source)
+                        self.pipeline.reset() # Track ids from the old source mean nothing now
+
+                if not cap.isOpened():
+                    logger.error(f"Could not open video source for camera ID {self.camera_id} (source: {cam_source})")
+                    self.buffer.publish(_error_frame_jpeg(f"Error: Cannot open camera {cam_source}"), {})
+                    self._stop_event.wait(REOPEN_DELAY_SECONDS)
+                    cap.release()
+                    cap = cv2.VideoCapture(cam_source)
+                    continue
+
+                success, frame = cap.read()
+                if not success:
+                    logger.warning(f"Failed to grab frame from camera ID {self.camera_id}; reopening.")
+                    cap.release()
+                    self._stop_event.wait(REOPEN_DELAY_SECONDS)
+                    cap = cv2.VideoCapture(cam_source)
+                    continue
+                pacer.wait(cap, self._stop_event)
+
+                frame_count += 1
+                render_mode = frame_publisher.render_mode(db_camera)
+                render = render_mode == frame_publisher.RENDER_ANNOTATED # Otherwise clients draw the overlay
+                detected = self.scheduler.should_detect(frame)
+                if detected:
+                    # Detection is shared with other cameras' frames in one batch; tracking stays per camera
+                    results = inference_engine.detect(self.camera_id, frame, self.pipeline.detection_input(frame, db_camera))
+                    processed_frame, persons, density, entries, exits, alert, alert_msg, current_occupancy_live = \
+                        self.pipeline.process(frame, db_camera, db_camera_obj=db_camera, results=results, render=render)
+                    self.scheduler.observe_camera(db_camera, persons, current_occupancy_live)
+                else:
+                    processed_frame, persons, density, entries, exits, alert, alert_msg, current_occupancy_live = \
+                        self.pipeline.reuse_last(frame, db_camera, db_camera_obj=db_camera, render=render)
+
+                if frame_count % LOG_INTERVAL_FRAMES == 0:
+                    self._write_log(db_camera, persons, density, entries, exits)
+
+                alert, alert_msg, alert_value = _threshold_alert(db_camera, persons, current_occupancy_live, alert, alert_msg)
+                if alert:
+                    self._maybe_alert(db_camera, alert_msg, alert_value)
+
+                try:
+                    self.buffer.publish_frame(None if render_mode == frame_publisher.RENDER_HEADLESS else processed_frame, {
+                        "person_count": persons,
+                        "density": density,
+                        "entry_count": entries,
+                        "exit_count": exits,
+                        "current_occupancy": current_occupancy_live,
+                        "alert": alert,
+                        "alert_message": alert_msg,
+                        "detected": detected,
+                        "detect_interval": self.scheduler.interval,
+                        "timestamp": time.time(),
+                    }, _with_alert(self.pipeline.last_overlay, alert, alert_msg))
+                except Exception as e:
+                    logger.error(f"Error encoding frame for camera ID {self.camera_id}: {e}")
+        except Exception as e:
+            logger.exception(f"Camera worker {self.camera_id} crashed: {e}")
+        finally:
+            if cap is not None:
+                cap.release()
+            db.close()
+            self._stop_event.set()
+            logger.info(f"Released video capture for camera ID {self.camera_id}")
+
+    def _load_camera(self, db):
+        db_camera = crud_camera.get_camera(db, self.camera_id)
+        db.commit() # End the read transaction so the worker doesn't pin a pooled connection for its lifetime
+        return db_camera
+
+    def _reload_camera(self, db, db_camera):
+        """
+        Re-read the camera row without losing crossings counted since the last log: the live
+        occupancy is flushed first, so the row holds it unless someone reset it meanwhile.
+        """
+        live = db_camera.current_occupancy if db_camera.mode == models.CameraMode.TRIPWIRE else None
+        flushed = True
+        if live is not None:
+            writer = log_writer.get_writer()
+            failed_before = writer.failed_batches
+            writer.submit_occupancy(db_camera.id, live or 0)
+            flushed = writer.flush() and writer.failed_batches == failed_before
+        db.expire_all()
+        reloaded = self._load_camera(db)
+        if reloaded is not None and live is not None and not flushed:
+            reloaded.current_occupancy = live # Not persisted (writer busy or failing): keep counting from the live value
+        return reloaded
+
+    def _write_log(self, db_camera, persons, density, entries, exits):
+        log_entry = log_schema.DetectionLogCreate(
+            camera_id=db_camera.id,
+            area_name=db_camera.area_name,
+            mode=db_camera.mode,
+            person_count=persons,
+            density=density,
+            entry_count=entries,
+            exit_count=exits
+        )
+        # Enqueued only; the log writer thread bulk-inserts in batches so the frame loop never waits on SQLite
+        writer = log_writer.get_writer()
+        writer.submit(log_entry)
+        if db_camera.mode == models.CameraMode.TRIPWIRE:
+            writer.submit_occupancy(db_camera.id, db_camera.current_occupancy or 0)
+
+    def _maybe_alert(self, db_camera, alert_msg, value):
+        # Every alert frame is reported; dedup, escalation and digests happen in the alert engine
+        is_general = db_camera.mode == models.CameraMode.GENERAL
+        alert_data = alert_schema.AlertData(
+            camera_id=db_camera.id,
+            camera_name=db_camera.name,
+            area_name=db_camera.area_name,
+            mode=db_camera.mode,
+            message=alert_msg,
+            current_value=value,
+            threshold_value=db_camera.crowd_threshold if is_general else db_camera.occupancy_threshold
+        )
+        alert_service.trigger_alerts(alert_data)
+
+
+class RemoteCameraWorker(CameraWorker):
+    """
+    Main-process side of a camera whose capture and inference run in the inference process
+    pool. It reads annotated JPEGs from the camera's shared-memory output ring and turns the
+    pool's small per-frame metric events into the same FramePublisher, logs and alerts as
+    CameraWorker, so stream endpoints don't care where inference ran.
+    """
+
+    EVENT_BACKLOG = 256
+
+    def __init__(self, camera_id: int, pool: "process_pool.InferenceProcessPool"):
+        super().__init__(camera_id)
+        self.pool = pool
+        self.out_ring = None
+        self._events: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=self.EVENT_BACKLOG)
+
+    def _on_event(self, event: Dict[str, Any]):
+        # Called on the pool's event thread; never block it on one slow camera
+        while True:
+            try:
+                self._events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        db = ReadSessionLocal(expire_on_commit=False) # Logs go through log_writer; this session only reads
+        try:
+            db_camera = self._load_camera(db)
+            if not db_camera or not db_camera.is_active:
+                logger.warning(f"Camera {self.camera_id} missing or inactive; worker not started.")
+                return
+            cam_source = db_camera.source
+            self.out_ring = self.pool.add_camera(db_camera, self._on_event)
+            frame_count = 0
+
+            while not self._stop_event.is_set():
+                if self._reload_event.is_set():
+                    self._reload_event.clear()
+                    db_camera = self._reload_camera(db, db_camera)
+                    if not db_camera or not db_camera.is_active:
+                        logger.info(f"Camera {self.camera_id} removed or deactivated; stopping worker.")
+                        break
+                    if db_camera.source != cam_source:
+                        cam_source = db_camera.source
+                        self.out_ring = self.pool.add_camera(db_camera, self._on_event)
+                    else:
+                        self.pool.update_camera(db_camera)
+
+                try:
+                    event = self._events.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if "error" in event:
+                    self.buffer.publish(_error_frame_jpeg(event["error"]), {})
+                    continue
+
+                metrics = event["metrics"]
+                frame_count += 1
+                persons = metrics["person_count"]
+                current_occupancy_live = metrics["current_occupancy"]
+                if db_camera.mode == models.CameraMode.TRIPWIRE:
+                    db_camera.current_occupancy = current_occupancy_live
+                # The pipeline ran in another process; live status lives in this one
+                live_status_manager.update_live_status(self.camera_id, persons, metrics["density"], current_occupancy_live,
+                                                       metrics["entry_count"], metrics["exit_count"], metrics.get("regions"))
+
+                if frame_count % LOG_INTERVAL_FRAMES == 0:
+                    self._write_log(db_camera, persons, metrics["density"], metrics["entry_count"], metrics["exit_count"])
+                alert, alert_msg, alert_value = _threshold_alert(db_camera, persons, current_occupancy_live,
+                                                                 metrics["alert"], metrics["alert_message"])
+                metrics = {**metrics, "alert": alert, "alert_message": alert_msg} # What viewers see matches what is notified
+                if alert:
+                    self._maybe_alert(db_camera, alert_msg, alert_value)
+
+                overlay = _with_alert(event.get("overlay"), alert, alert_msg)
+                if event["out_seq"] is None: # Headless (or encoding failed): the pool encoded nothing
+                    self.buffer.publish_frame(None, metrics, overlay)
+                    continue
+                jpeg = self.out_ring.read(event["out_seq"], as_array=False)
+                if jpeg is not None: # None: overwritten already, a newer frame is queued
+                    self.buffer.publish(jpeg, metrics, overlay)
+        except Exception as e:
+            logger.exception(f"Remote camera worker {self.camera_id} crashed: {e}")
+        finally:
+            self.pool.remove_camera(self.camera_id)
+            db.close()
+            self._stop_event.set()
+
+
+class SharedCameraView(threading.Thread):
+    """
+    Stands in for a camera's worker in an API process that doesn't run cameras (see
+    background_owner): republishes the frames the owner process shares in shared memory into a
+    local FramePublisher, so stream endpoints behave the same in every process. Only polls the
+    owner while this process has viewers of the camera.
+    """
+
+    POLL_SECONDS = 0.01
+    IDLE_POLL_SECONDS = 1.0
+    STALE_SECONDS = 5.0 # No new frame this long while watched: attach again (the owner may have restarted)
+
+    def __init__(self, camera_id: int):
+        super().__init__(name=f"camera-view-{camera_id}", daemon=True)
+        self.camera_id = camera_id
+        self.buffer = frame_publisher.FramePublisher()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def reload(self):
+        pass # The owner's worker re-reads the camera row
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def run(self):
+        ring = None
+        last_seq = 0
+        last_frame_at = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                if self.buffer.subscribers == 0:
+                    self._stop_event.wait(self.IDLE_POLL_SECONDS)
+                    last_frame_at = time.monotonic()
+                    continue
+                if ring is None:
+                    ring = shm_frames.attach(self.camera_id)
+                    if ring is None:
+                        self.buffer.publish(_error_frame_jpeg(f"Camera {self.camera_id} not streaming"), {})
+                        self._stop_event.wait(REOPEN_DELAY_SECONDS)
+                        continue
+                    last_seq, last_frame_at = 0, time.monotonic()
+                ring.mark_read()
+                seq, payload = ring.read_latest(last_seq, as_array=False)
+                if payload is None:
+                    if time.monotonic() - last_frame_at > self.STALE_SECONDS:
+                        ring.close()
+                        ring = None
+                    else:
+                        self._stop_event.wait(self.POLL_SECONDS)
+                    continue
+                last_seq, last_frame_at = seq, time.monotonic()
+                unpacked = shm_frames.unpack(payload)
+                if unpacked is None:
+                    continue
+                jpeg, metrics, overlay = unpacked
+                if jpeg is None: # Headless camera
+                    self.buffer.publish_frame(None, metrics, overlay)
+                else:
+                    self.buffer.publish(jpeg, metrics, overlay)
+        except Exception as e:
+            logger.exception(f"Shared view of camera {self.camera_id} crashed: {e}")
+        finally:
+            if ring is not None:
+                ring.close()
+            self._stop_event.set()
+
+
+# --- Worker registry (one worker per camera, shared by all viewers) ---
+_workers: Dict[int, CameraWorker] = {}
+_workers_lock = threading.Lock()
+# Owner process: each camera's shared frame ring (None when not sharing), kept for the process
+# lifetime and handed from worker to worker, so other processes' views never lose it
+_shared_frames: Dict[int, Any] = {}
+
+
+def get_worker(camera_id: int) -> CameraWorker:
+    """
+    Return the running worker for a camera, starting one if needed. Outside the process that
+    runs the cameras this is a SharedCameraView of the owner's worker.
+    """
+    with _workers_lock:
+        worker = _workers.get(camera_id)
+        if worker is None or worker.stopped or not worker.is_alive():
+            if worker is not None:
+                worker.buffer.shared = None # A stopping worker doesn't write into its successor's ring
+            if background_owner.is_owner():
+                pool = process_pool.get_pool()
+                worker = RemoteCameraWorker(camera_id, pool) if pool else CameraWorker(camera_id)
+                if camera_id not in _shared_frames:
+                    _shared_frames[camera_id] = shm_frames.create(camera_id)
+                worker.buffer.shared = _shared_frames[camera_id]
+            else:
+                worker = SharedCameraView(camera_id)
+            _workers[camera_id] = worker
+            worker.start()
+        return worker
+
+
+def sync_worker(db_camera):
+    """
+    After a camera row changes: start its worker if it is active, else let a running one re-read
+    the row. Outside the owner process only the change is noted; the owner's sync applies it.
+    """
+    _synced[db_camera.id] = _config_key(db_camera)
+    if not background_owner.is_owner():
+        return
+    if db_camera.is_active and get_running_worker(db_camera.id) is None:
+        get_worker(db_camera.id)
+    else:
+        reload_worker(db_camera.id) # Picks up thresholds/source; stops itself when deactivated
+
+
+def get_running_worker(camera_id: int) -> Optional[CameraWorker]:
+    """The camera's worker if one is running; never starts one."""
+    with _workers_lock:
+        worker = _workers.get(camera_id)
+    return worker if worker is not None and not worker.stopped else None
+
+
+def stream_stats() -> Dict[int, Dict[str, Any]]:
+    """Per camera: encodes per variant and every viewer's sent/dropped/capped frames and latency."""
+    with _workers_lock:
+        workers = dict(_workers)
+    return {camera_id: worker.buffer.stats() for camera_id, worker in workers.items()}
+
+
+def reload_worker(camera_id: int):
+    with _workers_lock:
+        worker = _workers.get(camera_id)
+    if worker:
+        worker.reload()
+
+
+def stop_worker(camera_id: int):
+    _synced.pop(camera_id, None)
+    with _workers_lock:
+        worker = _workers.pop(camera_id, None)
+    if worker:
+        worker.stop()
+    video_processing.remove_pipeline(camera_id)
+
+
+def stop_all_workers(timeout: float = 5.0):
+    global _sync_thread
+    _sync_stop.set()
+    if _sync_thread is not None:
+        _sync_thread.join(timeout=timeout)
+        _sync_thread = None
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.stop()
+    for worker in workers:
+        worker.join(timeout=timeout)
+    with _workers_lock:
+        rings = [ring for ring in _shared_frames.values() if ring is not None]
+        _shared_frames.clear()
+    for ring in rings:
+        try:
+            ring.close()
+        except BufferError: # A worker that outlived the join still maps it; the next start replaces it
+            pass
+
+
+# --- Camera table sync ---
+# Cameras can be edited through any API process, but only the owner runs them: every process
+# re-reads the table every CAMERA_SYNC_SECONDS and applies what changed since it last looked
+_LIVE_COLUMNS = {"last_person_count", "last_density", "last_status_update_time", "is_over_threshold", "current_occupancy"}
+_synced: Dict[int, tuple] = {} # camera_id -> configuration last applied in this process
+_sync_stop = threading.Event()
+_sync_thread: Optional[threading.Thread] = None
+
+
+def _config_key(db_camera) -> tuple:
+    return tuple(getattr(db_camera, column.name) for column in models.Camera.__table__.columns
+                 if column.name not in _LIVE_COLUMNS)
+
+
+def sync_cameras():
+    """
+    Apply camera rows added, changed or deleted since the last call: live status configs in every
+    process, and in the owner process a running worker for each active camera (the first call
+    starts them all, so cameras detect, log and alert without a viewer).
+    """
+    db = ReadSessionLocal()
+    try:
+        db_cameras = db.query(models.Camera).all()
+    finally:
+        db.close()
+    for db_camera in db_cameras:
+        if _synced.get(db_camera.id) == _config_key(db_camera):
+            continue
+        live_status_manager.update_camera_config(db_camera.id, db_camera)
+        sync_worker(db_camera)
+    for camera_id in set(_synced) - {db_camera.id for db_camera in db_cameras}:
+        live_status_manager.remove_camera_config(camera_id)
+        stop_worker(camera_id)
+
+
+def _sync_loop():
+    while not _sync_stop.wait(settings.CAMERA_SYNC_SECONDS):
+        try:
+            sync_cameras()
+        except Exception as e:
+            logger.error(f"Camera sync failed: {e}")
+
+
+def start_sync():
+    """Sync once (starting the owner's active cameras), then every CAMERA_SYNC_SECONDS in the background."""
+    global _sync_thread
+    sync_cameras()
+    if settings.CAMERA_SYNC_SECONDS > 0 and _sync_thread is None:
+        _sync_stop.clear()
+        _sync_thread = threading.Thread(target=_sync_loop, name="camera-sync", daemon=True)
+        _sync_thread.start()
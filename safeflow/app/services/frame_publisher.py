@@ -0,0 +1,324 @@
+# app/services/frame_publisher.py
+import asyncio
+import threading
+import time
+import logging
+from typing import Dict, Any, AsyncIterator, Callable, List, NamedTuple, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+import orjson
+
+from app.core.config import settings
+from app.services import shm_frames
+from app.services.shm_ring import SharedFrameRing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANT = "full"
+OVERLAY = "overlay" # Pseudo-variant: per-frame overlay metadata as JSON instead of a JPEG
+
+RENDER_ANNOTATED = "annotated"
+RENDER_RAW = "raw"
+RENDER_HEADLESS = "headless"
+
+
+def render_mode(camera) -> str:
+    """A camera row's (or config namespace's) render mode as a plain string; unset means annotated."""
+    mode = getattr(camera, "render_mode", None)
+    mode = mode.value if hasattr(mode, "value") else mode
+    return mode or RENDER_ANNOTATED
+
+
+class Variant(NamedTuple):
+    name: str
+    max_width: int # 0 = source resolution
+    quality: int # JPEG quality, 1-100
+
+
+def parse_variants(spec: str) -> Dict[str, Variant]:
+    """"full=0:90,medium=640:80,thumb=320:70" -> {name: Variant}; "full" is always available."""
+    variants: Dict[str, Variant] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, params = item.partition("=")
+        width, _, quality = params.partition(":")
+        variants[name.strip()] = Variant(name.strip(), int(width or 0), min(100, max(1, int(quality or 95))))
+    variants.setdefault(DEFAULT_VARIANT, Variant(DEFAULT_VARIANT, 0, 95))
+    return variants
+
+
+VARIANTS = parse_variants(settings.STREAM_VARIANTS)
+
+
+def encode(frame: np.ndarray, variant: Variant) -> Optional[bytes]:
+    height, width = frame.shape[:2]
+    if variant.max_width and width > variant.max_width:
+        frame = cv2.resize(frame, (variant.max_width, max(1, round(height * variant.max_width / width))),
+                           interpolation=cv2.INTER_AREA)
+    ok, encoded_image = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, variant.quality])
+    return encoded_image.tobytes() if ok else None
+
+
+def multipart_part(jpeg: bytes) -> bytes:
+    # Built once per frame and variant; every viewer yields this same object
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
+
+_REDUCED_DECODE = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+class StreamSubscriber:
+    """One viewer of a camera stream: its variant, fps cap and delivery counters."""
+
+    __slots__ = ("variant", "max_fps", "client", "connected_at", "last_seq", "sent", "bytes_sent",
+                 "dropped", "capped", "send_seconds", "max_send_seconds", "latency_seconds", "max_latency_seconds")
+
+    def __init__(self, variant: str, max_fps: float = 0.0, client: str = ""):
+        self.variant = variant
+        self.max_fps = max_fps
+        self.client = client
+        self.connected_at = time.time()
+        self.last_seq = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0 # Frames published while this client was still busy with an older one
+        self.capped = 0 # Frames skipped to honour max_fps
+        self.send_seconds = 0.0
+        self.max_send_seconds = 0.0
+        self.latency_seconds = 0.0 # Publish-to-send age of the frames sent
+        self.max_latency_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        published = self.sent + self.dropped + self.capped
+        return {
+            "client": self.client, "variant": self.variant, "max_fps": self.max_fps,
+            "connected_seconds": round(time.time() - self.connected_at, 1),
+            "sent": self.sent, "bytes_sent": self.bytes_sent, "dropped": self.dropped, "capped": self.capped,
+            "drop_ratio": round(self.dropped / published, 3) if published else 0.0,
+            "avg_send_ms": round(self.send_seconds / self.sent * 1000, 2) if self.sent else 0.0,
+            "max_send_ms": round(self.max_send_seconds * 1000, 2),
+            "avg_latency_ms": round(self.latency_seconds / self.sent * 1000, 2) if self.sent else 0.0,
+            "max_latency_ms": round(self.max_latency_seconds * 1000, 2),
+        }
+
+
+class FramePublisher:
+    """
+    Latest annotated frame + metrics for one camera, shared by every viewer of that camera.
+    Viewers subscribe to a variant (resolution/quality); the worker thread encodes each frame
+    once per variant that has subscribers, not once per viewer, and all viewers of a variant
+    get the same multipart `bytes` object. asyncio viewers are woken through
+    call_soon_threadsafe, so the event loop never blocks on capture, inference or encoding.
+
+    Publishing never waits for viewers: the publisher keeps only the latest frame, and each
+    viewer's frames() sends the newest one whenever that viewer is ready, so a slow client
+    skips (and counts) frames instead of slowing the camera's detection and alerting.
+
+    Overlay metadata (boxes, track ids, tripwires, counts) is published alongside and, when it
+    has subscribers, serialized once per frame as the OVERLAY pseudo-variant, with the same
+    delivery semantics as the JPEG variants. Headless cameras publish overlays only.
+
+    With `shared` set (by the process running the camera), each frame is also copied to shared
+    memory while another API process has viewers of it; see shm_frames.
+    """
+
+    def __init__(self, variants: Optional[Dict[str, Variant]] = None):
+        self.variants = variants or VARIANTS
+        self._cond = threading.Condition()
+        self.seq = 0
+        self.parts: Dict[str, bytes] = {} # variant -> multipart part of the latest frame
+        self.metrics: Dict[str, Any] = {}
+        self.overlay: Optional[Dict[str, Any]] = None
+        self.published_at = 0.0 # time.monotonic() of the latest publish
+        self._subscribers: Dict[str, int] = {name: 0 for name in (*self.variants, OVERLAY)}
+        self._viewers: Set[StreamSubscriber] = set()
+        self._async_waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._source_width = 0
+        self.encodes: Dict[str, int] = {name: 0 for name in self.variants}
+        self.decodes = 0
+        self.shared: Optional[SharedFrameRing] = None
+
+    @property
+    def subscribers(self) -> int:
+        return sum(self._subscribers.values())
+
+    def subscribe(self, variant: str = DEFAULT_VARIANT, max_fps: float = 0.0, client: str = "") -> StreamSubscriber:
+        subscriber = StreamSubscriber(variant, max_fps, client)
+        with self._cond:
+            self._subscribers[variant] += 1
+            self._viewers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber):
+        with self._cond:
+            if subscriber in self._viewers:
+                self._viewers.discard(subscriber)
+                self._subscribers[subscriber.variant] = max(0, self._subscribers[subscriber.variant] - 1)
+
+    def active_variants(self) -> List[str]:
+        with self._cond:
+            return [name for name, count in self._subscribers.items() if count > 0]
+
+    def _shared_wanted(self) -> bool:
+        shared = self.shared
+        return shared is not None and shared.read_recently(shm_frames.READER_TIMEOUT_SECONDS)
+
+    def publish_frame(self, frame: Optional[np.ndarray], metrics: Dict[str, Any], overlay: Optional[Dict[str, Any]] = None):
+        """
+        Encode `frame` once per subscribed variant (not at all without viewers) and publish it.
+        `frame` is None for headless cameras: only metrics and the overlay are published.
+        """
+        parts = {}
+        shared = self._shared_wanted()
+        shared_jpeg = None
+        names = self.active_variants() if frame is not None else []
+        if shared and frame is not None and DEFAULT_VARIANT not in names:
+            names.append(DEFAULT_VARIANT) # Other processes derive their viewers' variants from the full frame
+        for name in names:
+            if name == OVERLAY:
+                continue
+            jpeg = encode(frame, self.variants[name])
+            if jpeg is not None:
+                parts[name] = multipart_part(jpeg)
+                self.encodes[name] += 1
+                if name == DEFAULT_VARIANT:
+                    shared_jpeg = jpeg
+        if shared:
+            self._share(shared_jpeg, metrics, overlay)
+        self._publish(parts, metrics, overlay)
+
+    def publish(self, jpeg: bytes, metrics: Dict[str, Any], overlay: Optional[Dict[str, Any]] = None):
+        """Publish an already encoded full-size JPEG (pool workers, error frames); other variants are derived from it."""
+        parts = {}
+        others = []
+        for name in self.active_variants():
+            if name == OVERLAY:
+                continue
+            if name == DEFAULT_VARIANT:
+                parts[name] = multipart_part(jpeg)
+            else:
+                others.append(self.variants[name])
+        if others:
+            frame = self._decode(jpeg, 0 if any(v.max_width == 0 for v in others) else max(v.max_width for v in others))
+            for variant in others if frame is not None else ():
+                small = encode(frame, variant)
+                if small is not None:
+                    parts[variant.name] = multipart_part(small)
+                    self.encodes[variant.name] += 1
+        if self._shared_wanted():
+            self._share(jpeg, metrics, overlay)
+        self._publish(parts, metrics, overlay)
+
+    def _share(self, jpeg: Optional[bytes], metrics: Dict[str, Any], overlay: Optional[Dict[str, Any]]):
+        payload = shm_frames.pack(jpeg, metrics, overlay)
+        shared = self.shared
+        if payload is None or shared is None:
+            return
+        try:
+            shared.write(payload)
+        except ValueError as e: # Larger than a slot
+            logger.debug(f"Frame not shared: {e}")
+
+    def _decode(self, jpeg: bytes, width_needed: int) -> Optional[np.ndarray]:
+        # libjpeg can decode at 1/2, 1/4 or 1/8 scale for much less work when only small variants are wanted
+        flag, factor = cv2.IMREAD_COLOR, 1
+        if width_needed and self._source_width:
+            for reduction, reduced_flag in _REDUCED_DECODE:
+                if self._source_width // reduction >= width_needed:
+                    flag, factor = reduced_flag, reduction
+                    break
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), flag)
+        if frame is not None:
+            self._source_width = frame.shape[1] * factor
+            self.decodes += 1
+        return frame
+
+    def _publish(self, parts: Dict[str, bytes], metrics: Dict[str, Any], overlay: Optional[Dict[str, Any]] = None):
+        if overlay is not None and self._subscribers[OVERLAY] > 0:
+            parts[OVERLAY] = orjson.dumps({"seq": self.seq + 1, **overlay}) # Serialized once for every overlay viewer
+        with self._cond:
+            self.seq += 1
+            self.parts = parts
+            self.metrics = metrics
+            self.overlay = overlay
+            self.published_at = time.monotonic()
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass # Loop already closed (shutdown)
+
+    def latest(self, variant: str = DEFAULT_VARIANT) -> Tuple[int, Optional[bytes], Dict[str, Any]]:
+        with self._cond:
+            return self.seq, self.parts.get(variant), self.metrics
+
+    async def wait_newer(self, after_seq: int, variant: str = DEFAULT_VARIANT,
+                         timeout: Optional[float] = None) -> Tuple[int, Optional[bytes], Dict[str, Any]]:
+        """
+        Await a frame newer than `after_seq` without blocking the event loop (returns the current
+        one on timeout). The part is None when the frame was published before `variant` had subscribers.
+        """
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._cond:
+            if self.seq > after_seq:
+                return self.seq, self.parts.get(variant), self.metrics
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+        return self.latest(variant)
+
+    async def frames(self, subscriber: StreamSubscriber, stopped: Callable[[], bool] = lambda: False,
+                     timeout: float = 1.0) -> AsyncIterator[bytes]:
+        """
+        Multipart parts for one viewer, newest frame first: frames published while the viewer
+        was sending, or inside its 1/max_fps interval, are skipped and counted. `timeout` bounds
+        how long a wait goes without re-checking `stopped`.
+        """
+        interval = 1.0 / subscriber.max_fps if subscriber.max_fps > 0 else 0.0
+        next_due = 0.0
+        while not stopped():
+            seq, _, _ = await self.wait_newer(subscriber.last_seq, subscriber.variant, timeout=timeout)
+            if seq == subscriber.last_seq:
+                continue
+            if subscriber.last_seq:
+                subscriber.dropped += seq - subscriber.last_seq - 1
+            wait = next_due - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            with self._cond: # Whatever is newest right now, not what was newest when we woke up
+                newest, part, published_at = self.seq, self.parts.get(subscriber.variant), self.published_at
+            if wait > 0:
+                subscriber.capped += newest - seq
+            else:
+                subscriber.dropped += newest - seq
+            subscriber.last_seq = newest
+            if part is None: # Published before this variant had viewers
+                continue
+            started = time.monotonic()
+            next_due = max(next_due + interval, started) if interval else 0.0
+            latency = started - published_at
+            yield part # Resumes once the server has handed the part to the client's socket
+            elapsed = time.monotonic() - started
+            subscriber.sent += 1
+            subscriber.bytes_sent += len(part)
+            subscriber.send_seconds += elapsed
+            subscriber.max_send_seconds = max(subscriber.max_send_seconds, elapsed)
+            subscriber.latency_seconds += latency
+            subscriber.max_latency_seconds = max(subscriber.max_latency_seconds, latency)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            subscribers = dict(self._subscribers)
+            viewers = list(self._viewers)
+        return {"seq": self.seq, "subscribers": subscribers, "encodes": dict(self.encodes), "decodes": self.decodes,
+                "viewers": [viewer.as_dict() for viewer in viewers]}
@@ -0,0 +1,118 @@
+# app/services/frame_scheduler.py
+import os
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+NEAR_THRESHOLD_RATIO = 0.7 # At or above this fraction of the threshold, detect on every frame
+MOTION_THUMB_SIZE = (64, 36)
+FALLBACK_FILE_FPS = 25.0 # For files whose container carries no (or a bogus) frame rate
+
+
+def is_file_source(source) -> bool:
+    """A local video file, as opposed to a device index or a stream URL."""
+    return isinstance(source, str) and "://" not in source and os.path.isfile(source)
+
+
+class SourcePacer:
+    """
+    Holds a video file to its own frame rate (CAP_PROP_FPS). Devices and streams deliver frames
+    in real time by themselves; a file would otherwise be decoded and detected on as fast as
+    the CPU allows, and "every N frames" would stop meaning wall-clock time.
+    """
+
+    def __init__(self, source):
+        self.paced = is_file_source(source)
+        self.period: Optional[float] = None
+        self._next = 0.0
+
+    def wait(self, cap, stop_event) -> None:
+        """Call once per frame read; returns when the frame is due (or at once for live sources)."""
+        if not self.paced:
+            return
+        if self.period is None:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            self.period = 1.0 / (fps if 0 < fps <= 1000 else FALLBACK_FILE_FPS)
+        now = time.monotonic()
+        if now - self._next > self.period: # First frame, or processing fell behind: don't burst to catch up
+            self._next = now
+        elif self._next > now:
+            stop_event.wait(self._next - now)
+        self._next += self.period
+
+
+class AdaptiveFrameScheduler:
+    """
+    Decides, per captured frame, whether a camera runs the detector or reuses its last result.
+
+    The detector runs every `interval` frames (optionally also capped at `target_fps`
+    detections per second). The interval shrinks to `min_interval` as the counted value nears
+    the camera's threshold and doubles towards `max_interval` while the scene is empty.
+    A cheap motion check on a tiny grayscale thumbnail forces a detection early when the
+    scene changes between detections.
+    """
+
+    def __init__(self, min_interval: int = None, max_interval: int = None,
+                 target_fps: float = None, motion_threshold: float = None):
+        self.min_interval = max(1, min_interval or settings.INFERENCE_MIN_FRAME_INTERVAL)
+        self.max_interval = max(self.min_interval, max_interval or settings.INFERENCE_MAX_FRAME_INTERVAL)
+        target_fps = settings.INFERENCE_TARGET_FPS if target_fps is None else target_fps
+        self.min_period = 1.0 / target_fps if target_fps and target_fps > 0 else 0.0
+        self.motion_threshold = settings.INFERENCE_MOTION_THRESHOLD if motion_threshold is None else motion_threshold
+        self.interval = self.min_interval
+        self.frames_since_detection = 0
+        self.last_detection_time = 0.0
+        self._last_thumb: Optional[np.ndarray] = None
+        self.frames_seen = 0
+        self.frames_detected = 0
+
+    @staticmethod
+    def _thumbnail(frame) -> np.ndarray:
+        return cv2.cvtColor(cv2.resize(frame, MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+    def should_detect(self, frame) -> bool:
+        self.frames_seen += 1
+        self.frames_since_detection += 1
+        now = time.monotonic()
+        if self.min_period and now - self.last_detection_time < self.min_period:
+            return False
+        detect = self.frames_since_detection >= self.interval
+        thumb = None
+        if not detect and self.motion_threshold > 0:
+            thumb = self._thumbnail(frame)
+            detect = self._last_thumb is None or float(cv2.absdiff(thumb, self._last_thumb).mean()) >= self.motion_threshold
+        if detect:
+            self.frames_since_detection = 0
+            self.last_detection_time = now
+            self.frames_detected += 1
+            if self.motion_threshold > 0:
+                self._last_thumb = thumb if thumb is not None else self._thumbnail(frame)
+        return detect
+
+    def observe(self, value: float, threshold: Optional[float]):
+        """Feed back the counted value (persons or occupancy) after a detection."""
+        if value <= 0:
+            self.interval = min(self.max_interval, self.interval * 2)
+            return
+        ratio = value / threshold if threshold and threshold > 0 else 1.0
+        if ratio >= NEAR_THRESHOLD_RATIO:
+            self.interval = self.min_interval
+        else:
+            # Linear from max_interval (nearly empty) down to min_interval (near the threshold)
+            span = self.max_interval - self.min_interval
+            self.interval = max(self.min_interval, round(self.max_interval - span * ratio / NEAR_THRESHOLD_RATIO))
+
+    def observe_camera(self, camera_config, person_count: int, current_occupancy: int):
+        """observe() with the value/threshold pair that matters for the camera's mode."""
+        if camera_config.mode == "general":
+            self.observe(person_count, camera_config.crowd_threshold)
+        else:
+            self.observe(max(person_count, current_occupancy), camera_config.occupancy_threshold)
+
+    @property
+    def detection_ratio(self) -> float:
+        return self.frames_detected / self.frames_seen if self.frames_seen else 1.0
@@ -0,0 +1,180 @@
+# app/services/inference_engine.py
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from ultralytics import YOLO
+from app.core.config import settings
+from app.services import roi
+
+logger = logging.getLogger(__name__)
+
+
+def predict_batch(model, frames: Sequence[Any], inputs: Sequence[Optional[Tuple[Any, Optional[tuple], int]]]) -> List[Any]:
+    """
+    Detect people on each frame's detection input (roi.detection_input(): the frame or a view
+    of its ROI crop, plus a predict size). Inputs are batched per predict size and the boxes
+    of cropped inputs are moved back to frame coordinates, so callers always get results for
+    the whole frame. None stands for the whole frame at the default size.
+    """
+    inputs = [item if item is not None else (frame, None, roi.FULL_FRAME_IMGSZ) for frame, item in zip(frames, inputs)]
+    groups: Dict[int, List[int]] = {}
+    for i, (_, _, imgsz) in enumerate(inputs):
+        groups.setdefault(imgsz, []).append(i)
+    results: List[Any] = [None] * len(inputs)
+    for imgsz, indexes in groups.items():
+        # imgsz is always passed: the predictor keeps the last call's size otherwise
+        for i, result in zip(indexes, model.predict([inputs[i][0] for i in indexes], verbose=False, classes=[0], imgsz=imgsz)):
+            results[i] = _to_frame_coords(result, frames[i], inputs[i][1])
+    return results
+
+
+def _to_frame_coords(result, frame, box):
+    if box is None:
+        return result
+    data = result.boxes.data.clone()
+    data[:, [0, 2]] += box[0]
+    data[:, [1, 3]] += box[1]
+    result.orig_img = frame # plot() then draws on the whole frame
+    result.orig_shape = frame.shape[:2] # update() clips the boxes to this shape
+    result.update(boxes=data)
+    return result
+
+
+class FrameSuperseded(Exception):
+    """Raised on a pending request when the same camera submitted a newer frame before the batch ran."""
+
+
+class BatchInferenceScheduler:
+    """
+    Collects the newest frame from each active camera and runs them through the detector as a
+    single batch. A batch is dispatched as soon as max_batch_size cameras are waiting, or
+    max_wait_ms after the oldest pending frame arrived, whichever comes first. Results are
+    split back out per camera through the Future returned by submit().
+    """
+
+    def __init__(self, model, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        # camera_id -> (frame, future, enqueue_time, detection input); only the newest frame per camera is kept
+        self._pending: "OrderedDict[int, Tuple[Any, Future, float, Any]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.batches_run = 0
+        self.frames_run = 0
+        self.frames_superseded = 0
+        self._thread = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, camera_id: int, frame, detection_input=None) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._stopped:
+                future.set_exception(RuntimeError("Inference scheduler stopped"))
+                return future
+            previous = self._pending.pop(camera_id, None)
+            if previous is not None:
+                previous[1].set_exception(FrameSuperseded())
+                self.frames_superseded += 1
+            self._pending[camera_id] = (frame, future, time.monotonic(), detection_input)
+            self._cond.notify()
+        return future
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._cond.notify_all()
+        for _, future, _, _ in pending:
+            future.set_exception(RuntimeError("Inference scheduler stopped"))
+        self._thread.join(timeout=5.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches_run": self.batches_run,
+            "frames_run": self.frames_run,
+            "frames_superseded": self.frames_superseded,
+            "avg_batch_size": (self.frames_run / self.batches_run) if self.batches_run else 0.0,
+            "pending": len(self._pending),
+        }
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                oldest_enqueued = next(iter(self._pending.values()))[2]
+                remaining = oldest_enqueued + self.max_wait - time.monotonic()
+                if len(self._pending) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            if self._stopped:
+                return []
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                camera_id, (frame, future, _, detection_input) = self._pending.popitem(last=False)
+                batch.append((camera_id, frame, future, detection_input))
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                results = predict_batch(self.model, [frame for _, frame, _, _ in batch], [item for _, _, _, item in batch])
+            except Exception as e:
+                logger.error(f"Batched inference failed for {len(batch)} frame(s): {e}")
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.batches_run += 1
+            self.frames_run += len(batch)
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result([result])  # Same shape as model.predict() on a single frame
+
+
+_scheduler: Optional[BatchInferenceScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Optional[BatchInferenceScheduler]:
+    """Lazily start the shared scheduler. It owns a dedicated model instance; tracking happens afterwards in each CameraPipeline."""
+    global _scheduler
+    if not settings.INFERENCE_BATCHING:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            try:
+                model = YOLO(settings.YOLO_MODEL_PATH)
+            except Exception as e:
+                logger.error(f"Error loading YOLO model for batched inference: {e}")
+                return None
+            _scheduler = BatchInferenceScheduler(
+                model,
+                max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+                max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+            )
+        return _scheduler
+
+
+def detect(camera_id: int, frame, detection_input=None, timeout: Optional[float] = None):
+    """Blocking helper for camera workers: queue a frame and wait for its slice of the batch."""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return None
+    return scheduler.submit(camera_id, frame, detection_input).result(timeout=timeout)
+
+
+def shutdown():
+    global _scheduler
+    with _scheduler_lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.stop()
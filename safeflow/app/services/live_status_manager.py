@@ -1,14 +1,107 @@
 # app/services/live_status_manager.py
 import datetime
-from typing import Dict, Any, Optional
+import itertools
+import threading
+import time
+import types
+from typing import Dict, Any, Mapping, NamedTuple, Optional
+
+from app.core.config import settings
+from app.services.status_hub import hub
+from app.services.shm_status import SharedStatusTable
+from app.services.rolling_metrics import RollingMetrics
+
+# In-memory store for live camera statuses: one slotted record per camera, updated in place by
+# its worker under the record's own lock. Readers get an immutable, versioned snapshot:
+# { camera_id: {"person_count": X, "density": Y, "timestamp": Z, "is_over_threshold": Bool, "name": "CamName", "latitude": ..., ...} }
+# The snapshot is rebuilt at most once per change and shared by all readers until the next one.
+
+
+class _CameraStatus:
+    __slots__ = ("lock", "config", "person_count", "density", "current_occupancy",
+                 "entry_count", "exit_count", "timestamp", "is_over_threshold", "person_count_smoothed",
+                 "regions", "metrics", "view")
+
+    def __init__(self, config: Dict[str, Any]):
+        self.lock = threading.Lock()
+        self.config = config # Replaced, never mutated
+        self.person_count = 0
+        self.density = 0.0
+        self.current_occupancy = 0
+        self.entry_count = 0 # Running totals of the tripwire crossings
+        self.exit_count = 0
+        self.timestamp = time.time()
+        self.is_over_threshold = False
+        self.person_count_smoothed = 0.0 # Mean over LIVE_THRESHOLD_WINDOW_SECONDS
+        self.regions = None # Per-ROI [{"name", "person_count", "density"}] for cameras with regions
+        self.metrics = RollingMetrics(_metric_windows())
+        self.view: Optional[Dict[str, Any]] = None # Cached status dict, dropped on every change
+
+    def status(self, shared: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The camera's status dict; `shared` live values from another process win when newer."""
+        view = self.view
+        if view is None:
+            with self.lock:
+                view = {
+                    "person_count": self.person_count,
+                    "density": self.density,
+                    "current_occupancy": self.current_occupancy,
+                    "entry_count": self.entry_count,
+                    "exit_count": self.exit_count,
+                    "timestamp": datetime.datetime.utcfromtimestamp(self.timestamp),
+                    "is_over_threshold": self.is_over_threshold,
+                    "person_count_smoothed": self.person_count_smoothed,
+                    "regions": self.regions,
+                    **self.config # Include config details
+                }
+                self.view = view
+        if shared is not None and shared["timestamp"] > self.timestamp:
+            view = {**view, **shared, "timestamp": datetime.datetime.utcfromtimestamp(shared["timestamp"])}
+        return view
+
+
+class LiveStatusSnapshot(NamedTuple):
+    version: int
+    statuses: Mapping[int, Mapping[str, Any]] # Read-only; do not hold on to it for long
+
+
+_records: Dict[int, _CameraStatus] = {}
+_records_lock = threading.Lock() # Only for adding/removing cameras
+_changes = itertools.count(1)
+_change_id = 0
+_snapshot = LiveStatusSnapshot(0, types.MappingProxyType({}))
+_snapshot_key = None
+_snapshot_lock = threading.Lock()
+_shared: Optional[SharedStatusTable] = None
+_shared_lock = threading.Lock()
+
+
+def _metric_windows():
+    windows = [int(w) for w in settings.LIVE_METRIC_WINDOWS_SECONDS.split(",") if w.strip()]
+    if settings.LIVE_THRESHOLD_WINDOW_SECONDS > 0:
+        windows.append(settings.LIVE_THRESHOLD_WINDOW_SECONDS)
+    return windows or [settings.LIVE_THRESHOLD_WINDOW_SECONDS or 1]
+
+
+def _changed():
+    global _change_id
+    _change_id = next(_changes)
+
+
+def _get_shared() -> Optional[SharedStatusTable]:
+    """Shared-memory table used when LIVE_STATUS_SHM_NAME is set (multiple API processes)."""
+    global _shared
+    if not settings.LIVE_STATUS_SHM_NAME:
+        return None
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = SharedStatusTable(settings.LIVE_STATUS_SHM_NAME, settings.LIVE_STATUS_SHM_CAPACITY)
+    return _shared
 
-# In-memory store for live camera statuses
-# Structure: { camera_id: {"person_count": X, "density": Y, "timestamp": Z, "is_over_threshold": Bool, "name": "CamName", "lat": ..., "lon": ...} }
-_live_camera_statuses: Dict[int, Dict[str, Any]] = {}
-_camera_configs: Dict[int, Any] = {} # To store camera thresholds etc.
 
 def update_camera_config(camera_id: int, config_data: Any): # config_data could be a Pydantic model or dict
-    _camera_configs[camera_id] = {
+    config = {
         "crowd_threshold": config_data.crowd_threshold,
         "occupancy_threshold": config_data.occupancy_threshold, # If applicable
         "name": config_data.name,
@@ -18,55 +111,127 @@ def update_camera_config(camera_id: int, config_data: Any): # config_data could
         "mode": config_data.mode.value if hasattr(config_data.mode, 'value') else config_data.mode,
         "is_active": config_data.is_active
     }
-    # Initialize status if not present
-    if camera_id not in _live_camera_statuses:
-        _live_camera_statuses[camera_id] = {
-            "person_count": 0, "density": 0.0, "current_occupancy": 0,
-            "timestamp": datetime.datetime.utcnow(), "is_over_threshold": False,
-            **_camera_configs[camera_id] # Add config details directly to status for easy access
-        }
+    with _records_lock:
+        record = _records.get(camera_id)
+        if record is None:
+            record = _records[camera_id] = _CameraStatus(config)
+    with record.lock:
+        record.config = config
+        record.view = None
+    _changed()
+    hub.publish(camera_id, record.status()) # Pushes config changes to live clients
 
 
 def remove_camera_config(camera_id: int):
-    if camera_id in _camera_configs:
-        del _camera_configs[camera_id]
-    if camera_id in _live_camera_statuses:
-        del _live_camera_statuses[camera_id]
-
-def update_live_status(camera_id: int, person_count: int, density: float, current_occupancy: int = 0):
-    if camera_id not in _camera_configs or not _camera_configs[camera_id]["is_active"]:
-        return # Don't update status for unknown or inactive cameras
-
-    config = _camera_configs[camera_id]
-    is_over = False
-    if config["mode"] == "general" and person_count > config["crowd_threshold"]:
-        is_over = True
-    elif config["mode"] == "tripwire" and current_occupancy > config["occupancy_threshold"]:
-        is_over = True
-
-    _live_camera_statuses[camera_id] = {
-        "person_count": person_count,
-        "density": density,
-        "current_occupancy": current_occupancy,
-        "timestamp": datetime.datetime.utcnow(),
-        "is_over_threshold": is_over,
-        **config # Include config details
-    }
+    with _records_lock:
+        _records.pop(camera_id, None)
+    shared = _get_shared()
+    if shared is not None:
+        shared.remove(camera_id)
+    _changed()
+    hub.publish_removed(camera_id)
+
+
+def update_live_status(camera_id: int, person_count: int, density: float, current_occupancy: int = 0,
+                       entry_count: int = 0, exit_count: int = 0, regions: Optional[list] = None) -> Optional[float]:
+    # entry_count / exit_count are this frame's crossings; the status keeps running totals.
+    # Returns the smoothed person count the threshold was judged on (None: camera not tracked here)
+    record = _records.get(camera_id)
+    if record is None or not record.config["is_active"]:
+        return None # Don't update status for unknown or inactive cameras
+
+    config = record.config
+    now = time.time()
+    with record.lock:
+        record.metrics.add(now, person_count, entry_count, exit_count)
+        window = settings.LIVE_THRESHOLD_WINDOW_SECONDS
+        smoothed = record.metrics.mean(window) if window > 0 else float(person_count)
+        is_over = False
+        # Crowd counts flicker with detector noise, so they are judged on the rolling mean;
+        # tripwire occupancy is an exact running count and is judged as is
+        if config["mode"] == "general" and smoothed > config["crowd_threshold"]:
+            is_over = True
+        elif config["mode"] == "tripwire" and current_occupancy > config["occupancy_threshold"]:
+            is_over = True
+        record.person_count = person_count
+        record.density = density
+        record.current_occupancy = current_occupancy
+        record.entry_count += entry_count
+        record.exit_count += exit_count
+        record.timestamp = now
+        record.is_over_threshold = is_over
+        record.person_count_smoothed = smoothed
+        record.regions = regions
+        record.view = None
+        entries, exits = record.entry_count, record.exit_count
+    _changed()
+    shared = _get_shared()
+    if shared is not None:
+        shared.write(camera_id, person_count, density, current_occupancy, entries, exits, is_over, smoothed, now)
+    if hub.active: # Only the live fields; config changes are published on their own
+        hub.publish(camera_id, {
+            "person_count": person_count, "density": density, "current_occupancy": current_occupancy,
+            "entry_count": entries, "exit_count": exits,
+            "timestamp": datetime.datetime.utcfromtimestamp(now), "is_over_threshold": is_over,
+            "person_count_smoothed": smoothed, "regions": regions,
+        })
+    return smoothed
     # print(f"Updated live status for Cam ID {camera_id}: {person_count} persons, OverThreshold: {is_over}")
 
 
-def get_all_live_statuses() -> Dict[int, Dict[str, Any]]:
-    # Return a copy to prevent direct modification
-    active_statuses = {
-        cam_id: status for cam_id, status in _live_camera_statuses.items()
-        if cam_id in _camera_configs and _camera_configs[cam_id]["is_active"]
-    }
-    return active_statuses
+def smoothed_person_count(camera_id: int) -> Optional[float]:
+    """The rolling-mean person count of the camera's last update (None for unknown or inactive cameras)."""
+    record = _records.get(camera_id)
+    if record is None or not record.config["is_active"]:
+        return None
+    return record.person_count_smoothed
+
+
+def snapshot() -> LiveStatusSnapshot:
+    """Immutable statuses of all active cameras; the same object is returned until something changes."""
+    global _snapshot, _snapshot_key
+    shared = _get_shared()
+    key = (_change_id, shared.version() if shared is not None else 0)
+    if key == _snapshot_key:
+        return _snapshot
+    with _snapshot_lock:
+        if key != _snapshot_key:
+            shared_rows = shared.read_all() if shared is not None else {}
+            statuses = {
+                cam_id: record.status(shared_rows.get(cam_id))
+                for cam_id, record in list(_records.items())
+                if record.config["is_active"]
+            }
+            _snapshot = LiveStatusSnapshot(_snapshot.version + 1, types.MappingProxyType(statuses))
+            _snapshot_key = key
+        return _snapshot
+
+
+def get_all_live_statuses() -> Mapping[int, Mapping[str, Any]]:
+    # Read-only view; callers must not modify it
+    return snapshot().statuses
+
+def get_live_status(camera_id: int) -> Optional[Mapping[str, Any]]:
+    return snapshot().statuses.get(camera_id)
+
+def get_rolling_metrics(camera_id: Optional[int] = None) -> Dict[int, Dict[str, Dict[str, Any]]]:
+    """Rolling mean/p95/peak/rates per window for one or all active cameras in this process."""
+    now = time.time()
+    records = [(camera_id, _records.get(camera_id))] if camera_id is not None else list(_records.items())
+    result = {}
+    for cam_id, record in records:
+        if record is None or not record.config["is_active"]:
+            continue
+        with record.lock:
+            result[cam_id] = record.metrics.stats(now)
+    return result
 
-def get_live_status(camera_id: int) -> Optional[Dict[str, Any]]:
-    if camera_id in _camera_configs and _camera_configs[camera_id]["is_active"]:
-        return _live_camera_statuses.get(camera_id)
-    return None
+def shutdown():
+    global _shared
+    with _shared_lock:
+        shared, _shared = _shared, None
+    if shared is not None:
+        shared.close()
 
 # Load initial camera configs when the app starts or when cameras are fetched
 # This needs to be called from main.py or when cameras are created/updated/deleted
@@ -75,4 +240,4 @@ def load_initial_camera_configs(db_cameras: list): # pass list of Camera SQLAlch
     for cam in db_cameras:
         if cam.is_active: # Only consider active cameras
              update_camera_config(cam.id, cam) # cam object should have needed attributes
-    print("Live status manager initialized with camera configs.")
\ No newline at end of file
+    print("Live status manager initialized with camera configs.")
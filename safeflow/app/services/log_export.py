@@ -0,0 +1,150 @@
+# app/services/log_export.py
+import csv
+import datetime
+import io
+import json
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from app.db import models
+from app.db.database import ReadSessionLocal
+
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_COLUMNS = ("id", "timestamp", "camera_id", "area_name", "mode",
+                  "person_count", "density", "entry_count", "exit_count")
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+FILE_EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "parquet": "parquet", "arrow": "arrows"}
+
+
+def _chunks(area_name: Optional[str], camera_id: Optional[int], start: Optional[datetime.datetime],
+            end: Optional[datetime.datetime], session_factory) -> Iterator[list]:
+    """
+    Yields lists of plain row tuples in id order. Rows are fetched EXPORT_CHUNK_ROWS at a time
+    from one cursor (yield_per), so memory depends on the chunk size, not on the export size.
+    The generator owns its session: it outlives the request handler while the body streams.
+    """
+    table = models.DetectionLog
+    query = select(*(getattr(table, column) for column in EXPORT_COLUMNS))
+    if area_name:
+        query = query.where(table.area_name == area_name)
+    if camera_id:
+        query = query.where(table.camera_id == camera_id)
+    if start:
+        query = query.where(table.timestamp >= start)
+    if end:
+        query = query.where(table.timestamp < end)
+    query = query.order_by(table.id).execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    db = session_factory()
+    try:
+        for partition in db.execute(query).partitions():
+            yield [
+                (log_id, timestamp, cam_id, area, mode.value if hasattr(mode, "value") else mode,
+                 persons, density, entries, exits)
+                for log_id, timestamp, cam_id, area, mode, persons, density, entries, exits in partition
+            ]
+    finally:
+        db.close()
+
+
+def _ndjson(chunks) -> Iterator[bytes]:
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, (row[0], row[1].isoformat()) + row[2:])), separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode()
+
+
+def _csv(chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows((row[0], row[1].isoformat()) + row[2:] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _DrainableSink:
+    """Write-only file object for pyarrow writers: buffers bytes until drained, keeps the absolute position."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()), ("timestamp", pa.timestamp("us")), ("camera_id", pa.int64()),
+        ("area_name", pa.string()), ("mode", pa.string()), ("person_count", pa.int64()),
+        ("density", pa.float64()), ("entry_count", pa.int64()), ("exit_count", pa.int64()),
+    ])
+
+
+def _columnar(chunks, fmt: str) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    sink = _DrainableSink()
+    stream = pa.PythonFile(sink, mode="w")
+    # One Parquet row group / Arrow record batch per chunk, sent as soon as it is written
+    writer = pq.ParquetWriter(stream, schema) if fmt == "parquet" else pa.ipc.new_stream(stream, schema)
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow # noqa: F401
+        import pyarrow.parquet # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_logs(fmt: str, area_name: Optional[str] = None, camera_id: Optional[int] = None,
+                start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+                session_factory=ReadSessionLocal) -> Iterator[bytes]:
+    """Byte chunks of the export in `fmt` (ndjson, csv, parquet or arrow)."""
+    chunks = _chunks(area_name, camera_id, start, end, session_factory)
+    if fmt == "ndjson":
+        return _ndjson(chunks)
+    if fmt == "csv":
+        return _csv(chunks)
+    return _columnar(chunks, fmt)
@@ -0,0 +1,176 @@
+# app/services/log_retention.py
+import datetime
+import glob
+import os
+import re
+import threading
+import time
+import logging
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.db import models
+from app.db.database import engine, SessionLocal
+from app.services import log_rollup
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE_FORMAT = "detection_logs_{:04d}_{:02d}.db"
+_ARCHIVE_FILE_RE = re.compile(r"detection_logs_(\d{4})_(\d{2})\.db$")
+_SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f" # How SQLAlchemy stores DateTime in SQLite
+# The oldest `?` rows of a time range; the timestamp index (which carries the id) serves the order
+_SLICE_IDS = ("SELECT id FROM main.detection_logs WHERE timestamp >= ? AND timestamp < ? "
+              "ORDER BY timestamp, id LIMIT ?")
+
+
+def _month_start(value: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def _next_month(value: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(value.year + (value.month == 12), value.month % 12 + 1, 1)
+
+
+def _oldest_before(bind, cutoff: datetime.datetime) -> Optional[datetime.datetime]:
+    with bind.connect() as conn:
+        return conn.execute(
+            select(func.min(models.DetectionLog.timestamp)).where(models.DetectionLog.timestamp < cutoff)
+        ).scalar()
+
+
+def _slice_pause(pause_ms: Optional[float]):
+    time.sleep(max(0.0, settings.LOG_RETENTION_SLICE_PAUSE_MS if pause_ms is None else pause_ms) / 1000.0)
+
+
+def archive_expired_logs(bind, cutoff: datetime.datetime, archive_dir: str,
+                         slice_rows: Optional[int] = None, pause_ms: Optional[float] = None) -> int:
+    """
+    Move detection logs older than `cutoff` into one SQLite file per calendar month
+    (detection_logs_YYYY_MM.db in `archive_dir`), so detection_logs itself only holds the
+    live window. Rows move oldest first, `slice_rows` per transaction; the connection goes
+    back to the (one-connection) writer pool between slices, so a first run over months of
+    backlog never holds it for longer than one slice. Returns rows moved.
+    """
+    oldest = _oldest_before(bind, cutoff)
+    if oldest is None:
+        return 0
+    slice_rows = max(1, slice_rows or settings.LOG_RETENTION_SLICE_ROWS)
+    os.makedirs(archive_dir, exist_ok=True)
+    moved = 0
+    month = _month_start(oldest)
+    while month < cutoff:
+        upper = min(_next_month(month), cutoff)
+        params = (month.strftime(_SQLITE_TIMESTAMP_FORMAT), upper.strftime(_SQLITE_TIMESTAMP_FORMAT), slice_rows)
+        path = os.path.join(archive_dir, ARCHIVE_FILE_FORMAT.format(month.year, month.month))
+        while True:
+            with bind.connect() as conn:
+                conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (path,)) # Must run outside a transaction
+                try:
+                    conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS archive.detection_logs AS SELECT * FROM main.detection_logs WHERE 0")
+                    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS archive.ix_detection_logs_timestamp ON detection_logs (timestamp)")
+                    # Same slice in both statements: nothing else writes while this transaction holds the lock
+                    conn.exec_driver_sql(f"INSERT INTO archive.detection_logs SELECT * FROM main.detection_logs WHERE id IN ({_SLICE_IDS})", params)
+                    count = conn.exec_driver_sql(f"DELETE FROM main.detection_logs WHERE id IN ({_SLICE_IDS})", params).rowcount
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.exec_driver_sql("DETACH DATABASE archive")
+            moved += count
+            if count < slice_rows:
+                break
+            _slice_pause(pause_ms)
+        month = _next_month(month)
+    return moved
+
+
+def delete_expired_logs(bind, cutoff: datetime.datetime,
+                        slice_rows: Optional[int] = None, pause_ms: Optional[float] = None) -> int:
+    """Delete detection logs older than `cutoff`, `slice_rows` per transaction. Returns rows deleted."""
+    slice_rows = max(1, slice_rows or settings.LOG_RETENTION_SLICE_ROWS)
+    ids = (select(models.DetectionLog.id).where(models.DetectionLog.timestamp < cutoff)
+           .order_by(models.DetectionLog.timestamp, models.DetectionLog.id).limit(slice_rows))
+    deleted = 0
+    while True:
+        with bind.begin() as conn:
+            count = conn.execute(delete(models.DetectionLog).where(models.DetectionLog.id.in_(ids))).rowcount
+        deleted += count
+        if count < slice_rows:
+            return deleted
+        _slice_pause(pause_ms)
+
+
+def prune_archives(archive_dir: str, keep_months: int, now: Optional[datetime.datetime] = None) -> int:
+    """Delete monthly archive files older than `keep_months` months. Returns files removed."""
+    if keep_months <= 0 or not os.path.isdir(archive_dir):
+        return 0
+    oldest_kept = _month_start(now or datetime.datetime.utcnow())
+    for _ in range(keep_months):
+        oldest_kept = _month_start(oldest_kept - datetime.timedelta(days=1))
+    removed = 0
+    for path in glob.glob(os.path.join(archive_dir, "detection_logs_*.db")):
+        match = _ARCHIVE_FILE_RE.search(os.path.basename(path))
+        if match and datetime.datetime(int(match.group(1)), int(match.group(2)), 1) < oldest_kept:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def apply_retention(bind=None, now: Optional[datetime.datetime] = None) -> dict:
+    """One retention pass using the LOG_RETENTION_* / LOG_ARCHIVE_* / LOG_ROLLUP_* settings."""
+    bind = bind or engine
+    now = now or datetime.datetime.utcnow()
+    rollups_purged = 0
+    if settings.LOG_ROLLUP_MINUTE_RETENTION_DAYS > 0: # Hourly and daily rollups are small and kept
+        db = SessionLocal(bind=bind)
+        try:
+            rollups_purged = log_rollup.purge_buckets(db, "1m", now - datetime.timedelta(days=settings.LOG_ROLLUP_MINUTE_RETENTION_DAYS))
+            db.commit()
+        finally:
+            db.close()
+    if settings.LOG_RETENTION_DAYS <= 0:
+        return {"moved": 0, "deleted": 0, "archives_removed": 0, "rollups_purged": rollups_purged}
+    cutoff = now - datetime.timedelta(days=settings.LOG_RETENTION_DAYS)
+    moved = deleted = 0
+    if settings.LOG_ARCHIVE_DIR and bind.dialect.name == "sqlite":
+        moved = archive_expired_logs(bind, cutoff, settings.LOG_ARCHIVE_DIR)
+    else:
+        deleted = delete_expired_logs(bind, cutoff)
+    archives_removed = prune_archives(settings.LOG_ARCHIVE_DIR, settings.LOG_ARCHIVE_RETENTION_MONTHS, now) \
+        if settings.LOG_ARCHIVE_DIR else 0
+    return {"moved": moved, "deleted": deleted, "archives_removed": archives_removed, "rollups_purged": rollups_purged}
+
+
+_stop_event = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _run():
+    while not _stop_event.is_set():
+        try:
+            result = apply_retention()
+            if any(result.values()):
+                logger.info(f"Detection log retention: {result}")
+        except Exception as e:
+            logger.error(f"Detection log retention failed: {e}")
+        _stop_event.wait(settings.LOG_RETENTION_CHECK_HOURS * 3600)
+
+
+def start():
+    """Run retention in the background every LOG_RETENTION_CHECK_HOURS (no-op when nothing expires)."""
+    global _thread
+    if (settings.LOG_RETENTION_DAYS <= 0 and settings.LOG_ROLLUP_MINUTE_RETENTION_DAYS <= 0) or \
+       (_thread is not None and _thread.is_alive()):
+        return
+    _stop_event.clear()
+    _thread = threading.Thread(target=_run, name="detection-log-retention", daemon=True)
+    _thread.start()
+
+
+def shutdown():
+    _stop_event.set()
+    if _thread is not None:
+        _thread.join(timeout=5.0)
@@ -0,0 +1,216 @@
+# app/services/log_rollup.py
+import datetime
+import threading
+import logging
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS: Dict[str, datetime.timedelta] = {
+    "1m": datetime.timedelta(minutes=1),
+    "1h": datetime.timedelta(hours=1),
+    "1d": datetime.timedelta(days=1),
+}
+AREA_CAMERA_ID = 0 # camera_id of the area-level rollup rows
+DEFAULT_MAX_POINTS = 800 # A month at 1h resolution is 720 buckets
+BACKFILL_CHUNK_ROWS = 5000
+BACKFILL_STATE_ID = 1
+
+
+def bucket_start(timestamp: datetime.datetime, resolution: str) -> datetime.datetime:
+    if resolution == "1m":
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == "1h":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def choose_resolution(start: datetime.datetime, end: datetime.datetime, max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """Finest resolution that covers [start, end) in at most `max_points` buckets."""
+    span = max(end - start, datetime.timedelta(0))
+    for resolution, width in RESOLUTIONS.items():
+        if span / width <= max_points:
+            return resolution
+    return "1d"
+
+
+def aggregate_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fold raw log rows into one partial bucket per (resolution, area, camera, bucket)."""
+    buckets: Dict[Tuple[str, str, int, datetime.datetime], Dict[str, Any]] = {}
+    for row in rows:
+        for resolution in RESOLUTIONS:
+            start = bucket_start(row["timestamp"], resolution)
+            for camera_id in (row["camera_id"], AREA_CAMERA_ID):
+                key = (resolution, row["area_name"], camera_id, start)
+                bucket = buckets.get(key)
+                person_count = row["person_count"] or 0
+                if bucket is None:
+                    buckets[key] = {
+                        "resolution": resolution, "area_name": row["area_name"], "camera_id": camera_id,
+                        "bucket_start": start, "samples": 1,
+                        "person_count_min": person_count, "person_count_max": person_count,
+                        "person_count_sum": person_count, "density_sum": row["density"] or 0.0,
+                        "entry_count_sum": row["entry_count"] or 0, "exit_count_sum": row["exit_count"] or 0,
+                    }
+                else:
+                    bucket["samples"] += 1
+                    bucket["person_count_min"] = min(bucket["person_count_min"], person_count)
+                    bucket["person_count_max"] = max(bucket["person_count_max"], person_count)
+                    bucket["person_count_sum"] += person_count
+                    bucket["density_sum"] += row["density"] or 0.0
+                    bucket["entry_count_sum"] += row["entry_count"] or 0
+                    bucket["exit_count_sum"] += row["exit_count"] or 0
+    return list(buckets.values())
+
+
+def apply_rollups(db: Session, rows: List[Dict[str, Any]]):
+    """Merge a batch of raw log rows into the rollup table (caller commits)."""
+    partials = aggregate_rows(rows)
+    if not partials:
+        return
+    table = models.DetectionLogRollup
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["resolution", "area_name", "camera_id", "bucket_start"],
+        set_={
+            "samples": table.samples + stmt.excluded.samples,
+            "person_count_min": func.min(table.person_count_min, stmt.excluded.person_count_min),
+            "person_count_max": func.max(table.person_count_max, stmt.excluded.person_count_max),
+            "person_count_sum": table.person_count_sum + stmt.excluded.person_count_sum,
+            "density_sum": table.density_sum + stmt.excluded.density_sum,
+            "entry_count_sum": table.entry_count_sum + stmt.excluded.entry_count_sum,
+            "exit_count_sum": table.exit_count_sum + stmt.excluded.exit_count_sum,
+        },
+    )
+    db.execute(stmt, partials)
+
+
+def get_buckets(db: Session, resolution: str, start: datetime.datetime, end: datetime.datetime,
+                area_name: Optional[str] = None, camera_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Buckets in [start, end) for one camera, one area, or all areas summed together."""
+    table = models.DetectionLogRollup
+    columns = [
+        table.bucket_start,
+        func.sum(table.samples).label("samples"),
+        func.min(table.person_count_min).label("person_count_min"),
+        func.max(table.person_count_max).label("person_count_max"),
+        func.sum(table.person_count_sum).label("person_count_sum"),
+        func.sum(table.density_sum).label("density_sum"),
+        func.sum(table.entry_count_sum).label("entry_count"),
+        func.sum(table.exit_count_sum).label("exit_count"),
+    ]
+    query = select(*columns).where(
+        table.resolution == resolution,
+        table.bucket_start >= bucket_start(start, resolution),
+        table.bucket_start < end,
+        table.camera_id == (camera_id if camera_id else AREA_CAMERA_ID),
+    )
+    if area_name:
+        query = query.where(table.area_name == area_name)
+    query = query.group_by(table.bucket_start).order_by(table.bucket_start)
+    buckets = []
+    for row in db.execute(query):
+        samples = row.samples or 0
+        buckets.append({
+            "bucket_start": row.bucket_start,
+            "samples": samples,
+            "person_count_min": row.person_count_min,
+            "person_count_max": row.person_count_max,
+            # Without an area filter, min/max/avg are over the samples of all areas in the bucket
+            "person_count_avg": (row.person_count_sum / samples) if samples else 0.0,
+            "density_avg": (row.density_sum / samples) if samples else 0.0,
+            "entry_count": row.entry_count,
+            "exit_count": row.exit_count,
+        })
+    return buckets
+
+
+def purge_buckets(db: Session, resolution: str, older_than: datetime.datetime) -> int:
+    result = db.execute(delete(models.DetectionLogRollup).where(
+        models.DetectionLogRollup.resolution == resolution,
+        models.DetectionLogRollup.bucket_start < older_than,
+    ))
+    return result.rowcount
+
+
+def backfill(up_to_id: int, session_factory=SessionLocal, last_id: int = 0) -> int:
+    """
+    Fold raw detection logs with last_id < id <= up_to_id into the rollups, in id-ordered chunks.
+    Each chunk commits together with the high-water mark in rollup_backfill, so a chunk is
+    never rolled up twice.
+    """
+    db = session_factory()
+    try:
+        table = models.DetectionLog
+        columns = (table.id, table.timestamp, table.camera_id, table.area_name,
+                   table.person_count, table.density, table.entry_count, table.exit_count)
+        total = 0
+        while last_id < up_to_id:
+            chunk = db.execute(
+                select(*columns).where(table.id > last_id, table.id <= up_to_id).order_by(table.id).limit(BACKFILL_CHUNK_ROWS)
+            ).mappings().all()
+            if not chunk:
+                break
+            apply_rollups(db, chunk)
+            last_id = chunk[-1]["id"]
+            db.execute(update(models.RollupBackfill).where(models.RollupBackfill.id == BACKFILL_STATE_ID)
+                       .values(last_id=last_id))
+            db.commit()
+            total += len(chunk)
+        db.execute(update(models.RollupBackfill).where(models.RollupBackfill.id == BACKFILL_STATE_ID)
+                   .values(last_id=up_to_id)) # Done, even if the last rows were deleted meanwhile
+        db.commit()
+        return total
+    finally:
+        db.close()
+
+
+def backfill_state(db: Session) -> Tuple[int, int]:
+    """
+    (up_to_id, last_id) of the rollup backfill, recorded on first use. The first start with
+    rollups records the current max raw id as the cutoff: rows after it are rolled up by the
+    log writer. A database that already has rollups but no record (from before the record
+    existed) is taken as backfilled.
+    """
+    state = db.get(models.RollupBackfill, BACKFILL_STATE_ID)
+    if state is None:
+        max_id = db.execute(select(func.max(models.DetectionLog.id))).scalar() or 0
+        has_rollups = db.execute(select(models.DetectionLogRollup.id).limit(1)).first() is not None
+        db.execute(sqlite_insert(models.RollupBackfill).values(
+            id=BACKFILL_STATE_ID, up_to_id=max_id, last_id=max_id if has_rollups else 0
+        ).on_conflict_do_nothing(index_elements=["id"]))
+        db.commit()
+        state = db.get(models.RollupBackfill, BACKFILL_STATE_ID)
+    return state.up_to_id, state.last_id
+
+
+def start_backfill(session_factory=SessionLocal):
+    """
+    Build rollups for raw logs that predate them, in the background, resuming from the stored
+    high-water mark after an interrupted run. Call before anything writes logs, so the cutoff
+    recorded on the first start is below every row the log writer rolls up.
+    """
+    db = session_factory()
+    try:
+        up_to_id, last_id = backfill_state(db)
+    finally:
+        db.close()
+    if last_id >= up_to_id:
+        return
+
+    def _run():
+        try:
+            total = backfill(up_to_id, session_factory, last_id=last_id)
+            if last_id:
+                logger.info(f"Resumed detection log rollup backfill after id {last_id}")
+            logger.info(f"Backfilled detection log rollups from {total} raw log rows")
+        except Exception as e:
+            logger.error(f"Detection log rollup backfill failed: {e}")
+    threading.Thread(target=_run, name="detection-log-rollup-backfill", daemon=True).start()
@@ -0,0 +1,242 @@
+# app/services/log_writer.py
+import datetime
+import queue
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional, Callable
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+from app.schemas import log as log_schema
+from app.services import alert_outbox, log_rollup
+
+logger = logging.getLogger(__name__)
+
+_FLUSH_NOW = object() # Queue marker: flush what is buffered without waiting for the interval
+_BATCH_ATTEMPTS = 3 # Flushes a failed row or alert batch is retried in before it is dropped
+
+
+class DetectionLogWriter:
+    """
+    Background sink for detection logs. Producers (camera workers) only enqueue; a single
+    writer thread coalesces rows and bulk-inserts them in one transaction every
+    `batch_size` rows or `flush_interval_ms`, whichever comes first. The queue is bounded:
+    when it is full new rows are dropped and counted rather than stalling the frame loop.
+    Alert state and outbox rows from the alert engine are committed in the same transaction.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval_ms: float = 1000.0):
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval_ms) / 1000.0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._occupancy: Dict[int, int] = {} # camera_id -> latest occupancy, coalesced between flushes
+        self._occupancy_lock = threading.Lock()
+        self._alerts: list = [] # [AlertBatch, attempts], written with the next flush
+        self._alerts_lock = threading.Lock()
+        self._retry_rows: list = [] # (rows, attempts) of failed flushes; writer thread only
+        self._stop_event = threading.Event()
+        self._flushed = threading.Condition()
+        self._flush_generation = 0
+        # Backpressure metrics
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dropped_rows_on_error = 0
+        self.alert_batches = 0
+        self.dropped_alert_batches = 0
+        self.max_queue_depth = 0
+        self.last_flush_ms = 0.0
+        self.last_flush_rows = 0
+        self._thread = threading.Thread(target=self._run, name="detection-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, log: log_schema.DetectionLogCreate, timestamp: Optional[datetime.datetime] = None) -> bool:
+        row = log.dict()
+        row["timestamp"] = timestamp or datetime.datetime.utcnow() # Time of detection, not of the flush
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return True
+
+    def submit_occupancy(self, camera_id: int, occupancy: int):
+        """Persist a tripwire camera's live occupancy with the next flush (only the latest value is written)."""
+        with self._occupancy_lock:
+            self._occupancy[camera_id] = occupancy
+
+    def submit_alerts(self, batch: "alert_outbox.AlertBatch"):
+        """Write an alert engine batch (state + outbox rows) with the next flush, which is requested now."""
+        with self._alerts_lock:
+            self._alerts.append([batch, 0])
+        try:
+            self._queue.put_nowait(_FLUSH_NOW)
+        except queue.Full:
+            pass # A full queue flushes on its own
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ask the writer thread to flush now and wait until it has."""
+        with self._flushed:
+            generation = self._flush_generation
+        try:
+            self._queue.put(_FLUSH_NOW, timeout=timeout)
+        except queue.Full:
+            return False
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._flush_generation > generation, timeout=timeout)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "max_queue_depth": self.max_queue_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "retry_rows": sum(len(rows) for rows, _ in list(self._retry_rows)),
+            "dropped_rows_on_error": self.dropped_rows_on_error,
+            "alert_batches": self.alert_batches,
+            "dropped_alert_batches": self.dropped_alert_batches,
+            "avg_batch_size": (self.written / self.batches) if self.batches else 0.0,
+            "last_flush_ms": self.last_flush_ms,
+            "last_flush_rows": self.last_flush_rows,
+        }
+
+    def _write_batch(self, rows, attempts: int = 0):
+        with self._occupancy_lock:
+            occupancy, self._occupancy = self._occupancy, {}
+        with self._alerts_lock:
+            alerts, self._alerts = self._alerts, []
+        if not rows and not occupancy and not alerts:
+            return
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            if rows:
+                db.execute(insert(models.DetectionLog), rows)
+                log_rollup.apply_rollups(db, rows) # Same transaction: rollups never drift from the raw rows
+            for camera_id, value in occupancy.items():
+                db.execute(update(models.Camera).where(models.Camera.id == camera_id).values(current_occupancy=value))
+            for batch, _ in alerts:
+                alert_outbox.write_alert_batch(db, batch)
+            db.commit()
+            self.alert_batches += len(alerts)
+            self.written += len(rows)
+            self.batches += 1
+            self.last_flush_rows = len(rows)
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            db.rollback()
+            self.failed_batches += 1
+            logger.error(f"Failed to write {len(rows)} detection log(s): {e}")
+            with self._occupancy_lock:
+                for camera_id, value in occupancy.items():
+                    self._occupancy.setdefault(camera_id, value) # A value submitted since is newer and wins
+            if rows:
+                if attempts + 1 < _BATCH_ATTEMPTS:
+                    self._retry_rows.append((rows, attempts + 1))
+                else:
+                    self.dropped_rows_on_error += len(rows)
+                    logger.error(f"Dropped {len(rows)} detection log(s) after {attempts + 1} failed writes")
+            retry = []
+            for entry in alerts:
+                entry[1] += 1
+                if entry[1] < _BATCH_ATTEMPTS:
+                    retry.append(entry)
+                else:
+                    self.dropped_alert_batches += 1
+                    logger.error(f"Dropped alert batch with {len(entry[0].messages)} notification(s) after {entry[1]} failed writes")
+            with self._alerts_lock:
+                self._alerts[:0] = retry
+            return
+        finally:
+            db.close()
+        if alerts:
+            alert_outbox.wake()
+
+    def _run(self):
+        rows = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            stopping = self._stop_event.is_set()
+            flush_requested = False
+            try:
+                item = self._queue.get(timeout=max(0.0, min(deadline - time.monotonic(), 0.25)))
+                if item is _FLUSH_NOW:
+                    flush_requested = True
+                else:
+                    rows.append(item)
+            except queue.Empty:
+                pass
+            if stopping: # Drain everything still queued before the final flush
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _FLUSH_NOW:
+                        rows.append(item)
+            if flush_requested or stopping or len(rows) >= self.batch_size or time.monotonic() >= deadline:
+                retry, self._retry_rows = self._retry_rows, []
+                for batch_rows, attempts in retry: # Oldest rows first
+                    self._write_batch(batch_rows, attempts)
+                for start in range(0, len(rows), self.batch_size):
+                    self._write_batch(rows[start:start + self.batch_size])
+                if not rows and not retry:
+                    self._write_batch(rows) # Occupancy/alert-only flush
+                rows = []
+                if stopping and self._retry_rows: # No later flush to retry them in
+                    lost = sum(len(batch_rows) for batch_rows, _ in self._retry_rows)
+                    self.dropped_rows_on_error += lost
+                    self._retry_rows = []
+                    logger.error(f"Dropped {lost} detection log(s) that failed to write before shutdown")
+                deadline = time.monotonic() + self.flush_interval
+                with self._flushed:
+                    self._flush_generation += 1
+                    self._flushed.notify_all()
+                if stopping:
+                    return
+
+
+_writer: Optional[DetectionLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> DetectionLogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DetectionLogWriter(
+                max_queue=settings.LOG_WRITER_MAX_QUEUE,
+                batch_size=settings.LOG_WRITER_BATCH_SIZE,
+                flush_interval_ms=settings.LOG_WRITER_FLUSH_MS,
+            )
+        return _writer
+
+
+def shutdown():
+    """Flush everything still queued and stop the writer thread."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
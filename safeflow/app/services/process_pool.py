@@ -0,0 +1,327 @@
+# app/services/process_pool.py
+import os
+import queue
+import threading
+import time
+import logging
+import multiprocessing as mp
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, Callable
+
+import cv2
+
+from app.core.config import settings
+from app.services import frame_publisher, frame_scheduler
+from app.services.shm_ring import SharedFrameRing
+
+logger = logging.getLogger(__name__)
+
+# Keep module-level imports light: spawned capture processes import this module too,
+# and only inference workers should load the YOLO model (via video_processing).
+_ctx = mp.get_context("spawn")
+
+IDLE_SLEEP_SECONDS = 0.002
+REOPEN_DELAY_SECONDS = 1.0
+
+
+def ring_names(camera_id: int):
+    prefix = f"sf{os.getpid()}_c{camera_id}"
+    return f"{prefix}_in", f"{prefix}_out"
+
+
+def camera_config_dict(db_camera) -> Dict[str, Any]:
+    """Plain, picklable subset of a Camera row that the pipeline needs in a worker process."""
+    return {
+        "id": db_camera.id,
+        "source": db_camera.source,
+        "mode": db_camera.mode.value if hasattr(db_camera.mode, "value") else db_camera.mode,
+        "crowd_threshold": db_camera.crowd_threshold,
+        "occupancy_threshold": db_camera.occupancy_threshold,
+        "area_sq_meters": db_camera.area_sq_meters,
+        "current_occupancy": db_camera.current_occupancy or 0,
+        "tripwire_line_x1": db_camera.tripwire_line_x1,
+        "tripwire_line_y1": db_camera.tripwire_line_y1,
+        "tripwire_line_x2": db_camera.tripwire_line_x2,
+        "tripwire_line_y2": db_camera.tripwire_line_y2,
+        "tripwire_lines": db_camera.tripwire_lines,
+        "render_mode": frame_publisher.render_mode(db_camera),
+        "roi_regions": db_camera.roi_regions,
+    }
+
+
+# --- Child process entry points ---
+
+def _capture_main(camera_id: int, source, frame_ring_name: str, event_queue, stop_event):
+    """Capture process: decode frames from one camera into its shared-memory frame ring."""
+    ring = SharedFrameRing(frame_ring_name)
+    try:
+        cap = cv2.VideoCapture(source)
+        pacer = frame_scheduler.SourcePacer(source)
+        while not stop_event.is_set():
+            if not cap.isOpened():
+                event_queue.put({"camera_id": camera_id, "error": f"Error: Cannot open camera {source}"})
+                stop_event.wait(REOPEN_DELAY_SECONDS)
+                cap.release()
+                cap = cv2.VideoCapture(source)
+                continue
+            success, frame = cap.read()
+            if not success:
+                cap.release()
+                stop_event.wait(REOPEN_DELAY_SECONDS)
+                cap = cv2.VideoCapture(source)
+                continue
+            pacer.wait(cap, stop_event)
+            if frame.nbytes > ring.capacity:
+                scale = (ring.capacity / frame.nbytes) ** 0.5
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            ring.write(frame)
+        cap.release()
+    finally:
+        ring.close()
+
+
+def _inference_worker_main(worker_index: int, command_queue, event_queue, stop_event):
+    """
+    Inference worker process: runs CameraPipelines for the cameras assigned to it. Each round
+    it takes the newest frame of every assigned camera from the frame rings, batches the ones
+    due for detection through its own model, and writes the annotated JPEG to the camera's
+    output ring. Only small metric dicts travel over the event queue.
+    """
+    from app.services import video_processing, frame_scheduler, inference_engine # Loads the model in this process only
+
+    cameras: Dict[int, SimpleNamespace] = {}
+    jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, frame_publisher.VARIANTS[frame_publisher.DEFAULT_VARIANT].quality]
+    while not stop_event.is_set():
+        try:
+            while True:
+                command, camera_id, payload = command_queue.get_nowait()
+                if command == "add":
+                    config, frame_ring_name, out_ring_name = payload
+                    cameras[camera_id] = SimpleNamespace(
+                        config=SimpleNamespace(**config),
+                        frame_ring=SharedFrameRing(frame_ring_name),
+                        out_ring=SharedFrameRing(out_ring_name),
+                        pipeline=video_processing.CameraPipeline(camera_id),
+                        scheduler=frame_scheduler.AdaptiveFrameScheduler(),
+                        last_seq=0,
+                    )
+                elif command == "update" and camera_id in cameras:
+                    cameras[camera_id].config = SimpleNamespace(**payload)
+                elif command == "remove" and camera_id in cameras:
+                    cam = cameras.pop(camera_id)
+                    cam.frame_ring.close()
+                    cam.out_ring.close()
+        except queue.Empty:
+            pass
+
+        ready = []
+        for cam in cameras.values():
+            seq, frame = cam.frame_ring.read_latest(cam.last_seq)
+            if frame is None:
+                continue
+            dropped = seq - cam.last_seq - 1 if cam.last_seq else 0
+            cam.last_seq = seq
+            ready.append((cam, frame, dropped, cam.scheduler.should_detect(frame)))
+        if not ready:
+            time.sleep(IDLE_SLEEP_SECONDS)
+            continue
+
+        started = time.perf_counter()
+        to_detect = [(frame, cam.pipeline.detection_input(frame, cam.config)) for cam, frame, _, detect in ready if detect]
+        batch_results = iter([])
+        if to_detect and video_processing.yolo_model:
+            try:
+                batch_results = iter(inference_engine.predict_batch(video_processing.yolo_model, *zip(*to_detect))) # ROI crops, in frame coordinates
+            except Exception as e:
+                logger.error(f"Inference worker {worker_index}: batched predict failed: {e}")
+        for cam, frame, dropped, detect in ready:
+            config = cam.config
+            render_mode = frame_publisher.render_mode(config)
+            render = render_mode == frame_publisher.RENDER_ANNOTATED
+            if detect:
+                result = next(batch_results, None)
+                out = cam.pipeline.process(frame, config, db_camera_obj=config,
+                                           results=[result] if result is not None else None, render=render)
+                cam.scheduler.observe_camera(config, out[1], out[7])
+            else:
+                out = cam.pipeline.reuse_last(frame, config, db_camera_obj=config, render=render)
+            processed_frame, persons, density, entries, exits, alert, alert_msg, occupancy = out
+            out_seq = None # Headless cameras skip encoding entirely
+            if render_mode != frame_publisher.RENDER_HEADLESS:
+                ok, encoded_image = cv2.imencode('.jpg', processed_frame, jpeg_params) # Smaller variants are derived in the API process
+                if ok:
+                    out_seq = cam.out_ring.write(encoded_image)
+                else: # The metrics still go out: counts, crossings and alerts don't depend on the picture
+                    logger.error(f"Inference worker {worker_index}: JPEG encoding failed for camera {config.id}")
+            event_queue.put({
+                "camera_id": config.id,
+                "out_seq": out_seq,
+                "overlay": cam.pipeline.last_overlay,
+                "worker": worker_index,
+                "process_ms": (time.perf_counter() - started) * 1000 / len(ready),
+                "metrics": {
+                    "person_count": persons,
+                    "density": density,
+                    "entry_count": entries,
+                    "exit_count": exits,
+                    "current_occupancy": occupancy,
+                    "alert": alert,
+                    "alert_message": alert_msg,
+                    "detected": detect,
+                    "detect_interval": cam.scheduler.interval,
+                    "frames_dropped": dropped,
+                    "regions": cam.pipeline.region_counts(),
+                    "timestamp": time.time(),
+                },
+            })
+
+    for cam in cameras.values():
+        cam.frame_ring.close()
+        cam.out_ring.close()
+
+
+# --- Parent-side pool ---
+
+class InferenceProcessPool:
+    """
+    N inference worker processes plus one capture process per camera, connected through
+    shared-memory rings. Cameras are assigned to the least-loaded worker, where load is the
+    sum of the recent per-frame processing time of the worker's cameras (camera count
+    breaks ties and covers cameras that have not reported yet).
+    """
+
+    def __init__(self, n_workers: int):
+        self.n_workers = max(1, n_workers)
+        self._stop_event = _ctx.Event()
+        self.event_queue = _ctx.Queue()
+        self._command_queues = [_ctx.Queue() for _ in range(self.n_workers)]
+        self._workers = [
+            _ctx.Process(target=_inference_worker_main, args=(i, self._command_queues[i], self.event_queue, self._stop_event),
+                         name=f"inference-worker-{i}", daemon=True)
+            for i in range(self.n_workers)
+        ]
+        for proc in self._workers:
+            proc.start()
+        self._lock = threading.Lock()
+        self._assignments: Dict[int, int] = {} # camera_id -> worker index
+        self._camera_load_ms: Dict[int, float] = {}
+        self._cameras: Dict[int, SimpleNamespace] = {}
+        self._handlers: Dict[int, Callable[[Dict[str, Any]], None]] = {}
+        self._pump = threading.Thread(target=self._pump_events, name="inference-pool-events", daemon=True)
+        self._pump.start()
+
+    def _least_loaded_worker(self) -> int:
+        load = [0.0] * self.n_workers
+        count = [0] * self.n_workers
+        for camera_id, worker_index in self._assignments.items():
+            load[worker_index] += self._camera_load_ms.get(camera_id, 0.0)
+            count[worker_index] += 1
+        return min(range(self.n_workers), key=lambda i: (load[i], count[i]))
+
+    def add_camera(self, db_camera, handler: Callable[[Dict[str, Any]], None]) -> SharedFrameRing:
+        """Start capture for a camera, assign it to a worker and return its output ring."""
+        camera_id = db_camera.id
+        self.remove_camera(camera_id)
+        config = camera_config_dict(db_camera)
+        frame_ring_name, out_ring_name = ring_names(camera_id)
+        frame_ring = SharedFrameRing(frame_ring_name, settings.SHM_RING_SLOTS, settings.SHM_MAX_FRAME_BYTES, create=True)
+        out_ring = SharedFrameRing(out_ring_name, settings.SHM_RING_SLOTS, settings.SHM_MAX_JPEG_BYTES, create=True)
+        try:
+            source = int(config["source"])
+        except (TypeError, ValueError):
+            source = config["source"]
+        capture_stop = _ctx.Event()
+        capture = _ctx.Process(target=_capture_main, args=(camera_id, source, frame_ring_name, self.event_queue, capture_stop),
+                               name=f"capture-{camera_id}", daemon=True)
+        capture.start()
+        with self._lock:
+            worker_index = self._least_loaded_worker()
+            self._assignments[camera_id] = worker_index
+            self._handlers[camera_id] = handler
+            self._cameras[camera_id] = SimpleNamespace(frame_ring=frame_ring, out_ring=out_ring,
+                                                       capture=capture, capture_stop=capture_stop)
+        self._command_queues[worker_index].put(("add", camera_id, (config, frame_ring_name, out_ring_name)))
+        logger.info(f"Camera {camera_id} assigned to inference worker {worker_index}")
+        return out_ring
+
+    def update_camera(self, db_camera):
+        with self._lock:
+            worker_index = self._assignments.get(db_camera.id)
+        if worker_index is not None:
+            self._command_queues[worker_index].put(("update", db_camera.id, camera_config_dict(db_camera)))
+
+    def remove_camera(self, camera_id: int):
+        with self._lock:
+            worker_index = self._assignments.pop(camera_id, None)
+            cam = self._cameras.pop(camera_id, None)
+            self._handlers.pop(camera_id, None)
+            self._camera_load_ms.pop(camera_id, None)
+        if worker_index is not None:
+            self._command_queues[worker_index].put(("remove", camera_id, None))
+        if cam is not None:
+            cam.capture_stop.set()
+            cam.capture.join(timeout=2.0)
+            if cam.capture.is_alive():
+                cam.capture.terminate()
+            cam.frame_ring.close()
+            cam.out_ring.close()
+
+    def worker_loads(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            loads = {i: {"cameras": [], "load_ms": 0.0} for i in range(self.n_workers)}
+            for camera_id, worker_index in self._assignments.items():
+                loads[worker_index]["cameras"].append(camera_id)
+                loads[worker_index]["load_ms"] += self._camera_load_ms.get(camera_id, 0.0)
+            return loads
+
+    def _pump_events(self):
+        while not self._stop_event.is_set():
+            try:
+                event = self.event_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            camera_id = event["camera_id"]
+            with self._lock:
+                handler = self._handlers.get(camera_id)
+                if "process_ms" in event and camera_id in self._assignments:
+                    previous = self._camera_load_ms.get(camera_id, event["process_ms"])
+                    self._camera_load_ms[camera_id] = 0.9 * previous + 0.1 * event["process_ms"]
+            if handler is not None:
+                try:
+                    handler(event)
+                except Exception as e:
+                    logger.error(f"Error handling inference event for camera {camera_id}: {e}")
+
+    def stop(self):
+        for camera_id in list(self._assignments):
+            self.remove_camera(camera_id)
+        self._stop_event.set()
+        for proc in self._workers:
+            proc.join(timeout=5.0)
+            if proc.is_alive():
+                proc.terminate()
+        self._pump.join(timeout=2.0)
+
+
+_pool: Optional[InferenceProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> Optional[InferenceProcessPool]:
+    global _pool
+    if settings.INFERENCE_WORKER_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferenceProcessPool(settings.INFERENCE_WORKER_PROCESSES)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop()
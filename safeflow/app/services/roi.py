@@ -0,0 +1,111 @@
+# app/services/roi.py
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CROP_PADDING_PX = 32 # Context kept around the regions so people on their edge are still detected whole
+MIN_CROP_SAVING = 0.15 # Crop only when it drops at least this share of the frame's pixels
+FULL_FRAME_IMGSZ = 640 # ultralytics' default predict size (longest side), used for whole frames
+IMGSZ_STRIDE = 32
+
+
+class RegionSet:
+    """
+    The region-of-interest polygons of one camera. contains() tests points against each
+    polygon with the even-odd rule, one vectorized NumPy pass over all points x edges per polygon;
+    crop_box() is the padded bounding rectangle of all polygons, the part of the frame the
+    detector needs to see.
+    """
+
+    def __init__(self, regions: Sequence[Dict[str, Any]]):
+        self.names = [region.get("name") or f"Region {i + 1}" for i, region in enumerate(regions)]
+        self.polygons = [np.asarray(region["points"], dtype=np.float64).reshape(-1, 2) for region in regions]
+        self.areas = [region.get("area_sq_meters") for region in regions]
+        self.key = regions_key(regions)
+        self._crop_cache: Dict[Tuple[int, int], Optional[Tuple[int, int, int, int]]] = {}
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """Membership of each point (N x 2) in each region -> (N x R) bool."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        inside = np.zeros((len(points), len(self.polygons)), dtype=bool)
+        if len(points) == 0:
+            return inside
+        x, y = points[:, 0:1], points[:, 1:2] # (N, 1)
+        for r, polygon in enumerate(self.polygons):
+            x1, y1 = polygon[:, 0], polygon[:, 1] # (M,) edge starts
+            x2, y2 = np.roll(x1, -1), np.roll(y1, -1) # Edge ends
+            straddles = (y1 > y) != (y2 > y) # (N, M): edge spans the point's horizontal ray
+            dy = np.where(y2 != y1, y2 - y1, 1.0)
+            x_at_y = x1 + (y - y1) * (x2 - x1) / dy
+            inside[:, r] = np.count_nonzero(straddles & (x < x_at_y), axis=1) % 2 == 1
+        return inside
+
+    def crop_box(self, width: int, height: int, padding: int = CROP_PADDING_PX) -> Optional[Tuple[int, int, int, int]]:
+        """(x0, y0, x1, y1) to run detection on, or None when cropping would not save enough."""
+        cached = self._crop_cache.get((width, height), False)
+        if cached is not False:
+            return cached
+        box = None
+        if self.polygons:
+            corners = np.vstack(self.polygons)
+            x0 = int(max(0, math.floor(corners[:, 0].min()) - padding))
+            y0 = int(max(0, math.floor(corners[:, 1].min()) - padding))
+            x1 = int(min(width, math.ceil(corners[:, 0].max()) + padding))
+            y1 = int(min(height, math.ceil(corners[:, 1].max()) + padding))
+            if x1 > x0 and y1 > y0 and (x1 - x0) * (y1 - y0) <= (1.0 - MIN_CROP_SAVING) * width * height:
+                box = (x0, y0, x1, y1)
+        self._crop_cache[(width, height)] = box
+        return box
+
+    def counts(self, inside: np.ndarray) -> List[Dict[str, Any]]:
+        """Per-region person count and density (None without an area) from a contains() matrix."""
+        per_region = inside.sum(axis=0) if inside.size else np.zeros(len(self.polygons), dtype=int)
+        return [{"name": name, "person_count": int(count),
+                 "density": round(int(count) / area, 3) if area else None}
+                for name, count, area in zip(self.names, per_region.tolist(), self.areas)]
+
+    def total_area(self) -> Optional[float]:
+        """Sum of the region areas, or None unless every region has one."""
+        if not self.areas or any(not area for area in self.areas):
+            return None
+        return float(sum(self.areas))
+
+
+def regions_key(regions: Sequence[Dict[str, Any]]) -> tuple:
+    return tuple((region.get("name"), tuple(map(tuple, region["points"])), region.get("area_sq_meters")) for region in regions)
+
+
+def camera_regions(camera_config) -> List[Dict[str, Any]]:
+    """Valid ROI polygons stored on the camera (at least three points each)."""
+    regions = []
+    for region in getattr(camera_config, "roi_regions", None) or []:
+        points = region.get("points") or []
+        if len(points) >= 3 and all(len(point) == 2 for point in points):
+            regions.append(region)
+    return regions
+
+
+def inference_imgsz(crop_width: int, crop_height: int, frame_width: int, frame_height: int,
+                    full_imgsz: int = FULL_FRAME_IMGSZ) -> int:
+    """
+    Predict size for a crop at the same scale the whole frame would be detected at: the
+    detector then sees people at the resolution it always did, and its cost follows the
+    crop's pixels instead of being letterboxed back up to full_imgsz.
+    """
+    scale = full_imgsz / max(frame_width, frame_height) # Small frames are scaled up to full_imgsz too
+    longest = max(crop_width, crop_height) * scale
+    return int(min(full_imgsz, max(IMGSZ_STRIDE * 2, math.ceil(longest / IMGSZ_STRIDE) * IMGSZ_STRIDE)))
+
+
+def detection_input(frame: np.ndarray, regions: Optional[RegionSet]) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]], int]:
+    """(image for the detector, crop box or None, predict size): a view of the ROI crop, or the whole frame."""
+    height, width = frame.shape[:2]
+    box = regions.crop_box(width, height) if regions else None
+    if box is None:
+        return frame, None, FULL_FRAME_IMGSZ
+    x0, y0, x1, y1 = box
+    return frame[y0:y1, x0:x1], box, inference_imgsz(x1 - x0, y1 - y0, width, height)
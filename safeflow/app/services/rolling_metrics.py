@@ -0,0 +1,104 @@
+# app/services/rolling_metrics.py
+from typing import Dict, Any, Sequence
+
+
+class RollingMetrics:
+    """
+    Rolling-window statistics of one camera's person counts and tripwire crossings.
+
+    Samples are folded into one bucket per second in fixed-size rings that span the longest
+    window, so memory is constant whatever the uptime. Each window keeps running totals that
+    are adjusted as seconds enter and leave it, which makes add() and mean() O(1) amortized.
+    peak and p95 scan the window's buckets on read; p95 is taken over the per-second means.
+    Not thread-safe: the owner serializes access.
+    """
+
+    __slots__ = ("windows", "size", "_second", "_samples", "_sums", "_peaks", "_entries", "_exits",
+                 "_totals", "_current", "_first")
+
+    def __init__(self, windows: Sequence[int] = (10, 60, 300)):
+        self.windows = tuple(sorted({max(1, int(w)) for w in windows}))
+        self.size = self.windows[-1]
+        self._second = [-1] * self.size # Which second each ring slot currently holds
+        self._samples = [0] * self.size
+        self._sums = [0] * self.size
+        self._peaks = [0] * self.size
+        self._entries = [0] * self.size
+        self._exits = [0] * self.size
+        self._totals = {w: [0, 0, 0, 0] for w in self.windows} # samples, sum, entries, exits
+        self._current = None # Newest second seen
+        self._first = None # First second seen, to rate over the covered span only
+
+    def _advance(self, second: int):
+        """Move the newest second forward, expiring buckets that fall out of each window."""
+        if self._current is None:
+            self._current = self._first = second
+            return
+        if second <= self._current:
+            return
+        if second - self._current >= self.size: # Idle longer than the longest window
+            for totals in self._totals.values():
+                totals[:] = (0, 0, 0, 0)
+        else:
+            for w, totals in self._totals.items():
+                for expired in range(self._current - w + 1, second - w + 1):
+                    slot = expired % self.size
+                    if self._second[slot] == expired:
+                        totals[0] -= self._samples[slot]
+                        totals[1] -= self._sums[slot]
+                        totals[2] -= self._entries[slot]
+                        totals[3] -= self._exits[slot]
+        self._current = second
+
+    def add(self, timestamp: float, person_count: int, entries: int = 0, exits: int = 0):
+        second = int(timestamp)
+        self._advance(second)
+        if second <= self._current - self.size:
+            return # Older than every window
+        slot = second % self.size
+        if self._second[slot] != second:
+            self._second[slot] = second
+            self._samples[slot] = self._sums[slot] = self._peaks[slot] = self._entries[slot] = self._exits[slot] = 0
+        self._samples[slot] += 1
+        self._sums[slot] += person_count
+        if person_count > self._peaks[slot]:
+            self._peaks[slot] = person_count
+        self._entries[slot] += entries
+        self._exits[slot] += exits
+        for w, totals in self._totals.items():
+            if second > self._current - w:
+                totals[0] += 1
+                totals[1] += person_count
+                totals[2] += entries
+                totals[3] += exits
+
+    def mean(self, window: int) -> float:
+        """Mean person count over the last `window` seconds (a configured window)."""
+        samples, total = self._totals[window][0], self._totals[window][1]
+        return total / samples if samples else 0.0
+
+    def window_stats(self, window: int, now: float) -> Dict[str, Any]:
+        self._advance(int(now))
+        samples, total, entries, exits = self._totals[window]
+        per_second = []
+        peak = 0
+        for second in range(self._current - window + 1, self._current + 1):
+            slot = second % self.size
+            if self._second[slot] == second and self._samples[slot]:
+                per_second.append(self._sums[slot] / self._samples[slot])
+                peak = max(peak, self._peaks[slot])
+        per_second.sort()
+        p95 = per_second[min(len(per_second) - 1, int(0.95 * len(per_second)))] if per_second else 0.0
+        covered = max(1, min(window, self._current - self._first + 1)) if self._first is not None else window
+        return {
+            "samples": samples,
+            "mean": total / samples if samples else 0.0,
+            "p95": p95,
+            "peak": peak,
+            "entries_per_minute": entries * 60.0 / covered,
+            "exits_per_minute": exits * 60.0 / covered,
+        }
+
+    def stats(self, now: float) -> Dict[str, Dict[str, Any]]:
+        """Stats for every configured window, keyed like "10s", "60s", "300s"."""
+        return {f"{w}s": self.window_stats(w, now) for w in self.windows}
@@ -0,0 +1,76 @@
+# app/services/shm_frames.py
+import logging
+import struct
+from multiprocessing import resource_tracker
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from app.core.config import settings
+from app.services.shm_ring import SharedFrameRing
+
+logger = logging.getLogger(__name__)
+
+# Latest frame of each camera for the API processes that don't run it (see RUN_BACKGROUND_SERVICES).
+# Payload: [meta length][orjson {"metrics", "overlay"}][full-size JPEG, absent for headless cameras]
+_META_LENGTH = struct.Struct("<I")
+MAX_META_BYTES = 256 * 1024
+SLOTS = 2 # Readers only ever want the newest frame
+READER_TIMEOUT_SECONDS = 5.0 # The owner stops writing this long after the last reader went away
+
+
+def ring_name(camera_id: int) -> Optional[str]:
+    if not settings.LIVE_STATUS_SHM_NAME:
+        return None
+    return f"{settings.LIVE_STATUS_SHM_NAME}_frames_{camera_id}"
+
+
+def create(camera_id: int) -> Optional[SharedFrameRing]:
+    """The owner's ring for a camera (replacing a stale one); None when frames are not shared."""
+    name = ring_name(camera_id)
+    if name is None:
+        return None
+    try:
+        return SharedFrameRing(name, SLOTS, settings.SHM_MAX_JPEG_BYTES + MAX_META_BYTES, create=True)
+    except OSError as e:
+        logger.error(f"Could not share frames of camera {camera_id}: {e}")
+        return None
+
+
+def attach(camera_id: int) -> Optional[SharedFrameRing]:
+    """A reader's view of the owner's ring; None while the owner is not running the camera."""
+    name = ring_name(camera_id)
+    if name is None:
+        return None
+    try:
+        ring = SharedFrameRing(name)
+    except (FileNotFoundError, ValueError): # ValueError: created but not sized yet
+        return None
+    # Attaching registers the segment with this process's resource tracker, which would unlink
+    # it when this process exits while the owner still writes to it
+    resource_tracker.unregister(ring.shm._name, "shared_memory")
+    if ring.slots == 0: # Header not written yet
+        ring.close()
+        return None
+    return ring
+
+
+def pack(jpeg: Optional[bytes], metrics: Dict[str, Any], overlay: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    try:
+        meta = orjson.dumps({"metrics": metrics, "overlay": overlay}, option=orjson.OPT_SERIALIZE_NUMPY)
+    except TypeError as e:
+        logger.debug(f"Frame metadata not shareable: {e}")
+        return None
+    if len(meta) > MAX_META_BYTES:
+        return None
+    return _META_LENGTH.pack(len(meta)) + meta + (jpeg or b"")
+
+
+def unpack(payload: bytes) -> Optional[Tuple[Optional[bytes], Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """(jpeg or None, metrics, overlay); None for a payload torn by a worker handing the ring over."""
+    try:
+        (length,) = _META_LENGTH.unpack_from(payload)
+        meta = orjson.loads(payload[_META_LENGTH.size:_META_LENGTH.size + length])
+        return payload[_META_LENGTH.size + length:] or None, meta["metrics"], meta["overlay"]
+    except (struct.error, ValueError, KeyError, TypeError):
+        return None
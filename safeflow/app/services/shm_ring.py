@@ -0,0 +1,126 @@
+# app/services/shm_ring.py
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Ring header: [write_seq, slots, capacity, read_at_ms]; per-slot header: [seq, nbytes, height, width, channels, reserved]
+_RING_HEADER_WORDS = 4
+_SLOT_HEADER_WORDS = 6
+_WORD = 8
+
+
+class SharedFrameRing:
+    """
+    Single-writer, multi-reader ring of fixed-capacity slots in multiprocessing.shared_memory.
+
+    Frames (ndarray) or encoded bytes are copied straight into the slot; nothing is pickled.
+    Each slot carries its own sequence number, written last by the writer and re-checked by
+    readers after copying (a seqlock), so a reader that raced the writer on a wrapped slot
+    sees the torn read and skips it instead of returning a mixed frame.
+    """
+
+    def __init__(self, name: str, slots: int = 4, capacity: int = 1920 * 1080 * 3, create: bool = False):
+        if create:
+            size = _RING_HEADER_WORDS * _WORD + slots * (_SLOT_HEADER_WORDS * _WORD + capacity)
+            try:
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink() # Left over from a crashed run
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = name
+        self.owner = create
+        self._header = np.ndarray((_RING_HEADER_WORDS,), dtype=np.uint64, buffer=self.shm.buf, offset=0)
+        if create:
+            self._header[:] = (0, slots, capacity, 0)
+        else: # Geometry comes from the creator
+            slots, capacity = int(self._header[1]), int(self._header[2])
+        self.slots = slots
+        self.capacity = capacity
+        self._slot_stride = _SLOT_HEADER_WORDS * _WORD + capacity
+        self._slot_headers = []
+        self._slot_data = []
+        for i in range(slots):
+            offset = _RING_HEADER_WORDS * _WORD + i * self._slot_stride
+            self._slot_headers.append(np.ndarray((_SLOT_HEADER_WORDS,), dtype=np.uint64, buffer=self.shm.buf, offset=offset))
+            self._slot_data.append(np.ndarray((capacity,), dtype=np.uint8, buffer=self.shm.buf, offset=offset + _SLOT_HEADER_WORDS * _WORD))
+        if create:
+            for header in self._slot_headers:
+                header[:] = 0
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._header[0])
+
+    def mark_read(self):
+        """Readers call this while they want frames, so a writer can skip producing ones nobody reads."""
+        self._header[3] = int(time.time() * 1000)
+
+    def read_recently(self, seconds: float) -> bool:
+        """Whether a reader called mark_read() within the last `seconds`."""
+        return time.time() * 1000 - int(self._header[3]) <= seconds * 1000
+
+    def write(self, payload) -> int:
+        """Copy an HxWxC uint8 frame or a bytes-like payload into the next slot; returns its sequence number."""
+        if isinstance(payload, np.ndarray):
+            array = np.ascontiguousarray(payload, dtype=np.uint8)
+            shape = array.shape + (1,) * (3 - array.ndim)
+            flat = array.reshape(-1)
+        else:
+            flat = np.frombuffer(payload, dtype=np.uint8)
+            shape = (0, 0, 0)
+        if flat.size > self.capacity:
+            raise ValueError(f"Payload of {flat.size} bytes exceeds ring slot capacity {self.capacity}")
+        seq = self.write_seq + 1
+        slot = seq % self.slots
+        header = self._slot_headers[slot]
+        header[0] = 0 # Invalidate while writing
+        self._slot_data[slot][:flat.size] = flat
+        header[1] = flat.size
+        header[2], header[3], header[4] = shape
+        header[0] = seq
+        self._header[0] = seq
+        return seq
+
+    def _read_slot(self, seq: int, as_array: bool):
+        header = self._slot_headers[seq % self.slots]
+        if int(header[0]) != seq:
+            return None
+        nbytes, height, width, channels = (int(v) for v in header[1:5])
+        data = self._slot_data[seq % self.slots][:nbytes].copy()
+        if int(header[0]) != seq:
+            return None # Overwritten while copying
+        if as_array:
+            return data.reshape(height, width, channels)
+        return data.tobytes()
+
+    def read_latest(self, after_seq: int = 0, as_array: bool = True) -> Tuple[int, Optional[object]]:
+        """Return (seq, payload) for the newest slot if it is newer than `after_seq`, else (after_seq, None)."""
+        for _ in range(3):
+            seq = self.write_seq
+            if seq <= after_seq:
+                return after_seq, None
+            payload = self._read_slot(seq, as_array)
+            if payload is not None:
+                return seq, payload
+        return after_seq, None
+
+    def read(self, seq: int, as_array: bool = True) -> Optional[object]:
+        """Read a specific sequence number if it has not been overwritten yet."""
+        return self._read_slot(seq, as_array)
+
+    def close(self):
+        self._header = None
+        self._slot_headers = []
+        self._slot_data = []
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
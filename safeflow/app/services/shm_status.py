@@ -0,0 +1,132 @@
+# app/services/shm_status.py
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+# One fixed-size row per camera; seq is odd while the row is being written
+ROW_DTYPE = np.dtype([
+    ("seq", np.uint64), ("camera_id", np.int64), ("person_count", np.int64), ("current_occupancy", np.int64),
+    ("entry_count", np.int64), ("exit_count", np.int64), ("is_over_threshold", np.int64),
+    ("density", np.float64), ("person_count_smoothed", np.float64), ("timestamp", np.float64),
+])
+_HEADER_WORDS = 2 # [capacity, reserved]
+_WORD = 8
+_READ_RETRIES = 3
+
+
+class SharedStatusTable:
+    """
+    Live camera status rows in multiprocessing.shared_memory, so every API process (e.g. each
+    uvicorn worker) sees the counts written by whichever process runs a camera's pipeline.
+
+    Each row is written by one process at a time and guarded by its own seqlock: readers copy
+    the table and retry rows whose seq was odd or changed during the copy. The sum of all seqs
+    is a cheap change counter for snapshot caching. Rows are claimed by camera id with linear
+    probing; two processes claiming different cameras at the same instant may race, which is
+    why cameras should be assigned to a single pipeline process.
+    """
+
+    def __init__(self, name: str, capacity: int = 256):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER_WORDS * _WORD + capacity * ROW_DTYPE.itemsize)
+            self.owner = True
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+            # Attaching registers the segment with this process's resource tracker, which would
+            # unlink it when this process exits while other processes still use it
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.name = name
+        self._header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=self.shm.buf, offset=0)
+        if self.owner:
+            self._header[:] = (capacity, 0)
+        else: # Geometry comes from the creator
+            capacity = int(self._header[0])
+        self.capacity = capacity
+        self._rows = np.ndarray((capacity,), dtype=ROW_DTYPE, buffer=self.shm.buf, offset=_HEADER_WORDS * _WORD)
+        if self.owner:
+            self._rows[:] = np.zeros(capacity, dtype=ROW_DTYPE)
+        self._slots: Dict[int, int] = {} # camera_id -> row index, cached per process
+
+    def _slot(self, camera_id: int, claim: bool) -> Optional[int]:
+        slot = self._slots.get(camera_id)
+        if slot is not None and int(self._rows["camera_id"][slot]) == camera_id:
+            return slot
+        ids = self._rows["camera_id"]
+        start = camera_id % self.capacity
+        for i in range(self.capacity):
+            index = (start + i) % self.capacity
+            current = int(ids[index])
+            if current == camera_id:
+                self._slots[camera_id] = index
+                return index
+            if current == 0:
+                if not claim:
+                    return None
+                ids[index] = camera_id
+                self._slots[camera_id] = index
+                return index
+        if claim:
+            raise RuntimeError(f"Shared live status table is full ({self.capacity} cameras)")
+        return None
+
+    def write(self, camera_id: int, person_count: int, density: float, current_occupancy: int,
+              entry_count: int, exit_count: int, is_over_threshold: bool, person_count_smoothed: float, timestamp: float):
+        slot = self._slot(camera_id, claim=True)
+        row = self._rows[slot:slot + 1]
+        seq = int(row["seq"][0])
+        row["seq"] = seq + 1 # Odd: readers skip the row until the write completes
+        row[["person_count", "current_occupancy", "entry_count", "exit_count", "is_over_threshold", "density",
+             "person_count_smoothed", "timestamp"]] = \
+            (person_count, current_occupancy, entry_count, exit_count, int(is_over_threshold), density,
+             person_count_smoothed, timestamp)
+        row["seq"] = seq + 2
+
+    def remove(self, camera_id: int):
+        slot = self._slot(camera_id, claim=False)
+        if slot is None:
+            return
+        self._rows["seq"][slot] += 2 # Still a change for the version, never odd
+        self._rows["timestamp"][slot] = 0.0
+        self._slots.pop(camera_id, None)
+        # The row keeps its camera id as a tombstone so linear probing still reaches rows behind it
+
+    def version(self) -> int:
+        return int(self._rows["seq"].sum())
+
+    def read_all(self) -> Dict[int, Dict[str, Any]]:
+        """Consistent copy of every written row, keyed by camera id."""
+        rows = self._rows.copy()
+        result = {}
+        for index in np.nonzero((rows["camera_id"] != 0) & (rows["timestamp"] > 0))[0]:
+            row = rows[index]
+            for _ in range(_READ_RETRIES):
+                if int(row["seq"]) % 2 == 0 and int(self._rows["seq"][index]) == int(row["seq"]):
+                    break
+                row = self._rows[index].copy()
+            else:
+                continue # Writer kept the row busy; it is picked up on the next read
+            if row["timestamp"] <= 0:
+                continue
+            result[int(row["camera_id"])] = {
+                "person_count": int(row["person_count"]),
+                "density": float(row["density"]),
+                "current_occupancy": int(row["current_occupancy"]),
+                "entry_count": int(row["entry_count"]),
+                "exit_count": int(row["exit_count"]),
+                "is_over_threshold": bool(row["is_over_threshold"]),
+                "person_count_smoothed": float(row["person_count_smoothed"]),
+                "timestamp": float(row["timestamp"]),
+            }
+        return result
+
+    def close(self):
+        self._header = None
+        self._rows = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,145 @@
+# app/services/status_hub.py
+import asyncio
+import threading
+import time
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DELTA_FLOAT_DIGITS = 2 # Density noise below this precision is not worth a push
+_UNTRACKED_FIELDS = ("timestamp",) # Always sent with a delta, never a reason for one
+
+
+class StatusSubscriber:
+    """
+    One WebSocket/SSE client. Deltas published from any thread are merged into `pending`
+    (latest value per camera and field), so a slow client gets fewer, larger updates instead
+    of an ever-growing queue: memory per client is bounded by the number of cameras.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, min_interval: float):
+        self.loop = loop
+        self.min_interval = min_interval
+        self.event = asyncio.Event()
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._removed: Set[int] = set()
+        self._scheduled = False
+        self._last_sent = 0.0
+        self.sent = 0
+        self.coalesced = 0
+
+    def offer(self, camera_id: int, delta: Optional[Dict[str, Any]]):
+        """Thread-safe. `delta` None means the camera was removed."""
+        with self._lock:
+            if delta is None:
+                self._pending.pop(camera_id, None)
+                self._removed.add(camera_id)
+            else:
+                self._removed.discard(camera_id)
+                pending = self._pending.get(camera_id)
+                if pending is None:
+                    self._pending[camera_id] = dict(delta)
+                else:
+                    pending.update(delta)
+                    self.coalesced += 1
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass # Loop closed: the client is gone
+
+    async def next_batch(self) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+        """Wait for changes, hold them for at most min_interval since the last push, then take them all."""
+        await self.event.wait()
+        self.event.clear()
+        wait = self._last_sent + self.min_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait) # Further deltas merge into pending meanwhile
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            removed, self._removed = sorted(self._removed), set()
+            self._scheduled = False
+        self._last_sent = time.monotonic()
+        self.sent += 1
+        return pending, removed
+
+
+class StatusHub:
+    """
+    Computes per-camera field deltas of the live status and fans them out to subscribers.
+    Each camera has its own lock, so camera workers publishing concurrently don't contend;
+    the subscriber list is an immutable tuple swapped on (un)subscribe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock() # Subscriber list changes only
+        self._subscribers: Tuple[StatusSubscriber, ...] = ()
+        self._last: Dict[int, Dict[str, Any]] = {}
+        self._camera_locks: Dict[int, threading.Lock] = {}
+
+    @property
+    def active(self) -> bool:
+        """Whether anyone is listening; publishers can skip building statuses when not."""
+        return bool(self._subscribers)
+
+    def publish(self, camera_id: int, status: Dict[str, Any]):
+        if not self._subscribers:
+            return # Nobody to diff for; the baseline is rebuilt when the first client subscribes
+        lock = self._camera_locks.get(camera_id) or self._camera_locks.setdefault(camera_id, threading.Lock())
+        with lock:
+            last = self._last.setdefault(camera_id, {})
+            delta = {}
+            for key, value in status.items():
+                if key in _UNTRACKED_FIELDS:
+                    continue
+                if value.__class__ is float:
+                    value = round(value, DELTA_FLOAT_DIGITS)
+                if key not in last or last[key] != value:
+                    delta[key] = value
+                    last[key] = value
+            if not delta:
+                return
+            for key in _UNTRACKED_FIELDS:
+                if key in status:
+                    delta[key] = status[key]
+        for subscriber in self._subscribers:
+            subscriber.offer(camera_id, delta)
+
+    def publish_removed(self, camera_id: int):
+        lock = self._camera_locks.get(camera_id) or self._camera_locks.setdefault(camera_id, threading.Lock())
+        with lock:
+            self._last.pop(camera_id, None)
+        for subscriber in self._subscribers:
+            subscriber.offer(camera_id, None)
+
+    def subscribe(self, min_interval: Optional[float] = None) -> StatusSubscriber:
+        """Call from the event loop that will consume the subscriber."""
+        if min_interval is None:
+            min_interval = settings.STATUS_PUSH_MIN_INTERVAL_MS / 1000.0
+        subscriber = StatusSubscriber(asyncio.get_running_loop(), min_interval)
+        with self._lock:
+            if not self._subscribers:
+                self._last = {} # Not maintained while nobody listened; deltas start from full statuses
+            self._subscribers = self._subscribers + (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StatusSubscriber):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        subscribers = self._subscribers
+        return {
+            "subscribers": len(subscribers),
+            "pushes": sum(s.sent for s in subscribers),
+            "coalesced": sum(s.coalesced for s in subscribers),
+        }
+
+
+hub = StatusHub()
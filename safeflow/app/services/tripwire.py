@@ -0,0 +1,104 @@
+# app/services/tripwire.py
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+REARM_DISTANCE_PX = 20.0 # A track may cross the same line again once it is this far from it
+
+
+class TripwireSet:
+    """
+    Vectorized crossing engine for all tripwires of one camera.
+
+    evaluate() takes the previous and current centroids of every track (N x 2) and, in one
+    NumPy pass over all N tracks x K lines, computes the side of each line, a proper
+    segment-intersection test between each movement segment and each tripwire, and the
+    distance from each current centroid to each tripwire segment.
+
+    Direction convention (unchanged from the single-line version): a crossing that ends on
+    the positive side of the p1->p2 cross product is an entry (+1), otherwise an exit (-1).
+    """
+
+    def __init__(self, lines: Sequence[Sequence[float]]):
+        self.lines = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+        self.a = self.lines[:, 0:2] # (K, 2)
+        self.b = self.lines[:, 2:4] # (K, 2)
+        self.vec = self.b - self.a # (K, 2)
+        self.len_sq = np.einsum('kd,kd->k', self.vec, self.vec) # (K,)
+        self.key = tuple(map(tuple, self.lines.astype(int).tolist()))
+
+    def __len__(self):
+        return len(self.lines)
+
+    @staticmethod
+    def _cross(u, v):
+        return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+    def distances(self, points: np.ndarray) -> np.ndarray:
+        """Distance from each point (N x 2) to each tripwire segment -> (N x K)."""
+        rel = points[:, None, :] - self.a[None, :, :] # (N, K, 2)
+        safe_len = np.where(self.len_sq > 0, self.len_sq, 1.0)
+        t = np.clip(np.einsum('nkd,kd->nk', rel, self.vec) / safe_len, 0.0, 1.0)
+        closest = self.a[None, :, :] + t[..., None] * self.vec[None, :, :]
+        return np.linalg.norm(points[:, None, :] - closest, axis=-1)
+
+    def evaluate(self, prev_points: np.ndarray, curr_points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (directions, distances), both N x K:
+        directions is +1 (entry), -1 (exit) or 0 per track and line; distances is the
+        current distance of each track to each line.
+        """
+        prev_points = np.asarray(prev_points, dtype=np.float64).reshape(-1, 2)
+        curr_points = np.asarray(curr_points, dtype=np.float64).reshape(-1, 2)
+        n, k = len(curr_points), len(self.lines)
+        if n == 0 or k == 0:
+            return np.zeros((n, k), dtype=np.int8), np.zeros((n, k))
+
+        # Side of each tripwire for the previous and current positions
+        prev_side = self._cross(self.vec[None, :, :], prev_points[:, None, :] - self.a[None, :, :])
+        curr_side = self._cross(self.vec[None, :, :], curr_points[:, None, :] - self.a[None, :, :])
+
+        # Side of each movement segment for the tripwire end points
+        move = (curr_points - prev_points)[:, None, :] # (N, 1, 2)
+        a_side = self._cross(move, self.a[None, :, :] - prev_points[:, None, :])
+        b_side = self._cross(move, self.b[None, :, :] - prev_points[:, None, :])
+
+        # Proper intersection: the track strictly changed side of the line, and the line's end
+        # points lie on opposite sides of (or on) the movement segment
+        crossed = (np.sign(prev_side) * np.sign(curr_side) < 0) & (np.sign(a_side) * np.sign(b_side) <= 0)
+        crossed &= self.len_sq[None, :] > 0
+
+        directions = np.where(crossed, np.where(curr_side > 0, 1, -1), 0).astype(np.int8)
+        return directions, self.distances(curr_points)
+
+
+def camera_lines(camera_config) -> List[Tuple[int, int, int, int]]:
+    """Primary tripwire columns plus any additional lines stored on the camera."""
+    lines = []
+    if camera_config.tripwire_line_x1 is not None and \
+       camera_config.tripwire_line_y1 is not None and \
+       camera_config.tripwire_line_x2 is not None and \
+       camera_config.tripwire_line_y2 is not None:
+        lines.append((camera_config.tripwire_line_x1, camera_config.tripwire_line_y1,
+                      camera_config.tripwire_line_x2, camera_config.tripwire_line_y2))
+    for line in getattr(camera_config, "tripwire_lines", None) or []:
+        if len(line) == 4:
+            lines.append(tuple(int(v) for v in line))
+    return lines
+
+
+def update_cross_status(directions: np.ndarray, distances: np.ndarray, status: np.ndarray,
+                        rearm_distance: float = REARM_DISTANCE_PX) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Apply one frame of crossings to the per-track, per-line status matrix (1 = in, -1 = out,
+    0 = armed). A track is counted once per crossing event and re-armed when it moves away.
+    Returns (entries_mask, exits_mask, new_status), all N x K.
+    """
+    entries = (directions == 1) & (status != 1)
+    exits = (directions == -1) & (status != -1)
+    new_status = status.copy()
+    new_status[entries] = 1
+    new_status[exits] = -1
+    new_status[(directions == 0) & (distances > rearm_distance)] = 0
+    return entries, exits, new_status
+
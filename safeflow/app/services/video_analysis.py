@@ -0,0 +1,420 @@
+# app/services/video_analysis.py
+import datetime
+import logging
+import math
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+from sqlalchemy import delete, insert, or_, and_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Analysis worker processes import this module too; only they load the model (via video_processing)
+_ctx = mp.get_context("spawn")
+
+DEFAULT_CONFIG = {"id": 0, "mode": "general", "crowd_threshold": 10, "occupancy_threshold": 5,
+                  "tripwire_line_x1": None, "tripwire_line_y1": None, "tripwire_line_x2": None,
+                  "tripwire_line_y2": None, "tripwire_lines": None, "roi_regions": None}
+
+
+def job_config(db_camera=None, area_sq_meters: Optional[float] = None) -> Dict[str, Any]:
+    """Pipeline settings for a job: the camera's counting mode, thresholds and tripwires, or general mode."""
+    if db_camera is not None:
+        from app.services.process_pool import camera_config_dict
+        config = camera_config_dict(db_camera)
+        config.pop("source", None)
+        config.pop("render_mode", None)
+    else:
+        config = {**DEFAULT_CONFIG, "area_sq_meters": settings.DEFAULT_AREA_SQ_METERS}
+    if area_sq_meters is not None:
+        config["area_sq_meters"] = area_sq_meters
+    config["current_occupancy"] = 0 # A recording starts empty, whatever the live camera shows
+    return config
+
+
+def probe(path: str) -> Tuple[float, int]:
+    """(frames per second, frame count) from the container; count is 0 when the container doesn't say."""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError("Cannot open video file")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    finally:
+        cap.release()
+    if fps <= 0 or fps > 1000:
+        fps = 25.0 # Some containers carry no (or a bogus) rate
+    return fps, max(0, frame_count)
+
+
+def second_start(second: int, fps: float) -> int:
+    """First frame index whose int(index / fps) is `second`."""
+    index = math.ceil(second * fps)
+    while index > 0 and int((index - 1) / fps) >= second:
+        index -= 1
+    while int(index / fps) < second:
+        index += 1
+    return index
+
+
+def plan_chunks(frame_count: int, fps: float, chunk_seconds: float) -> List[Tuple[int, int]]:
+    """
+    [start, end) frame ranges of whole seconds of video, so no second's counts are split
+    between two chunks; an unknown length is one chunk read to the end of the file.
+    """
+    if frame_count <= 0:
+        return [(0, 2 ** 62)]
+    step = max(1, int(round(chunk_seconds)))
+    starts = [second_start(second, fps) for second in range(0, int((frame_count - 1) / fps) + 1, step)]
+    return [(start, end) for start, end in zip(starts, starts[1:] + [frame_count])]
+
+
+def sample_step(fps: float, sample_fps: float) -> int:
+    return max(1, int(round(fps / sample_fps))) if sample_fps > 0 else 1
+
+
+def iter_chunk_frames(path: str, start_frame: int, end_frame: int, step: int,
+                      warmup_frames: int = 0) -> Iterator[Tuple[int, Any]]:
+    """
+    Decode frames [start_frame - warmup_frames, end_frame) of a file and yield (index, frame)
+    for every `step`-th frame of the video. Indexes are absolute, so every chunk samples the
+    same frames a single pass would. Skipped frames are only grabbed (no colour conversion or
+    copy) and nothing but the current frame is held.
+    """
+    first = max(0, start_frame - warmup_frames)
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError("Cannot open video file")
+        if first:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        index = first
+        while index < end_frame:
+            if index % step:
+                if not cap.grab():
+                    return
+            else:
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                yield index, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def analyze_chunk(path: str, start_frame: int, end_frame: int, fps: float, config: Dict[str, Any],
+                  sample_fps: float, warmup_frames: int, batch_size: int) -> Dict[str, Any]:
+    """
+    Worker process entry point: run the camera pipeline over one chunk and return its
+    per-second counts. The chunk gets its own tracker, warmed up on the frames before
+    `start_frame` (counted by the previous chunk) so tracks crossing a tripwire right after
+    the chunk boundary are not missed. Occupancy is returned relative to the chunk start.
+    """
+    from app.services import video_processing, inference_engine # Loads the model in this process only
+
+    if video_processing.yolo_model is None:
+        raise RuntimeError("YOLO model not loaded")
+    step = sample_step(fps, sample_fps)
+    config = SimpleNamespace(**config)
+    pipeline = video_processing.CameraPipeline(config.id, frame_rate=max(1, int(round(fps / step))))
+    seconds: Dict[int, List[float]] = {} # second -> [samples, count sum, count max, density sum, entries, exits, net]
+    net = 0
+    last_index = start_frame - 1
+
+    def run_batch(batch):
+        nonlocal net
+        frames = [frame for _, frame in batch]
+        results = inference_engine.predict_batch(video_processing.yolo_model, frames,
+                                                 [pipeline.detection_input(frame, config) for frame in frames])
+        for (index, frame), result in zip(batch, results):
+            _, persons, density, entries, exits, _, _, _ = pipeline.process(
+                frame, config, db_camera_obj=config, results=[result], render=False)
+            if index < start_frame:
+                config.current_occupancy = 0 # Warm-up: tracker state only
+                continue
+            net += entries - exits
+            row = seconds.setdefault(int(index / fps), [0, 0, 0, 0.0, 0, 0, 0])
+            row[0] += 1
+            row[1] += persons
+            row[2] = max(row[2], persons)
+            row[3] += density
+            row[4] += entries
+            row[5] += exits
+            row[6] = net
+
+    batch = []
+    for index, frame in iter_chunk_frames(path, start_frame, end_frame, step, warmup_frames):
+        batch.append((index, frame))
+        last_index = index
+        if len(batch) >= batch_size:
+            run_batch(batch)
+            batch = []
+    if batch:
+        run_batch(batch)
+    # Skipped frames after the last sample were decoded too; the chunk ends at end_frame unless the file did
+    decoded_to = end_frame if last_index + step >= end_frame else last_index + 1
+    return {
+        "frames": max(0, decoded_to - start_frame),
+        "net": net,
+        "seconds": [{"second": second, "samples": row[0], "person_count_sum": row[1], "person_count_max": row[2],
+                     "density_sum": row[3], "entry_count": row[4], "exit_count": row[5], "net": row[6]}
+                    for second, row in sorted(seconds.items())],
+    }
+
+
+def _load_model():
+    from app.services import video_processing # noqa: F401 (model loaded once per worker process)
+
+
+class VideoAnalysisQueue:
+    """
+    Runs queued analysis_jobs one at a time, each spread over a pool of worker processes:
+    the file is cut into chunks of `chunk_seconds` that workers decode and analyse
+    independently (seeking to their start), so a job runs at roughly workers x sample-rate
+    speed and no process holds more than a detector batch of frames. Finished chunks update
+    the job's progress; their per-second rows are written once every earlier chunk is in,
+    which is when their running occupancy is known. A job left "running" by a dead process
+    is picked up again after its lease.
+    """
+
+    def __init__(self, n_workers: int, session_factory=SessionLocal, chunk_seconds: float = 30.0,
+                 sample_fps: float = 5.0, warmup_seconds: float = 2.0, batch_size: int = 8,
+                 lease_seconds: float = 600.0, poll_seconds: float = 5.0):
+        self.n_workers = max(1, n_workers)
+        self.session_factory = session_factory
+        self.chunk_seconds = chunk_seconds
+        self.sample_fps = sample_fps
+        self.warmup_seconds = warmup_seconds
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None # Spawned with the first job
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self.current_job: Optional[int] = None
+        self._thread = threading.Thread(target=self._run, name="video-analysis", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _claim(self, db: Session) -> Optional[int]:
+        table = models.AnalysisJob
+        now = datetime.datetime.utcnow()
+        due = or_(table.status == "queued",
+                  and_(table.status == "running", table.updated_at < now - datetime.timedelta(seconds=self.lease_seconds)))
+        job_id = db.execute(
+            update(table)
+            .where(table.id == select(table.id).where(due).order_by(table.id).limit(1).scalar_subquery())
+            .values(status="running", started_at=now, updated_at=now, processed_frames=0, chunks_done=0, error=None)
+            .returning(table.id)
+        ).scalar()
+        if job_id is not None:
+            db.execute(delete(models.AnalysisResult).where(models.AnalysisResult.job_id == job_id)) # Partial rows of an earlier run
+        db.commit()
+        return job_id
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            db = self.session_factory()
+            try:
+                job_id = self._claim(db)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Claiming an analysis job failed: {e}")
+                job_id = None
+            finally:
+                db.close()
+            if job_id is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            self.current_job = job_id
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Analysis job {job_id} failed: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    self._executor = None # A worker died (e.g. out of memory); start a fresh pool next time
+                self._finish(job_id, "failed", error=str(e))
+            finally:
+                self.current_job = None
+
+    def _update_job(self, job_id: int, **values):
+        db = self.session_factory()
+        try:
+            db.execute(update(models.AnalysisJob).where(models.AnalysisJob.id == job_id)
+                       .values(updated_at=datetime.datetime.utcnow(), **values))
+            db.commit()
+        finally:
+            db.close()
+
+    def _job_status(self, job_id: int) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            return db.execute(select(models.AnalysisJob.status).where(models.AnalysisJob.id == job_id)).scalar()
+        finally:
+            db.close()
+
+    def _finish(self, job_id: int, status: str, **values):
+        db = self.session_factory()
+        try:
+            path = db.execute(select(models.AnalysisJob.path).where(models.AnalysisJob.id == job_id)).scalar()
+            table = models.AnalysisJob
+            now = datetime.datetime.utcnow()
+            # A cancel that raced the end of the job wins
+            db.execute(update(table).where(table.id == job_id, table.status != "cancelled")
+                       .values(status=status, finished_at=now, updated_at=now, **values))
+            db.commit()
+        finally:
+            db.close()
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_seconds(self, job_id: int, chunks: List[Dict[str, Any]], occupancy: int, config: Dict[str, Any]) -> int:
+        """Insert the per-second rows of consecutive finished chunks; returns the occupancy after them."""
+        rows = []
+        for chunk in chunks:
+            for second in chunk["seconds"]:
+                samples = second["samples"]
+                count_avg = second["person_count_sum"] / samples
+                current = occupancy + second["net"]
+                if config["mode"] == "tripwire":
+                    alert = current > config["occupancy_threshold"]
+                else:
+                    alert = count_avg > config["crowd_threshold"]
+                rows.append({"job_id": job_id, "second": second["second"], "samples": samples,
+                             "person_count_max": second["person_count_max"], "person_count_avg": round(count_avg, 3),
+                             "density_avg": round(second["density_sum"] / samples, 4),
+                             "entry_count": second["entry_count"], "exit_count": second["exit_count"],
+                             "occupancy": current, "alert": alert})
+            occupancy += chunk["net"]
+        if rows:
+            db = self.session_factory()
+            try:
+                db.execute(insert(models.AnalysisResult), rows)
+                db.commit()
+            finally:
+                db.close()
+        return occupancy
+
+    def _run_job(self, job_id: int):
+        db = self.session_factory()
+        try:
+            job = db.get(models.AnalysisJob, job_id)
+            path, config = job.path, dict(job.config)
+        finally:
+            db.close()
+        fps, frame_count = probe(path)
+        chunks = plan_chunks(frame_count, fps, self.chunk_seconds)
+        self._update_job(job_id, fps=fps, total_frames=frame_count or None, chunks_total=len(chunks))
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.n_workers, mp_context=_ctx, initializer=_load_model)
+
+        started = time.perf_counter()
+        warmup_frames = int(self.warmup_seconds * fps)
+        pending: Dict[Future, int] = {
+            self._executor.submit(analyze_chunk, path, start, end, fps, config, self.sample_fps, warmup_frames, self.batch_size): i
+            for i, (start, end) in enumerate(chunks)
+        }
+        done_chunks: Dict[int, Dict[str, Any]] = {}
+        next_to_write = 0
+        occupancy = 0
+        frames = 0
+        totals = {"samples": 0, "count_max": 0, "density_sum": 0.0, "entries": 0, "exits": 0}
+        try:
+            while pending:
+                finished, _ = wait(pending, timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                if self._stop_event.is_set():
+                    return # Shutting down: the job is picked up again after its lease
+                if self._job_status(job_id) == "cancelled":
+                    self._finish(job_id, "cancelled")
+                    return
+                for future in finished:
+                    chunk = future.result()
+                    done_chunks[pending.pop(future)] = chunk
+                    frames += chunk["frames"]
+                    for second in chunk["seconds"]:
+                        totals["samples"] += second["samples"]
+                        totals["count_max"] = max(totals["count_max"], second["person_count_max"])
+                        totals["density_sum"] += second["density_sum"]
+                        totals["entries"] += second["entry_count"]
+                        totals["exits"] += second["exit_count"]
+                ready = []
+                while next_to_write in done_chunks:
+                    ready.append(done_chunks.pop(next_to_write))
+                    next_to_write += 1
+                occupancy = self._write_seconds(job_id, ready, occupancy, config)
+                elapsed = time.perf_counter() - started
+                self._update_job(job_id, processed_frames=frames, chunks_done=len(chunks) - len(pending),
+                                 processing_fps=round(frames / elapsed, 1) if elapsed > 0 else None)
+        finally:
+            for future in pending:
+                future.cancel()
+
+        self._finish(job_id, "done",
+                     total_frames=frame_count or frames, processed_frames=frames,
+                     max_persons=totals["count_max"],
+                     avg_density=round(totals["density_sum"] / totals["samples"], 4) if totals["samples"] else 0.0,
+                     total_entries=totals["entries"], total_exits=totals["exits"], final_occupancy=occupancy)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Analysis job {job_id}: {frames} frames in {elapsed:.1f}s "
+                    f"({frames / fps / max(elapsed, 1e-6):.1f}x real time)")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_queue: Optional[VideoAnalysisQueue] = None
+_queue_lock = threading.Lock()
+
+
+def start() -> VideoAnalysisQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            os.makedirs(settings.ANALYSIS_UPLOAD_DIR, exist_ok=True)
+            _queue = VideoAnalysisQueue(
+                settings.ANALYSIS_WORKER_PROCESSES,
+                chunk_seconds=settings.ANALYSIS_CHUNK_SECONDS,
+                sample_fps=settings.ANALYSIS_SAMPLE_FPS,
+                warmup_seconds=settings.ANALYSIS_WARMUP_SECONDS,
+                batch_size=settings.ANALYSIS_BATCH_SIZE,
+                lease_seconds=settings.ANALYSIS_JOB_LEASE_SECONDS,
+            )
+        return _queue
+
+
+def wake():
+    """A job was queued."""
+    job_queue = _queue
+    if job_queue is not None:
+        job_queue.wake()
+
+
+def shutdown():
+    global _queue
+    with _queue_lock:
+        job_queue, _queue = _queue, None
+    if job_queue is not None:
+        job_queue.stop()
@@ -2,8 +2,13 @@ import cv2
 from ultralytics import YOLO
 from app.core.config import settings
 import numpy as np
-from collections import defaultdict
-from app.services import live_status_manager
+import threading
+import torch
+from typing import Dict, Any, List, Optional
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+from app.services import live_status_manager, tripwire, roi, inference_engine
 # Load YOLOv8 model
 try:
     yolo_model = YOLO(settings.YOLO_MODEL_PATH)
@@ -13,180 +18,311 @@ except Exception as e:
     print(f"Error loading YOLO model: {e}. Ensure '{settings.YOLO_MODEL_PATH}' is correct or allow auto-download.")
     yolo_model = None
 
-# Store previous centroids for tripwire tracking
-# This should ideally be managed per camera instance if multiple streams are processed by one worker
-# For simplicity here, it's global. In a multi-camera/multi-worker setup, this needs refinement.
-prev_centroids = defaultdict(lambda: None) 
-object_cross_status = defaultdict(lambda: None) # To track if an object has crossed (in, out, or None)
-
-def point_segment_distance(p, a, b):
-    """Calculate the distance from point p to line segment ab."""
-    if np.all(a == b):
-        return np.linalg.norm(p - a)
-    # normalized tangent vector
-    d = np.divide(b - a, np.linalg.norm(b - a))
-    # signed parallel distance components
-    s = np.dot(a - p, d)
-    t = np.dot(p - b, d)
-    # clamped parallel distance
-    h = np.maximum.reduce([s, t, 0])
-    # perpendicular distance component
-    c = np.cross(p - a, d)
-    return np.hypot(h, np.abs(c))
-
-
-def check_line_crossing(centroid, prev_centroid, line_p1, line_p2):
-    if prev_centroid is None:
-        return 0 # No previous position, cannot determine crossing
-
-    # Create vectors for line segment and movement
-    line_vec = np.array(line_p2) - np.array(line_p1)
-    p1_to_prev = prev_centroid - np.array(line_p1)
-    p1_to_curr = centroid - np.array(line_p1)
-
-    # Cross products to determine on which side of the line the points are
-    # (Ax - Cx)(By - Ay) - (Ay - Cy)(Bx - Ax)
-    prev_side = np.cross(line_vec, p1_to_prev)
-    curr_side = np.cross(line_vec, p1_to_curr)
-
-    # If signs are different, a crossing might have occurred
-    if np.sign(prev_side) != np.sign(curr_side) and np.sign(prev_side) != 0 and np.sign(curr_side) !=0:
-        # Check if intersection point is within segment bounds
-        # This simplified check assumes the movement vector intersects the line segment
-        # A more robust method would use line intersection formulas.
-        
-        # Simplified check: if the movement line (prev_centroid to centroid)
-        # intersects the tripwire line (line_p1 to line_p2)
-        # For a robust solution, use a line segment intersection algorithm
-        # (e.g. https://www.geeksforgeeks.org/check-if-two-given-line-segments-intersect/)
-
-        # Heuristic: if the centroid is now very close to the line, and was on the other side
-        dist_to_line = point_segment_distance(centroid, np.array(line_p1), np.array(line_p2))
-
-        if dist_to_line < 10: # Threshold for closeness, adjust as needed
-            if curr_side > 0: # Example: positive cross product means "entry"
-                return 1 # Entry
-            else:
-                return -1 # Exit
-    return 0 # No crossing
-
-
-def process_frame(frame, camera_config, db_camera_obj=None):
-    global prev_centroids, object_cross_status
-    if not yolo_model:
-        return frame, 0, 0.0, 0, 0, False, "YOLO model not loaded" # frame, count, density, entry, exit, alert, alert_msg
-
-    results = yolo_model.track(frame, persist=True, verbose=False, classes=[0]) # Track persons
-    
-    annotated_frame = results[0].plot() # Use ultralytics plotter
-    person_count = 0
-    detected_persons_info = [] # Store (id, centroid)
-
-    if results[0].boxes is not None and results[0].boxes.id is not None:
-        person_count = len(results[0].boxes.id)
-        for box in results[0].boxes:
-            if box.id is not None: # Check if tracking ID is available
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                cx = int((x1 + x2) / 2)
-                cy = int((y1 + y2) / 2)
-                obj_id = int(box.id.cpu().numpy()[0])
+# The ultralytics predictor/tracker is not thread-safe; camera workers run in parallel threads
+_model_lock = threading.Lock()
+
+# Tracker settings shared by every camera; each CameraPipeline gets its own BYTETracker instance
+_TRACKER_CFG = IterableSimpleNamespace(**yaml_load(check_yaml("bytetrack.yaml")))
+TRACK_TTL_FRAMES = 60 # Forget a track id's centroid/crossing state after this many frames unseen
+
+
+class CameraPipeline:
+    """
+    Per-camera processing state: its own tracker, centroid history and tripwire crossing
+    status. Nothing is shared between cameras, so any number of tripwire cameras can run
+    concurrently in one process. Track ids unseen for `track_ttl_frames` are evicted, which
+    keeps memory bounded however long the camera runs.
+    """
+
+    def __init__(self, camera_id: int, frame_rate: int = 30, track_ttl_frames: int = TRACK_TTL_FRAMES):
+        self.camera_id = camera_id
+        self.tracker = BYTETracker(args=_TRACKER_CFG, frame_rate=frame_rate)
+        self.track_ttl_frames = track_ttl_frames
+        self.frame_index = 0
+        self.prev_centroids: Dict[int, np.ndarray] = {}
+        self.cross_status: Dict[int, np.ndarray] = {} # Per track id: 1 (in), -1 (out) or 0 per tripwire
+        self.last_seen: Dict[int, int] = {}
+        self._tripwires: Optional[tripwire.TripwireSet] = None
+        self._regions: Optional[roi.RegionSet] = None
+        self._last_regions = None # (RegionSet, per-region counts) of the last detection, for reuse_last
+        self._last_results = None
+        self._last_counts = (0, 0.0, False, "")
+        self.last_overlay: Optional[Dict[str, Any]] = None # What the annotations show, for client-side drawing
+
+    def detect(self, frame, camera_config=None):
+        if not yolo_model:
+            return None
+        detection_input = self.detection_input(frame, camera_config) if camera_config is not None else None
+        with _model_lock:
+            return inference_engine.predict_batch(yolo_model, [frame], [detection_input])
+
+    def detection_input(self, frame, camera_config):
+        """What the detector should see of this frame: the crop around the camera's ROIs (a view) or all of it."""
+        return roi.detection_input(frame, self._region_set(camera_config))
+
+    def update_tracks(self, results, frame):
+        """Assign this camera's track ids to raw detections (same post-processing as model.track)."""
+        result = results[0]
+        if result.boxes is None or len(result.boxes) == 0:
+            return results
+        tracks = self.tracker.update(result.boxes.cpu().numpy(), frame)
+        if len(tracks) == 0:
+            return results
+        idx = tracks[:, -1].astype(int)
+        tracked = result[idx]
+        tracked.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return [tracked]
+
+    def _tripwire_set(self, lines) -> tripwire.TripwireSet:
+        key = tuple(lines)
+        if self._tripwires is None or self._tripwires.key != key:
+            self._tripwires = tripwire.TripwireSet(lines)
+            self.cross_status.clear() # Statuses are per line; a new line set starts armed
+        return self._tripwires
+
+    def _region_set(self, camera_config) -> Optional[roi.RegionSet]:
+        regions = roi.camera_regions(camera_config)
+        if not regions:
+            self._regions = None
+        elif self._regions is None or self._regions.key != roi.regions_key(regions):
+            self._regions = roi.RegionSet(regions)
+        return self._regions
+
+    def region_counts(self) -> Optional[List[Dict[str, Any]]]:
+        """Per-region counts and density of the last detection, None without ROIs."""
+        return self._last_regions[1] if self._last_regions is not None else None
+
+    def _count_crossings(self, annotated_frame, detected_persons_info, tripwires, crossings: Optional[List[list]] = None):
+        """
+        One vectorized crossing pass over every track and every tripwire of this camera. Crossing
+        segments are drawn on `annotated_frame` (None = not rendering) and added to `crossings`.
+        """
+        n_lines = len(tripwires)
+        ids = [person_info['id'] for person_info in detected_persons_info]
+        curr = np.array([person_info['centroid'] for person_info in detected_persons_info], dtype=np.float64).reshape(-1, 2)
+        has_prev = np.array([obj_id in self.prev_centroids for obj_id in ids], dtype=bool)
+        prev = np.array([self.prev_centroids.get(obj_id, c) for obj_id, c in zip(ids, curr)], dtype=np.float64).reshape(-1, 2)
+        status = np.zeros((len(ids), n_lines), dtype=np.int8)
+        for row, obj_id in enumerate(ids):
+            previous_status = self.cross_status.get(obj_id)
+            if previous_status is not None:
+                status[row] = previous_status
+
+        directions, distances = tripwires.evaluate(prev, curr)
+        directions[~has_prev] = 0 # No previous position, cannot determine crossing
+        entries, exits, status = tripwire.update_cross_status(directions, distances, status)
+
+        for row in np.flatnonzero(entries.any(axis=1) | exits.any(axis=1)):
+            if annotated_frame is not None:
+                color = (0, 255, 0) if entries[row].any() else (0, 0, 255) # Green for entry, red for exit
+                cv2.line(annotated_frame, tuple(prev[row].astype(int)), tuple(curr[row].astype(int)), color, 2)
+            if crossings is not None:
+                crossings.append([*prev[row].astype(int).tolist(), *curr[row].astype(int).tolist(), 1 if entries[row].any() else -1])
+
+        for row, obj_id in enumerate(ids):
+            self.prev_centroids[obj_id] = curr[row]
+            self.cross_status[obj_id] = status[row]
+            self.last_seen[obj_id] = self.frame_index
+        return int(entries.sum()), int(exits.sum())
+
+    def _evict_stale_tracks(self):
+        cutoff = self.frame_index - self.track_ttl_frames
+        stale_ids = [obj_id for obj_id, seen in self.last_seen.items() if seen < cutoff]
+        for obj_id in stale_ids:
+            del self.last_seen[obj_id]
+            self.prev_centroids.pop(obj_id, None)
+            self.cross_status.pop(obj_id, None)
+
+    def reset(self):
+        self.tracker.reset()
+        self.prev_centroids.clear()
+        self.cross_status.clear()
+        self.last_seen.clear()
+        self._last_results = None
+        self._last_regions = None
+        self.last_overlay = None
+
+    def process(self, frame, camera_config, db_camera_obj=None, results=None, render: bool = True):
+        """
+        Run detection (or use precomputed `results`, e.g. from the batched inference engine),
+        track with this camera's tracker and apply the camera's counting mode. With
+        render=False nothing is drawn: `frame` itself is returned and the annotations are
+        only described in `last_overlay`. `results` must be in frame coordinates (as
+        inference_engine.predict_batch returns them for ROI crops).
+        When the camera has ROIs, only people standing in one count, and counts and density
+        are also reported per region.
+        """
+        self.frame_index += 1
+        if results is None:
+            results = self.detect(frame, camera_config)
+            if results is None:
+                return frame, 0, 0.0, 0, 0, False, "YOLO model not loaded", 0 # frame, count, density, entry, exit, alert, alert_msg, occupancy
+        results = self.update_tracks(results, frame)
+
+        annotated_frame = results[0].plot() if render else frame # Use ultralytics plotter
+        person_count = 0
+        detected_persons_info = [] # Store (id, centroid)
+        boxes = results[0].boxes
+        xyxy = boxes.xyxy.cpu().numpy().astype(int) if boxes is not None and len(boxes) else np.empty((0, 4), dtype=int)
+        track_ids = boxes.id.cpu().numpy().astype(int) if boxes is not None and boxes.id is not None else None
+
+        if boxes is not None and track_ids is None:
+            person_count = len(boxes) # Detections the tracker has not confirmed yet
+        elif boxes is not None:
+            person_count = len(track_ids)
+            centroids = ((xyxy[:, :2] + xyxy[:, 2:]) / 2).astype(int)
+            for obj_id, (cx, cy) in zip(track_ids.tolist(), centroids.tolist()):
                 detected_persons_info.append({'id': obj_id, 'centroid': (cx, cy)})
-                cv2.circle(annotated_frame, (cx, cy), 3, (0, 0, 255), -1) # Draw centroid
-    
-
-    density = 0.0
-    entry_count_frame = 0
-    exit_count_frame = 0
-    alert_triggered = False
-    alert_message = ""
-    live_status_manager.update_live_status(
-        camera_id=camera_config.id,
-        person_count=person_count, # from YOLO
-        density=density,      # calculated
-        current_occupancy=current_occupancy if camera_config.mode == "tripwire" else 0
-    )
-    if camera_config.mode == "general":
-        if camera_config.area_sq_meters > 0:
-            density = person_count / camera_config.area_sq_meters
-        
-        # Draw info on frame
-        cv2.putText(annotated_frame, f"Persons: {person_count}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        cv2.putText(annotated_frame, f"Density: {density:.2f} p/m2", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-        if person_count > camera_config.crowd_threshold:
-            alert_triggered = True
-            alert_message = f"Crowd threshold exceeded ({person_count}/{camera_config.crowd_threshold})"
-            cv2.putText(annotated_frame, "ALERT: CROWD LIMIT REACHED!", (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-
-    elif camera_config.mode == "tripwire":
-        current_occupancy = db_camera_obj.current_occupancy if db_camera_obj else 0
-        
-        if camera_config.tripwire_line_x1 is not None and \
-           camera_config.tripwire_line_y1 is not None and \
-           camera_config.tripwire_line_x2 is not None and \
-           camera_config.tripwire_line_y2 is not None:
-            
-            p1 = (camera_config.tripwire_line_x1, camera_config.tripwire_line_y1)
-            p2 = (camera_config.tripwire_line_x2, camera_config.tripwire_line_y2)
-            cv2.line(annotated_frame, p1, p2, (255, 0, 0), 2) # Draw tripwire
-
-            # Define entry/exit based on line orientation (e.g., p1 to p2 direction)
-            # Crossing from left to right of vector (p1->p2) could be 'entry'
-            # This requires consistent line drawing by user or definition.
-            # For simplicity: one side is IN, other is OUT based on cross product sign.
-
-            processed_ids_this_frame = set()
-
-            for person_info in detected_persons_info:
-                obj_id = person_info['id']
-                centroid = np.array(person_info['centroid'])
-                processed_ids_this_frame.add(obj_id)
-
-                if prev_centroids[obj_id] is not None:
-                    crossing_direction = check_line_crossing(centroid, prev_centroids[obj_id], p1, p2)
-                    
-                    # Ensure an object is counted only once per crossing "event"
-                    if crossing_direction == 1 and object_cross_status[obj_id] != "in": # Entry
-                        entry_count_frame += 1
-                        current_occupancy +=1
-                        object_cross_status[obj_id] = "in"
-                        cv2.line(annotated_frame, tuple(prev_centroids[obj_id].astype(int)), tuple(centroid.astype(int)), (0,255,0), 2) # Green for entry
-                    elif crossing_direction == -1 and object_cross_status[obj_id] != "out": # Exit
-                        exit_count_frame += 1
-                        current_occupancy -=1
-                        object_cross_status[obj_id] = "out"
-                        cv2.line(annotated_frame, tuple(prev_centroids[obj_id].astype(int)), tuple(centroid.astype(int)), (0,0,255), 2) # Red for exit
-                    # If no crossing, but was near line, reset status if moved away
-                    elif crossing_direction == 0:
-                         # If far from line, reset crossing status to allow re-crossing
-                        dist_to_line = point_segment_distance(centroid, np.array(p1), np.array(p2))
-                        if dist_to_line > 20: # Moved away from the line
-                             object_cross_status[obj_id] = None
-
-                prev_centroids[obj_id] = centroid
-            
-            # Clean up trackers for objects no longer detected
-            # This is important to prevent memory leaks with prev_centroids and object_cross_status
-            # Ultralytics tracker might handle this internally if persist=False for some frames,
-            # but explicit cleanup is safer for our auxiliary tracking dicts.
-            current_tracked_ids = set(person_info['id'] for person_info in detected_persons_info)
-            ids_to_remove = [obj_id for obj_id in prev_centroids if obj_id not in current_tracked_ids]
-            for obj_id in ids_to_remove:
-                del prev_centroids[obj_id]
-                del object_cross_status[obj_id]
-
-
-        cv2.putText(annotated_frame, f"In: {entry_count_frame}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        cv2.putText(annotated_frame, f"Out: {exit_count_frame}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-        cv2.putText(annotated_frame, f"Occupancy: {current_occupancy}", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
-
-        if current_occupancy > camera_config.occupancy_threshold:
-            alert_triggered = True
-            alert_message = f"Occupancy threshold exceeded ({current_occupancy}/{camera_config.occupancy_threshold})"
-            cv2.putText(annotated_frame, "ALERT: OCCUPANCY LIMIT!", (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-        
-        # Persist current_occupancy to db_camera_obj if available (done in stream.py)
-        if db_camera_obj:
-            db_camera_obj.current_occupancy = current_occupancy # This will be committed by the caller
-            
-    return annotated_frame, person_count, density, entry_count_frame, exit_count_frame, alert_triggered, alert_message, current_occupancy if camera_config.mode == "tripwire" else 0
\ No newline at end of file
+                if render:
+                    cv2.circle(annotated_frame, (cx, cy), 3, (0, 0, 255), -1) # Draw centroid
+
+        regions = self._region_set(camera_config)
+        region_counts = None
+        if regions:
+            # A person is in a region when their feet (bottom centre of the box) are inside its polygon
+            inside = regions.contains(np.column_stack(((xyxy[:, 0] + xyxy[:, 2]) / 2, xyxy[:, 3])))
+            region_counts = regions.counts(inside)
+            person_count = int(inside.any(axis=1).sum())
+
+        density = 0.0
+        entry_count_frame = 0
+        exit_count_frame = 0
+        current_occupancy = 0
+        alert_triggered = False
+        alert_message = ""
+        crossings: List[list] = []
+        if camera_config.mode == "general":
+            area = (regions.total_area() if regions else None) or camera_config.area_sq_meters # Regions' own areas when all are set
+            if area > 0:
+                density = person_count / area
+
+            if person_count > camera_config.crowd_threshold:
+                alert_triggered = True
+                alert_message = f"Crowd threshold exceeded ({person_count}/{camera_config.crowd_threshold})"
+
+        elif camera_config.mode == "tripwire":
+            current_occupancy = db_camera_obj.current_occupancy if db_camera_obj else 0
+
+            # Crossing from one side of a line (p1->p2) to the other counts as entry/exit;
+            # this requires consistent line drawing by the user.
+            lines = tripwire.camera_lines(camera_config)
+            if lines and detected_persons_info:
+                entry_count_frame, exit_count_frame = self._count_crossings(
+                    annotated_frame if render else None, detected_persons_info, self._tripwire_set(lines), crossings)
+                current_occupancy += entry_count_frame - exit_count_frame
+
+            if current_occupancy > camera_config.occupancy_threshold:
+                alert_triggered = True
+                alert_message = f"Occupancy threshold exceeded ({current_occupancy}/{camera_config.occupancy_threshold})"
+
+            # Persist current_occupancy to db_camera_obj if available (written by the log writer with the next log)
+            if db_camera_obj:
+                db_camera_obj.current_occupancy = current_occupancy
+
+        # Track ids that left the scene keep their state for a grace period (occlusions), then go
+        self._evict_stale_tracks()
+
+        self._last_results = results
+        self._last_counts = (person_count, density, alert_triggered, alert_message)
+        self._last_regions = (regions, region_counts) if regions else None
+        if render:
+            if regions:
+                self._draw_regions(annotated_frame, regions, region_counts)
+            self._draw_status(annotated_frame, camera_config, person_count, density,
+                              entry_count_frame, exit_count_frame, current_occupancy, alert_triggered)
+        ids = track_ids.tolist() if track_ids is not None else [-1] * len(xyxy)
+        self.last_overlay = {
+            "width": frame.shape[1], "height": frame.shape[0], "mode": camera_config.mode,
+            "boxes": [[*box, obj_id] for box, obj_id in zip(xyxy.tolist(), ids)], # x1, y1, x2, y2, track id (-1 = none yet)
+            "tripwires": [list(line) for line in tripwire.camera_lines(camera_config)] if camera_config.mode == "tripwire" else [],
+            "crossings": crossings, # x1, y1, x2, y2, +1 entry / -1 exit
+            "person_count": person_count, "density": round(density, 3),
+            "entries": entry_count_frame, "exits": exit_count_frame, "occupancy": current_occupancy,
+            "alert": alert_triggered, "alert_message": alert_message,
+            "regions": [{**counts, "points": polygon.astype(int).tolist()} for counts, polygon in zip(region_counts, regions.polygons)]
+                       if regions else [],
+        }
+
+        live_status_manager.update_live_status(
+            camera_id=camera_config.id,
+            person_count=person_count, # from YOLO
+            density=density,      # calculated
+            current_occupancy=current_occupancy,
+            entry_count=entry_count_frame,
+            exit_count=exit_count_frame,
+            regions=region_counts
+        )
+        return annotated_frame, person_count, density, entry_count_frame, exit_count_frame, alert_triggered, alert_message, current_occupancy
+
+    def reuse_last(self, frame, camera_config, db_camera_obj=None, render: bool = True):
+        """
+        Cheap step for frames between detections: the last detection's boxes and counts are
+        drawn onto the new frame (or only carried in `last_overlay` with render=False).
+        No tracker update, so no crossings are counted here.
+        """
+        current_occupancy = 0
+        if camera_config.mode == "tripwire" and db_camera_obj:
+            current_occupancy = db_camera_obj.current_occupancy or 0
+        if self._last_results is None:
+            return frame, 0, 0.0, 0, 0, False, "", current_occupancy
+        person_count, density, alert_triggered, alert_message = self._last_counts
+        if self.last_overlay is not None:
+            self.last_overlay = {**self.last_overlay, "crossings": [], "entries": 0, "exits": 0, "occupancy": current_occupancy}
+        if not render:
+            return frame, person_count, density, 0, 0, alert_triggered, alert_message, current_occupancy
+        annotated_frame = self._last_results[0].plot(img=frame)
+        if self._last_regions is not None:
+            self._draw_regions(annotated_frame, *self._last_regions)
+        self._draw_status(annotated_frame, camera_config, person_count, density, 0, 0, current_occupancy, alert_triggered)
+        return annotated_frame, person_count, density, 0, 0, alert_triggered, alert_message, current_occupancy
+
+    @staticmethod
+    def _draw_regions(annotated_frame, regions, region_counts):
+        for polygon, counts in zip(regions.polygons, region_counts):
+            points = polygon.astype(np.int32)
+            cv2.polylines(annotated_frame, [points], True, (0, 255, 255), 2)
+            label = f"{counts['name']}: {counts['person_count']}"
+            if counts["density"] is not None:
+                label += f" ({counts['density']:.2f} p/m2)"
+            x, y = points.min(axis=0)
+            cv2.putText(annotated_frame, label, (int(x) + 5, int(y) + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+    @staticmethod
+    def _draw_status(annotated_frame, camera_config, person_count, density, entries, exits, current_occupancy, alert_triggered):
+        height = annotated_frame.shape[0]
+        if camera_config.mode == "general":
+            cv2.putText(annotated_frame, f"Persons: {person_count}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            cv2.putText(annotated_frame, f"Density: {density:.2f} p/m2", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            if alert_triggered:
+                cv2.putText(annotated_frame, "ALERT: CROWD LIMIT REACHED!", (10, height - 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+        elif camera_config.mode == "tripwire":
+            for x1, y1, x2, y2 in tripwire.camera_lines(camera_config):
+                cv2.line(annotated_frame, (x1, y1), (x2, y2), (255, 0, 0), 2) # Draw tripwire
+            cv2.putText(annotated_frame, f"In: {entries}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            cv2.putText(annotated_frame, f"Out: {exits}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            cv2.putText(annotated_frame, f"Occupancy: {current_occupancy}", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
+            if alert_triggered:
+                cv2.putText(annotated_frame, "ALERT: OCCUPANCY LIMIT!", (10, height - 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+
+
+# One pipeline per camera for callers that don't hold their own (camera workers do)
+_pipelines: Dict[int, CameraPipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(camera_id: int) -> CameraPipeline:
+    with _pipelines_lock:
+        pipeline = _pipelines.get(camera_id)
+        if pipeline is None:
+            pipeline = CameraPipeline(camera_id)
+            _pipelines[camera_id] = pipeline
+        return pipeline
+
+
+def remove_pipeline(camera_id: int):
+    with _pipelines_lock:
+        _pipelines.pop(camera_id, None)
+
+
+def process_frame(frame, camera_config, db_camera_obj=None, results=None):
+    return get_pipeline(camera_config.id).process(frame, camera_config, db_camera_obj=db_camera_obj, results=results)
@@ -0,0 +1,48 @@
+# benchmarks/bench_alert_dispatch.py
+# How long AlertDispatcher.submit() blocks the caller (the frame loop) while every send takes
+# SLOW_SEND_SECONDS, against what inline sends would cost. Stand-in channels, no network;
+# delivery, pooling and retries against protocol stand-ins are in tests/test_alert_dispatch.py.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_alert_dispatch
+import asyncio
+import statistics
+import time
+
+from app.services.alert_dispatcher import AlertDispatcher
+
+ALERTS = 200
+SLOW_SEND_SECONDS = 0.05
+
+
+class SlowChannel:
+    def __init__(self, name):
+        self.name = name
+        self.configured = True
+        self.sent = 0
+
+    async def send(self, subject: str, body: str):
+        await asyncio.sleep(SLOW_SEND_SECONDS)
+        self.sent += 1
+
+    def close(self):
+        pass
+
+
+def main():
+    channels = [SlowChannel("email"), SlowChannel("telegram")]
+    dispatcher = AlertDispatcher(channels, rates_per_minute={"email": 0, "telegram": 0}, workers={"email": 4, "telegram": 1})
+    submit_us = []
+    for i in range(ALERTS):
+        started = time.perf_counter()
+        dispatcher.submit(f"Alert {i}", f"Crowd over threshold ({i})")
+        submit_us.append((time.perf_counter() - started) * 1e6)
+    started = time.perf_counter()
+    dispatcher.drain(timeout=ALERTS * SLOW_SEND_SECONDS + 30)
+    drained = time.perf_counter() - started
+    dispatcher.stop()
+    print(f"submit(): median {statistics.median(submit_us):.0f} us, max {max(submit_us):.0f} us per alert "
+          f"(inline sends: {SLOW_SEND_SECONDS * 1000 * len(channels):.0f} ms per alert)")
+    print(f"Delivered in the background: {', '.join(f'{c.name} {c.sent}' for c in channels)} in {drained:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
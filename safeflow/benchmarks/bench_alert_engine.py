@@ -0,0 +1,65 @@
+# benchmarks/bench_alert_engine.py
+# AlertEngine.submit() throughput during an incident storm: THREADS threads report over-threshold
+# frames for CAMERAS cameras in 3 areas as fast as they can, over a throwaway SQLite database.
+# Digest, escalation and restart behaviour are covered by tests/test_alert_engine.py.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_alert_engine
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base, create_engines
+from app.schemas.alert import AlertData
+from app.services.alert_engine import AlertEngine
+from app.services.log_writer import DetectionLogWriter
+
+CAMERAS = 40
+THREADS = 8
+STORM_SECONDS = 2.0
+THRESHOLD = 10
+
+
+def alert(camera_id: int, value: float) -> AlertData:
+    return AlertData(camera_id=camera_id, camera_name=f"Cam {camera_id}", area_name=f"Area {camera_id % 3}",
+                     mode=models.CameraMode.GENERAL, message="Crowd threshold exceeded",
+                     current_value=value, threshold_value=THRESHOLD)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer_engine, _ = create_engines(f"sqlite:///{os.path.join(tmp, 'alerts.db')}")
+        Base.metadata.create_all(bind=writer_engine)
+        session_factory = sessionmaker(bind=writer_engine)
+        writer = DetectionLogWriter(session_factory=session_factory, flush_interval_ms=100)
+        engine = AlertEngine(writer=writer, channels=["email"], session_factory=session_factory,
+                             window_seconds=0.5, dedup_seconds=600, resolve_seconds=120)
+        alerts = [alert(camera_id, THRESHOLD + 2) for camera_id in range(1, CAMERAS + 1)]
+        stop = threading.Event()
+        counts = [0] * THREADS
+
+        def reporter(index):
+            i = index
+            while not stop.is_set():
+                engine.submit(alerts[i % CAMERAS])
+                counts[index] += 1
+                i += THREADS
+
+        threads = [threading.Thread(target=reporter, args=(i,)) for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        time.sleep(STORM_SECONDS)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        raw = sum(counts)
+        print(f"Storm: {raw:,} raw events from {THREADS} threads over {CAMERAS} cameras, "
+              f"{raw / STORM_SECONDS:,.0f} submit()/s ({STORM_SECONDS * THREADS / raw * 1e6:.1f} us each)")
+        engine.stop()
+        writer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_alert_outbox.py
+# Alert outbox over a throwaway SQLite database with local stand-in channels (no network):
+#   1. enqueue: NOTIFICATIONS alert batches (one outbox row per channel) through the detection
+#      log writer, timed until committed;
+#   2. delivery: an OutboxDeliveryWorker drains them through the dispatcher; each stand-in send
+#      takes SEND_SECONDS and FLAKY_EVERY-th sends fail once (retried); reports throughput and
+#      the per-channel latency from delivery_stats();
+#   3. idempotency: re-submitting the same batches adds no rows and delivers nothing twice;
+#   4. crash recovery: rows left "sending" by a dead process are reclaimed after the lease.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_alert_outbox
+import asyncio
+import datetime
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base, create_engines
+from app.services.alert_dispatcher import AlertDispatcher
+from app.services.alert_outbox import AlertBatch, OutboxDeliveryWorker, delivery_stats, outbox_rows
+from app.services.log_writer import DetectionLogWriter
+
+NOTIFICATIONS = 2000
+CHANNELS = ("email", "telegram")
+SEND_SECONDS = 0.002
+FLAKY_EVERY = 50
+STALE = 50
+
+
+class StandInChannel:
+    def __init__(self, name):
+        self.name = name
+        self.configured = True
+        self.calls = 0
+        self.delivered = []
+
+    async def send(self, subject, body):
+        self.calls += 1
+        await asyncio.sleep(SEND_SECONDS)
+        if self.calls % FLAKY_EVERY == 0:
+            raise ConnectionError("stand-in transient failure")
+        self.delivered.append(subject)
+
+    def close(self):
+        pass
+
+
+def count(session_factory, *where):
+    db = session_factory()
+    try:
+        return db.execute(select(func.count()).select_from(models.AlertOutbox).where(*where)).scalar()
+    finally:
+        db.close()
+
+
+def wait_sent(session_factory, expected, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if count(session_factory, models.AlertOutbox.status == "sent") >= expected:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main():
+    logging.getLogger("app.services.alert_dispatcher").setLevel(logging.ERROR) # Expected retry warnings
+    with tempfile.TemporaryDirectory() as tmp:
+        writer_engine, _ = create_engines(f"sqlite:///{os.path.join(tmp, 'outbox.db')}")
+        Base.metadata.create_all(bind=writer_engine)
+        session_factory = sessionmaker(bind=writer_engine)
+        writer = DetectionLogWriter(session_factory=session_factory, flush_interval_ms=100)
+        channels = [StandInChannel(name) for name in CHANNELS]
+        dispatcher = AlertDispatcher(channels, retry_base_seconds=0.01, rates_per_minute={},
+                                     workers={name: 8 for name in CHANNELS})
+
+        batches = [AlertBatch([], [], outbox_rows(f"n{i}", f"Alert {i}", f"Body {i}", CHANNELS)) for i in range(NOTIFICATIONS)]
+        started = time.perf_counter()
+        for batch in batches:
+            writer.submit_alerts(batch)
+        submitted = time.perf_counter() - started
+        writer.flush()
+        committed = time.perf_counter() - started
+        rows = count(session_factory)
+        print(f"Enqueue: {NOTIFICATIONS} notifications -> {rows} outbox rows; submit {submitted / NOTIFICATIONS * 1e6:.1f} us each, "
+              f"committed in {committed * 1000:.0f} ms ({rows / committed:,.0f} rows/s, {writer.stats()['batches']} transaction(s))")
+
+        started = time.perf_counter()
+        worker = OutboxDeliveryWorker(dispatcher, session_factory=session_factory, poll_seconds=0.05)
+        delivered_all = wait_sent(session_factory, rows)
+        elapsed = time.perf_counter() - started
+        print(f"Delivery: {rows} rows in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s); worker {worker.stats()}")
+        db = session_factory()
+        try:
+            for channel, stats in delivery_stats(db, datetime.datetime.utcnow() - datetime.timedelta(hours=1)).items():
+                latency = stats["latency_seconds"]
+                print(f"  {channel}: sent {stats['sent']}, failed {stats['failed']}, latency p50 {latency['p50']:.3f} s, "
+                      f"p95 {latency['p95']:.3f} s, max {latency['max']:.3f} s")
+        finally:
+            db.close()
+
+        for batch in batches: # Same notification ids again, e.g. a retried flush
+            writer.submit_alerts(batch)
+        writer.flush()
+        time.sleep(0.5)
+        duplicates = sum(len(channel.delivered) for channel in channels) - rows
+        print(f"Re-submit: {count(session_factory)} outbox rows, {duplicates} duplicate deliveries")
+
+        worker.stop()
+        writer.submit_alerts(AlertBatch([], [], [row for i in range(STALE)
+                                                 for row in outbox_rows(f"stale{i}", f"Stale {i}", "", CHANNELS[:1])]))
+        writer.flush()
+        db = session_factory() # As if a previous process claimed them and died mid-send
+        try:
+            db.execute(update(models.AlertOutbox).where(models.AlertOutbox.status == "pending").values(
+                status="sending", attempts=1, claimed_at=datetime.datetime.utcnow() - datetime.timedelta(seconds=5)))
+            db.commit()
+        finally:
+            db.close()
+        stale = count(session_factory, models.AlertOutbox.status == "sending")
+        worker = OutboxDeliveryWorker(dispatcher, session_factory=session_factory, poll_seconds=0.05, lease_seconds=1)
+        recovered = wait_sent(session_factory, rows + STALE, timeout=10)
+        print(f"Crash recovery: {stale} stale 'sending' rows reclaimed and delivered: {recovered}")
+
+        worker.stop()
+        dispatcher.stop()
+        writer.stop()
+        if not (rows == NOTIFICATIONS * len(CHANNELS) and delivered_all and duplicates == 0
+                and count(session_factory) == rows + STALE and stale == STALE and recovered):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
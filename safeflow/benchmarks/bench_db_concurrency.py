@@ -0,0 +1,123 @@
+# benchmarks/bench_db_concurrency.py
+# Concurrent reads and writes on detection_logs: the old single default engine vs. the tuned
+# writer/reader engines from app.db.database. Uses a throwaway SQLite file per run.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_db_concurrency [seconds] [readers] [writers]
+import os
+import sys
+import tempfile
+import threading
+import time
+import datetime
+
+from sqlalchemy import create_engine, insert, select, desc
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base, create_engines
+
+SEED_ROWS = 50000
+
+
+def seed(session_factory):
+    db = session_factory()
+    now = datetime.datetime.utcnow()
+    db.execute(insert(models.DetectionLog), [
+        {"camera_id": 1 + i % 8, "area_name": f"Area {i % 8}", "mode": models.CameraMode.GENERAL,
+         "person_count": i % 40, "density": (i % 40) / 20.0, "timestamp": now - datetime.timedelta(seconds=i)}
+        for i in range(SEED_ROWS)
+    ])
+    db.commit()
+    db.close()
+
+
+def run(write_factory, read_factory, seconds, n_readers, n_writers):
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    read_latencies = []
+    lock = threading.Lock()
+
+    def writer(worker_index):
+        while not stop.is_set():
+            db = write_factory()
+            try:
+                db.execute(insert(models.DetectionLog), [
+                    {"camera_id": worker_index + 1, "area_name": f"Area {worker_index}", "mode": models.CameraMode.GENERAL,
+                     "person_count": 5, "density": 0.5, "timestamp": datetime.datetime.utcnow()}
+                    for _ in range(20)
+                ])
+                db.commit()
+                with lock:
+                    counts["writes"] += 1
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    counts["locked"] += 1
+            finally:
+                db.close()
+
+    def reader(worker_index):
+        area = f"Area {worker_index % 8}"
+        while not stop.is_set():
+            db = read_factory()
+            started = time.perf_counter()
+            try:
+                db.execute(
+                    select(models.DetectionLog).where(models.DetectionLog.area_name == area)
+                    .order_by(desc(models.DetectionLog.timestamp)).limit(100)
+                ).all()
+                with lock:
+                    counts["reads"] += 1
+                    read_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                with lock:
+                    counts["locked"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(n_writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(n_readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    read_latencies.sort()
+    p99 = read_latencies[int(len(read_latencies) * 0.99)] * 1000 if read_latencies else 0.0
+    return counts, p99
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    n_readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    n_writers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        # Before: one default engine, rollback journal, no busy timeout
+        url = f"sqlite:///{os.path.join(tmp, 'default.db')}"
+        default_engine = create_engine(url, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=default_engine)
+        default_factory = sessionmaker(autocommit=False, autoflush=False, bind=default_engine)
+        seed(default_factory)
+        before = run(default_factory, default_factory, seconds, n_readers, n_writers)
+        default_engine.dispose()
+
+        # After: WAL + pragmas, dedicated writer pool, read-only reader pool
+        url = f"sqlite:///{os.path.join(tmp, 'tuned.db')}"
+        writer_engine, reader_engine = create_engines(url)
+        Base.metadata.create_all(bind=writer_engine)
+        write_factory = sessionmaker(autocommit=False, autoflush=False, bind=writer_engine)
+        read_factory = sessionmaker(autocommit=False, autoflush=False, bind=reader_engine)
+        seed(write_factory)
+        after = run(write_factory, read_factory, seconds, n_readers, n_writers)
+        writer_engine.dispose()
+        reader_engine.dispose()
+
+    print(f"{seconds:.0f}s, {n_readers} readers, {n_writers} writers, {SEED_ROWS} seeded rows")
+    for label, (counts, p99) in (("default engine", before), ("tuned engines ", after)):
+        print(f"  {label}: {counts['reads'] / seconds:8.0f} reads/s  {counts['writes'] / seconds:7.0f} write txns/s  "
+              f"read p99 {p99:7.1f}ms  'database is locked' errors {counts['locked']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_keyset_pagination.py
+# Page fetch latency for /api/logs/ paging: OFFSET (skip) vs. the (timestamp, id) keyset cursor,
+# at page 1 and page 10,000 (20 rows per page) over a seeded throwaway SQLite database.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_keyset_pagination
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import log as crud_log
+from app.db import models
+from app.db.database import Base, create_engines
+
+PAGE_SIZE = 20
+DEEP_PAGE = 10000
+SEED_ROWS = PAGE_SIZE * DEEP_PAGE + 50000
+REPEATS = 20
+
+
+def seed(session_factory):
+    db = session_factory()
+    now = datetime.datetime.utcnow()
+    for start in range(0, SEED_ROWS, 50000):
+        db.execute(insert(models.DetectionLog), [
+            {"camera_id": 1 + i % 8, "area_name": f"Area {i % 8}", "mode": models.CameraMode.GENERAL,
+             "person_count": i % 40, "density": (i % 40) / 20.0, "timestamp": now - datetime.timedelta(seconds=i // 2)}
+            for i in range(start, min(start + 50000, SEED_ROWS))
+        ])
+    db.commit()
+    db.close()
+
+
+def timed(fn):
+    fn() # Warm the page cache
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer_engine, reader_engine = create_engines(f"sqlite:///{os.path.join(tmp, 'pages.db')}")
+        Base.metadata.create_all(bind=writer_engine)
+        seed(sessionmaker(bind=writer_engine))
+        db = sessionmaker(bind=reader_engine)()
+
+        # Cursor for the deep page: position of the last row of the page before it (setup, not timed)
+        boundary = crud_log.get_logs_filtered(db, skip=(DEEP_PAGE - 1) * PAGE_SIZE - 1, limit=1)[0]
+        deep_cursor = crud_log.encode_cursor(boundary.timestamp, boundary.id)
+
+        # Both paths must return the same deep page
+        offset_ids = [log.id for log in crud_log.get_logs_filtered(db, skip=(DEEP_PAGE - 1) * PAGE_SIZE, limit=PAGE_SIZE, order_by="timestamp")]
+        keyset_ids = [log.id for log in crud_log.get_logs_page(db, cursor=deep_cursor, limit=PAGE_SIZE)[0]]
+        assert len(offset_ids) == len(keyset_ids) == PAGE_SIZE
+
+        results = {
+            ("offset", 1): timed(lambda: crud_log.get_logs_filtered(db, skip=0, limit=PAGE_SIZE)),
+            ("offset", DEEP_PAGE): timed(lambda: crud_log.get_logs_filtered(db, skip=(DEEP_PAGE - 1) * PAGE_SIZE, limit=PAGE_SIZE)),
+            ("keyset", 1): timed(lambda: crud_log.get_logs_page(db, limit=PAGE_SIZE)),
+            ("keyset", DEEP_PAGE): timed(lambda: crud_log.get_logs_page(db, cursor=deep_cursor, limit=PAGE_SIZE)),
+        }
+        db.close()
+        writer_engine.dispose()
+        reader_engine.dispose()
+
+    print(f"{SEED_ROWS} rows, {PAGE_SIZE} rows/page, mean of {REPEATS} fetches")
+    for (method, page), ms in results.items():
+        print(f"  {method:6s} page {page:6d}: {ms:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_live_status.py
+# Live status store: cost of one update (single thread), then one writer thread per camera at
+# FPS frames/s while reader threads take snapshots as fast as they can (what /live_statuses/,
+# the push feed and the diversion API do). Compares the previous rebuild-a-dict-per-frame store
+# (reproduced inline) with the slotted store, checks that no snapshot ever shows a torn status,
+# and reads back through shared memory from a second process.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_live_status
+import datetime
+import multiprocessing as mp
+import threading
+import time
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services import live_status_manager
+from app.services.status_hub import StatusHub
+
+CAMERAS = 16
+FPS = 30
+READERS = 4
+DURATION_SECONDS = 2.0
+THRESHOLD = 20
+SINGLE_THREAD_UPDATES = 200000
+
+
+# --- Previous implementation, for comparison ---
+_legacy_statuses = {}
+_legacy_configs = {}
+_legacy_hub = StatusHub()
+
+def legacy_update(camera_id, person_count, density):
+    config = _legacy_configs[camera_id]
+    _legacy_statuses[camera_id] = {
+        "person_count": person_count, "density": density, "current_occupancy": 0,
+        "timestamp": datetime.datetime.utcnow(), "is_over_threshold": person_count > config["crowd_threshold"],
+        **config
+    }
+    _legacy_hub.publish(camera_id, _legacy_statuses[camera_id])
+
+def legacy_get_all():
+    return {cam_id: status for cam_id, status in _legacy_statuses.items()
+            if cam_id in _legacy_configs and _legacy_configs[cam_id]["is_active"]}
+
+
+def camera_config(camera_id):
+    return SimpleNamespace(crowd_threshold=THRESHOLD, occupancy_threshold=0, name=f"Cam {camera_id}", area_name="Bench",
+                           latitude=0.0, longitude=0.0, mode="general", is_active=True)
+
+
+def update_cost_us(update):
+    started = time.perf_counter()
+    for count in range(SINGLE_THREAD_UPDATES):
+        update(1 + count % CAMERAS, count % 40, (count % 40) / 20.0)
+    return (time.perf_counter() - started) / SINGLE_THREAD_UPDATES * 1e6
+
+
+def run(update, get_all):
+    stop = threading.Event()
+    updates = [0] * CAMERAS
+    reads = [0] * READERS
+    torn = [0]
+
+    def writer(index):
+        camera_id = index + 1
+        count = 0
+        next_frame = time.perf_counter()
+        while not stop.is_set():
+            count += 1
+            update(camera_id, count % 40, (count % 40) / 20.0)
+            updates[index] += 1
+            next_frame += 1.0 / FPS
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+
+    def reader(index):
+        while not stop.is_set():
+            for status in get_all().values():
+                # A torn status would pair one frame's count with another frame's threshold verdict
+                if status["is_over_threshold"] != (status.get("person_count_smoothed", status["person_count"]) > THRESHOLD):
+                    torn[0] += 1
+            reads[index] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(CAMERAS)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(updates) / DURATION_SECONDS, sum(reads) / DURATION_SECONDS, torn[0]
+
+
+def read_from_other_process(name, result_queue):
+    from app.services.shm_status import SharedStatusTable
+    table = SharedStatusTable(name)
+    result_queue.put(len(table.read_all()))
+    table.close()
+
+
+def main():
+    for camera_id in range(1, CAMERAS + 1):
+        _legacy_configs[camera_id] = {"crowd_threshold": THRESHOLD, "is_active": True, "name": f"Cam {camera_id}"}
+        live_status_manager.update_camera_config(camera_id, camera_config(camera_id))
+
+    stores = (
+        ("previous store", legacy_update, legacy_get_all),
+        ("slotted store", live_status_manager.update_live_status, live_status_manager.get_all_live_statuses),
+    )
+    for label, update, _ in stores:
+        print(f"{label:>16}: {update_cost_us(update):.2f} us per update (single thread)")
+
+    print(f"{CAMERAS} writer threads at {FPS} fps, {READERS} reader threads, {DURATION_SECONDS:.0f} s each")
+    for label, update, get_all in stores:
+        updates_per_s, reads_per_s, torn = run(update, get_all)
+        print(f"{label:>16}: {updates_per_s:>10,.0f} updates/s  {reads_per_s:>9,.0f} snapshots/s  torn statuses: {torn}")
+
+    # Snapshots are shared until the next change
+    assert live_status_manager.snapshot() is live_status_manager.snapshot()
+
+    settings.LIVE_STATUS_SHM_NAME = f"sf_bench_live_{mp.current_process().pid}"
+    try:
+        for camera_id in range(1, CAMERAS + 1):
+            live_status_manager.update_live_status(camera_id, camera_id, 0.1)
+        updates_per_s, reads_per_s, torn = run(live_status_manager.update_live_status, live_status_manager.get_all_live_statuses)
+        print(f"{'shared memory':>16}: {updates_per_s:>10,.0f} updates/s  {reads_per_s:>9,.0f} snapshots/s  torn statuses: {torn}")
+        result_queue = mp.get_context("spawn").Queue()
+        process = mp.get_context("spawn").Process(target=read_from_other_process, args=(settings.LIVE_STATUS_SHM_NAME, result_queue))
+        process.start()
+        seen = result_queue.get(timeout=30)
+        process.join()
+        print(f"Cameras visible from a second process: {seen}/{CAMERAS}")
+        assert seen == CAMERAS
+    finally:
+        live_status_manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
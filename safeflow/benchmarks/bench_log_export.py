@@ -0,0 +1,79 @@
+# benchmarks/bench_log_export.py
+# Peak Python memory and throughput of exporting detection logs: the old prediction_data path
+# (ORM objects + per-row Pydantic validation + one JSON array) vs. the streaming exporter.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_log_export [rows]
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import log as crud_log
+from app.db import models
+from app.db.database import Base, create_engines
+from app.schemas import log as log_schema
+from app.services import log_export
+
+
+def seed(session_factory, n):
+    db = session_factory()
+    now = datetime.datetime.utcnow()
+    for start in range(0, n, 50000):
+        db.execute(insert(models.DetectionLog), [
+            {"camera_id": 1 + i % 8, "area_name": f"Area {i % 8}", "mode": models.CameraMode.GENERAL,
+             "person_count": i % 40, "density": (i % 40) / 20.0, "timestamp": now - datetime.timedelta(seconds=i)}
+            for i in range(start, min(start + 50000, n))
+        ])
+    db.commit()
+    db.close()
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as tmp:
+        writer_engine, reader_engine = create_engines(f"sqlite:///{os.path.join(tmp, 'export.db')}")
+        Base.metadata.create_all(bind=writer_engine)
+        seed(sessionmaker(bind=writer_engine), n)
+        read_factory = sessionmaker(bind=reader_engine)
+
+        def old_path():
+            db = read_factory()
+            try:
+                logs = crud_log.get_logs_filtered(db, limit=n)
+                body = json.dumps([log_schema.DetectionLog.model_validate(log).model_dump(mode="json") for log in logs])
+                return len(body)
+            finally:
+                db.close()
+
+        def streamed(fmt):
+            return lambda: sum(len(chunk) for chunk in log_export.export_logs(fmt, session_factory=read_factory))
+
+        cases = [("prediction_data style", old_path), ("stream ndjson", streamed("ndjson")), ("stream csv", streamed("csv"))]
+        if log_export.pyarrow_available():
+            cases += [("stream parquet", streamed("parquet")), ("stream arrow", streamed("arrow"))]
+        results = [(name, measure(fn)) for name, fn in cases]
+        writer_engine.dispose()
+        reader_engine.dispose()
+
+    print(f"{n} rows")
+    for name, (elapsed, peak, size) in results:
+        print(f"  {name:22s}: {n / elapsed:9.0f} rows/s  peak {peak / 2**20:8.1f} MiB  output {size / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
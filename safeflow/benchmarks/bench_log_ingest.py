@@ -0,0 +1,86 @@
+# benchmarks/bench_log_ingest.py
+# Detection-log ingest throughput: one create_log() commit per row vs. the batched log writer.
+# Uses a throwaway SQLite file so the real database is untouched.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_log_ingest [rows]
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base
+from app.crud import log as crud_log
+from app.schemas import log as log_schema
+from app.services.log_writer import DetectionLogWriter
+
+
+def make_session_factory(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def sample_logs(n):
+    return [
+        log_schema.DetectionLogCreate(camera_id=1 + i % 8, area_name=f"Area {i % 8}", mode=models.CameraMode.GENERAL,
+                                      person_count=i % 40, density=(i % 40) / 20.0)
+        for i in range(n)
+    ]
+
+
+def count_rows(session_factory):
+    db = session_factory()
+    try:
+        return db.query(func.count(models.DetectionLog.id)).scalar()
+    finally:
+        db.close()
+
+
+def bench_per_row(logs, path):
+    engine, session_factory = make_session_factory(path)
+    db = session_factory()
+    started = time.perf_counter()
+    for log in logs:
+        crud_log.create_log(db, log=log)
+    elapsed = time.perf_counter() - started
+    db.close()
+    assert count_rows(session_factory) == len(logs)
+    engine.dispose()
+    return elapsed
+
+
+def bench_writer(logs, path):
+    engine, session_factory = make_session_factory(path)
+    writer = DetectionLogWriter(session_factory=session_factory, max_queue=len(logs) + 1)
+    started = time.perf_counter()
+    enqueue_started = started
+    for log in logs:
+        writer.submit(log)
+    enqueue_elapsed = time.perf_counter() - enqueue_started
+    writer.stop()
+    elapsed = time.perf_counter() - started
+    assert count_rows(session_factory) == len(logs)
+    stats = writer.stats()
+    engine.dispose()
+    return elapsed, enqueue_elapsed, stats
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    logs = sample_logs(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        per_row = bench_per_row(logs, os.path.join(tmp, "per_row.db"))
+        batched, enqueue, stats = bench_writer(logs, os.path.join(tmp, "batched.db"))
+    print(f"{n} rows")
+    print(f"  create_log per row : {per_row:8.3f}s  {n / per_row:10.0f} rows/s")
+    print(f"  batched writer     : {batched:8.3f}s  {n / batched:10.0f} rows/s  "
+          f"(producer enqueue {enqueue * 1e6 / n:.1f}us/row, {stats['batches']} batches, "
+          f"avg {stats['avg_batch_size']:.0f} rows)")
+    print(f"  speedup            : {per_row / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
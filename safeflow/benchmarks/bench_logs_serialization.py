@@ -0,0 +1,81 @@
+# benchmarks/bench_logs_serialization.py
+# Rows/sec of the /api/logs/ read path at limit=100/1000/10000: ORM objects validated per row
+# against log_schema.DetectionLog (what FastAPI's response_model did) vs. column tuples + orjson.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_logs_serialization
+import datetime
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.api.logs import log_rows_response
+from app.crud import log as crud_log
+from app.db import models
+from app.db.database import Base, create_engines
+from app.schemas import log as log_schema
+
+SEED_ROWS = 20000
+LIMITS = (100, 1000, 10000)
+REPEATS = 10
+
+
+def seed(session_factory):
+    db = session_factory()
+    now = datetime.datetime.utcnow()
+    db.execute(insert(models.DetectionLog), [
+        {"camera_id": 1 + i % 8, "area_name": f"Area {i % 8}", "mode": models.CameraMode.GENERAL,
+         "person_count": i % 40, "density": (i % 40) / 20.0, "timestamp": now - datetime.timedelta(seconds=i)}
+        for i in range(SEED_ROWS)
+    ])
+    db.commit()
+    db.close()
+
+
+def main():
+    adapter = TypeAdapter(List[log_schema.DetectionLog])
+    with tempfile.TemporaryDirectory() as tmp:
+        writer_engine, reader_engine = create_engines(f"sqlite:///{os.path.join(tmp, 'serialize.db')}")
+        Base.metadata.create_all(bind=writer_engine)
+        seed(sessionmaker(bind=writer_engine))
+        read_factory = sessionmaker(bind=reader_engine)
+
+        def orm_path(limit):
+            db = read_factory()
+            try:
+                logs = crud_log.get_logs_filtered(db, limit=limit)
+                return adapter.dump_json(adapter.validate_python(logs, from_attributes=True))
+            finally:
+                db.close()
+
+        def lean_path(limit):
+            db = read_factory()
+            try:
+                return log_rows_response(crud_log.get_logs_filtered(db, limit=limit, columns_only=True)).body
+            finally:
+                db.close()
+
+        # Same payload from both paths
+        assert json.loads(orm_path(100)) == json.loads(lean_path(100))
+
+        print(f"{SEED_ROWS} rows seeded, mean of {REPEATS} requests")
+        for limit in LIMITS:
+            line = f"  limit={limit:<6d}"
+            for name, fn in (("ORM + Pydantic", orm_path), ("tuples + orjson", lean_path)):
+                fn(limit)
+                started = time.perf_counter()
+                for _ in range(REPEATS):
+                    fn(limit)
+                elapsed = (time.perf_counter() - started) / REPEATS
+                line += f"  {name}: {limit / elapsed:9.0f} rows/s"
+            print(line)
+        writer_engine.dispose()
+        reader_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
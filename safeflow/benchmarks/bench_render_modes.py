@@ -0,0 +1,81 @@
+# benchmarks/bench_render_modes.py
+# Server-side cost per frame of the three camera render modes on a 1080p frame with 40 people:
+#   - annotated: copy + draw boxes/ids/tripwire/status text (the plot() stand-in) + encode;
+#   - raw: encode the untouched frame, boxes go out on the overlay channel;
+#   - headless: no JPEG at all, only the overlay JSON.
+# Also checks that every overlay viewer receives the very same serialized bytes object.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_render_modes
+import asyncio
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.services.frame_publisher import OVERLAY, FramePublisher, parse_variants
+
+FRAMES = 30
+PEOPLE = 40
+VIEWERS = 8
+VARIANTS = parse_variants("full=0:90,medium=640:80")
+
+rng = np.random.default_rng(0)
+BOXES = [[int(x), int(y), int(x) + 80, int(y) + 200, i + 1]
+         for i, (x, y) in enumerate(zip(rng.integers(0, 1800, PEOPLE), rng.integers(0, 860, PEOPLE)))]
+OVERLAY_DATA = {"width": 1920, "height": 1080, "mode": "tripwire", "boxes": BOXES,
+                "tripwires": [[0, 540, 1920, 540]], "crossings": [], "person_count": PEOPLE, "density": 0.0,
+                "entries": 3, "exits": 1, "occupancy": 2, "alert": False, "alert_message": ""}
+
+
+def annotate(frame: np.ndarray) -> np.ndarray:
+    annotated = frame.copy()
+    for x1, y1, x2, y2, track_id in BOXES:
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(annotated, f"id:{track_id} person", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        cv2.circle(annotated, ((x1 + x2) // 2, y2), 4, (0, 0, 255), -1)
+    cv2.line(annotated, (0, 540), (1920, 540), (255, 0, 0), 2)
+    cv2.putText(annotated, f"Count: {PEOPLE}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return annotated
+
+
+def per_frame_ms(fn) -> float:
+    fn() # Warm-up
+    started = time.perf_counter()
+    for _ in range(FRAMES):
+        fn()
+    return (time.perf_counter() - started) * 1000 / FRAMES
+
+
+async def shared_overlay_check(publisher: FramePublisher, frame: np.ndarray) -> bool:
+    waits = [asyncio.create_task(publisher.wait_newer(publisher.seq, OVERLAY, timeout=5)) for _ in range(VIEWERS)]
+    await asyncio.sleep(0.01)
+    publisher.publish_frame(frame, {}, OVERLAY_DATA)
+    parts = [part for _, part, _ in await asyncio.gather(*waits)]
+    return parts[0] is not None and all(part is parts[0] for part in parts)
+
+
+def main():
+    frame = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (0, 0), 3) # Compresses closer to a real camera frame than pure noise
+
+    publisher = FramePublisher(VARIANTS)
+    publisher.subscribe("medium")
+    for _ in range(VIEWERS):
+        publisher.subscribe(OVERLAY)
+
+    annotated = per_frame_ms(lambda: publisher.publish_frame(annotate(frame), {}))
+    raw = per_frame_ms(lambda: publisher.publish_frame(frame, {}, OVERLAY_DATA))
+    headless = per_frame_ms(lambda: publisher.publish_frame(None, {}, OVERLAY_DATA))
+    overlay_size = len(publisher.parts[OVERLAY])
+    print(f"annotated: {annotated:.2f} ms/frame (draw + encode)")
+    print(f"raw:       {raw:.2f} ms/frame (encode + overlay JSON, {overlay_size} bytes)")
+    print(f"headless:  {headless:.3f} ms/frame (overlay JSON only, {annotated / headless:.0f}x less than annotated)")
+
+    shared = asyncio.run(shared_overlay_check(publisher, frame))
+    print(f"All {VIEWERS} overlay viewers got the same bytes object: {shared}")
+    if not shared or not headless < raw < annotated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
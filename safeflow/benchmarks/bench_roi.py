@@ -0,0 +1,75 @@
+# benchmarks/bench_roi.py
+# Region-of-interest support on a 1080p camera:
+#   - detector input size per frame (what the YOLO compute scales with) for typical ROI layouts:
+#     whole frame, ROI crop letterboxed at the default predict size, and ROI crop at the
+#     full-frame scale (roi.detection_input(), what the pipelines use);
+#   - RegionSet.contains() for 60 people x 3 polygons against a cv2.pointPolygonTest loop,
+#     checked to agree on every point.
+# The YOLO model itself is not run here. Run from the safeflow/ directory:
+#   python -m benchmarks.bench_roi
+import math
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.services import roi
+
+WIDTH, HEIGHT = 1920, 1080
+LAYOUTS = {
+    "road camera, platform in lower half": [{"name": "Platform", "points": [[0, 560], [1920, 560], [1920, 1080], [0, 1080]]}],
+    "sky above, plaza in lower third": [{"name": "Plaza", "points": [[200, 760], [1700, 740], [1900, 1070], [40, 1075]]}],
+    "two gates": [{"name": "Gate A", "points": [[300, 500], [700, 480], [720, 900], [280, 920]], "area_sq_meters": 12},
+                  {"name": "Gate B", "points": [[900, 500], [1250, 520], [1240, 900], [880, 880]], "area_sq_meters": 10}],
+}
+
+
+def letterboxed_pixels(width: int, height: int, imgsz: int) -> int:
+    # ultralytics rect letterbox: longest side scaled to imgsz, the other padded to a multiple of 32
+    scale = imgsz / max(width, height)
+    new_w, new_h = round(width * scale), round(height * scale)
+    return math.ceil(new_w / 32) * 32 * math.ceil(new_h / 32) * 32
+
+
+def main():
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    full = letterboxed_pixels(WIDTH, HEIGHT, roi.FULL_FRAME_IMGSZ)
+    print(f"Whole frame: {full} detector input pixels")
+    ok = True
+    for label, regions in LAYOUTS.items():
+        image, box, imgsz = roi.detection_input(frame, roi.RegionSet(regions))
+        crop_h, crop_w = image.shape[:2]
+        naive = letterboxed_pixels(crop_w, crop_h, roi.FULL_FRAME_IMGSZ)
+        scaled = letterboxed_pixels(crop_w, crop_h, imgsz)
+        print(f"  {label}: crop {crop_w}x{crop_h}, default imgsz {naive} px ({naive / full:.2f}x), "
+              f"imgsz {imgsz} {scaled} px ({scaled / full:.2f}x)")
+        ok &= scaled < full
+
+    rng = np.random.default_rng(0)
+    regions = roi.RegionSet([LAYOUTS["two gates"][0], LAYOUTS["two gates"][1], LAYOUTS["sky above, plaza in lower third"][0]])
+    points = rng.uniform((0, 0), (WIDTH, HEIGHT), (60, 2))
+    contours = [polygon.astype(np.float32).reshape(-1, 1, 2) for polygon in regions.polygons]
+
+    def loop():
+        return np.array([[cv2.pointPolygonTest(contour, (float(px), float(py)), False) > 0 for contour in contours]
+                         for px, py in points])
+
+    runs = 2000
+    started = time.perf_counter()
+    for _ in range(runs):
+        vectorized = regions.contains(points)
+    vectorized_us = (time.perf_counter() - started) * 1e6 / runs
+    started = time.perf_counter()
+    for _ in range(runs):
+        reference = loop()
+    loop_us = (time.perf_counter() - started) * 1e6 / runs
+    same = bool((vectorized == reference).all())
+    print(f"Region membership, 60 people x 3 regions: {vectorized_us:.0f} us vectorized, {loop_us:.0f} us per-point loop; "
+          f"same answers: {same}")
+    if not (ok and same):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# benchmarks/bench_rolling_metrics.py
+# Cost of RollingMetrics.add() per frame at 30 fps with the default 10/60/300 s windows
+# (correctness against a brute-force recomputation is in tests/test_rolling_metrics.py).
+# Run from the safeflow/ directory:  python -m benchmarks.bench_rolling_metrics
+import time
+
+from app.services.rolling_metrics import RollingMetrics
+
+TIMED_ADDS = 500000
+
+
+def main():
+    metrics = RollingMetrics((10, 60, 300))
+    timestamp = 1_700_000_000.0
+    started = time.perf_counter()
+    for i in range(TIMED_ADDS):
+        timestamp += 1 / 30
+        metrics.add(timestamp, i % 40, i % 2)
+    print(f"add(): {(time.perf_counter() - started) / TIMED_ADDS * 1e6:.2f} us per sample; "
+          f"ring size stays {metrics.size} buckets per series")
+
+
+if __name__ == "__main__":
+    main()
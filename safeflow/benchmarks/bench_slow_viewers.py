@@ -0,0 +1,78 @@
+# benchmarks/bench_slow_viewers.py
+# A camera loop publishing at CAMERA_FPS while viewers consume FramePublisher.frames():
+#   - fast: takes every frame at once;
+#   - slow: a bad mobile link, each part takes SLOW_SEND_SECONDS to go out;
+#   - capped: asks for CAPPED_FPS.
+# The consumer's await stands in for the server waiting on the client's socket. Reports the
+# camera loop's rate without and with viewers, and per viewer the frames sent/dropped/capped
+# and the age of the frames it got. Run from the safeflow/ directory:
+#   python -m benchmarks.bench_slow_viewers
+import asyncio
+import sys
+import threading
+import time
+
+import numpy as np
+
+from app.services.frame_publisher import FramePublisher, parse_variants
+
+CAMERA_FPS = 30
+SECONDS = 4.0
+SLOW_SEND_SECONDS = 0.25
+CAPPED_FPS = 5
+
+
+def run_camera(publisher: FramePublisher, stop: threading.Event, published: list):
+    frame = np.random.default_rng(0).integers(0, 255, (360, 640, 3), dtype=np.uint8)
+    next_frame = time.monotonic()
+    while not stop.is_set():
+        publisher.publish_frame(frame, {"timestamp": time.time()})
+        published[0] += 1
+        next_frame += 1.0 / CAMERA_FPS
+        time.sleep(max(0.0, next_frame - time.monotonic())) # Capture + inference stand-in
+
+
+async def viewer(publisher: FramePublisher, subscriber, send_seconds: float, stop: threading.Event):
+    async for _ in publisher.frames(subscriber, stop.is_set, timeout=0.2):
+        if send_seconds:
+            await asyncio.sleep(send_seconds)
+
+
+def camera_rate(publisher: FramePublisher, viewers=()) -> float:
+    stop = threading.Event()
+    published = [0]
+    camera = threading.Thread(target=run_camera, args=(publisher, stop, published))
+
+    async def run():
+        tasks = [asyncio.create_task(viewer(publisher, subscriber, send_seconds, stop)) for subscriber, send_seconds in viewers]
+        camera.start()
+        await asyncio.sleep(SECONDS)
+        stop.set()
+        await asyncio.gather(*tasks)
+    asyncio.run(run())
+    camera.join()
+    return published[0] / SECONDS
+
+
+def main():
+    variants = parse_variants("thumb=320:70")
+    alone = camera_rate(FramePublisher(variants))
+    publisher = FramePublisher(variants)
+    fast = publisher.subscribe("thumb", client="fast")
+    slow = publisher.subscribe("thumb", client="slow")
+    capped = publisher.subscribe("thumb", max_fps=CAPPED_FPS, client="capped")
+    watched = camera_rate(publisher, [(fast, 0.0), (slow, SLOW_SEND_SECONDS), (capped, 0.0)])
+    print(f"Camera loop: {alone:.1f} fps unwatched, {watched:.1f} fps with a fast, a slow and a capped viewer")
+    for subscriber in (fast, slow, capped):
+        stats = subscriber.as_dict()
+        print(f"  {stats['client']:>6}: sent {stats['sent']:3d} ({stats['sent'] / SECONDS:4.1f} fps), dropped {stats['dropped']:3d}, "
+              f"capped {stats['capped']:3d}, frame age avg {stats['avg_latency_ms']:.1f} ms / max {stats['max_latency_ms']:.1f} ms")
+
+    ok = watched >= alone * 0.95 and slow.dropped > 0 and slow.max_latency_seconds < 1.0 / CAMERA_FPS * 2 \
+        and abs(capped.sent / SECONDS - CAPPED_FPS) <= 1.5 and fast.dropped <= 2
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
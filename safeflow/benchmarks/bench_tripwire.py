@@ -0,0 +1,70 @@
+# benchmarks/bench_tripwire.py
+# Per-frame cost of tripwire crossing detection at 10/100/1000 tracks.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_tripwire
+import time
+import warnings
+import numpy as np
+
+from app.services.tripwire import TripwireSet, update_cross_status
+
+
+def legacy_point_segment_distance(p, a, b):
+    if np.all(a == b):
+        return np.linalg.norm(p - a)
+    d = np.divide(b - a, np.linalg.norm(b - a))
+    s = np.dot(a - p, d)
+    t = np.dot(p - b, d)
+    h = np.maximum.reduce([s, t, 0])
+    c = np.cross(p - a, d)
+    return np.hypot(h, np.abs(c))
+
+
+def legacy_check_line_crossing(centroid, prev_centroid, line_p1, line_p2):
+    line_vec = np.array(line_p2) - np.array(line_p1)
+    prev_side = np.cross(line_vec, prev_centroid - np.array(line_p1))
+    curr_side = np.cross(line_vec, centroid - np.array(line_p1))
+    if np.sign(prev_side) != np.sign(curr_side) and np.sign(prev_side) != 0 and np.sign(curr_side) != 0:
+        if legacy_point_segment_distance(centroid, np.array(line_p1), np.array(line_p2)) < 10:
+            return 1 if curr_side > 0 else -1
+    return 0
+
+
+def legacy_frame(prev, curr, lines):
+    """The pre-vectorization per-person loop (one line at a time)."""
+    for p1x, p1y, p2x, p2y in lines:
+        p1, p2 = (p1x, p1y), (p2x, p2y)
+        for prev_c, curr_c in zip(prev, curr):
+            if legacy_check_line_crossing(curr_c, prev_c, p1, p2) == 0:
+                legacy_point_segment_distance(curr_c, np.array(p1), np.array(p2))
+
+
+def vectorized_frame(tripwires, prev, curr, status):
+    directions, distances = tripwires.evaluate(prev, curr)
+    return update_cross_status(directions, distances, status)
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6 # microseconds per frame
+
+
+def main():
+    warnings.filterwarnings("ignore", category=DeprecationWarning) # np.cross on 2-vectors in the legacy path
+    rng = np.random.default_rng(0)
+    lines = [(100, 360, 1180, 360), (640, 50, 640, 670)]
+    tripwires = TripwireSet(lines)
+    print(f"{'tracks':>7} {'lines':>5} {'legacy us/frame':>16} {'vectorized us/frame':>20} {'speedup':>8}")
+    for n_tracks in (10, 100, 1000):
+        prev = rng.uniform(0, [1280, 720], size=(n_tracks, 2))
+        curr = prev + rng.normal(0, 15, size=(n_tracks, 2))
+        status = np.zeros((n_tracks, len(lines)), dtype=np.int8)
+        repeat = max(5, 2000 // n_tracks)
+        legacy_us = timeit(lambda: legacy_frame(prev, curr, lines), repeat)
+        vector_us = timeit(lambda: vectorized_frame(tripwires, prev, curr, status), repeat * 10)
+        print(f"{n_tracks:>7} {len(lines):>5} {legacy_us:>16.1f} {vector_us:>20.1f} {legacy_us / vector_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
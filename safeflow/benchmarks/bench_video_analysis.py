@@ -0,0 +1,80 @@
+# benchmarks/bench_video_analysis.py
+# Decode side of the offline analysis jobs on a synthetic 720p file:
+#   - one sequential pass over every frame (what the live generate_frames loop would do);
+#   - the job layout: whole-second chunks decoded by ANALYSIS_WORKER_PROCESSES spawned
+#     processes, sampling ANALYSIS_SAMPLE_FPS frames per video second (with warm-up).
+# Detection itself needs the YOLO model and is not timed here; the sampled frames are what
+# it would get. Checks that the chunks sample exactly the frames one pass would (each one
+# counted once) and reports the workers' peak RSS against the file size.
+# Run from the safeflow/ directory:  python -m benchmarks.bench_video_analysis
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services import video_analysis
+
+SECONDS = 120
+FPS = 25
+SIZE = (1280, 720)
+
+
+def write_video(path: str):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, SIZE)
+    y, x = np.mgrid[0:SIZE[1], 0:SIZE[0]]
+    background = np.stack([(x / 5) % 256, (y / 3) % 256, ((x + y) / 7) % 256], axis=-1).astype(np.uint8)
+    for i in range(SECONDS * FPS):
+        frame = background.copy()
+        for person in range(12): # Moving boxes so frames differ like a real scene
+            px = (i * (person + 3) + person * 97) % (SIZE[0] - 60)
+            cv2.rectangle(frame, (px, 80 + person * 50), (px + 50, 200 + person * 40), (0, 200, 0), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def sampled_indexes(path, start, end, step, warmup):
+    # Like analyze_chunk: warm-up frames are decoded but belong to the previous chunk
+    return [index for index, _ in video_analysis.iter_chunk_frames(path, start, end, step, warmup) if index >= start]
+
+
+def main():
+    workers = settings.ANALYSIS_WORKER_PROCESSES
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.mp4")
+        write_video(path)
+        fps, frame_count = video_analysis.probe(path)
+        step = video_analysis.sample_step(fps, settings.ANALYSIS_SAMPLE_FPS)
+        warmup = int(settings.ANALYSIS_WARMUP_SECONDS * fps)
+        print(f"{SECONDS} s of {SIZE[0]}x{SIZE[1]} @ {fps:.0f} fps ({frame_count} frames, {os.path.getsize(path) / 1e6:.1f} MB); "
+              f"{workers} workers, 1 in {step} frames sampled, {settings.ANALYSIS_CHUNK_SECONDS:.0f} s chunks")
+
+        started = time.perf_counter()
+        single = [index for index, _ in video_analysis.iter_chunk_frames(path, 0, frame_count, 1)]
+        sequential = time.perf_counter() - started
+        print(f"Sequential, every frame: {sequential:.1f} s ({SECONDS / sequential:.1f}x real time)")
+
+        chunks = video_analysis.plan_chunks(frame_count, fps, settings.ANALYSIS_CHUNK_SECONDS)
+        started = time.perf_counter()
+        with ProcessPoolExecutor(workers, mp_context=video_analysis._ctx) as pool:
+            parts = list(pool.map(sampled_indexes, *zip(*[(path, start, end, step, warmup) for start, end in chunks])))
+        chunked = time.perf_counter() - started
+        merged = [index for part in parts for index in part]
+        expected = [index for index in single if index % step == 0]
+        print(f"Chunked job layout ({len(chunks)} chunks): {chunked:.1f} s ({SECONDS / chunked:.1f}x real time, "
+              f"{sequential / chunked:.1f}x the sequential pass); {len(merged)} frames to the detector")
+
+    peak_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    same = merged == expected and len(single) == frame_count
+    print(f"Chunks sample the same frames as one pass, each once: {same}; worker peak RSS {peak_mb:.0f} MB")
+    if not same or chunked >= sequential:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
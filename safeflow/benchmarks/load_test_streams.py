@@ -0,0 +1,79 @@
+# benchmarks/load_test_streams.py
+# API latency with and without open MJPEG streams, against a running server.
+#   python -m benchmarks.load_test_streams --base http://localhost:8000 --camera 1 --streams 16
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+def login(base, email, password):
+    data = urllib.parse.urlencode({"username": email, "password": password}).encode()
+    with urllib.request.urlopen(f"{base}/api/auth/token", data=data) as resp:
+        return json.load(resp)["access_token"]
+
+
+def measure(base, token, path, n):
+    latencies = []
+    for _ in range(n):
+        req = urllib.request.Request(f"{base}{path}", headers={"Authorization": f"Bearer {token}"})
+        start = time.perf_counter()
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "max_ms": latencies[-1],
+    }
+
+
+def stream_reader(base, camera_id, stop, counters, idx):
+    parsed = urllib.parse.urlparse(base)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    conn.request("GET", f"/api/stream/video_feed/{camera_id}")
+    resp = conn.getresponse()
+    while not stop.is_set():
+        chunk = resp.read(64 * 1024)
+        if not chunk:
+            break
+        counters[idx] += chunk.count(b"--frame")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", default="http://localhost:8000")
+    parser.add_argument("--camera", type=int, default=1)
+    parser.add_argument("--streams", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--path", default="/api/cameras/")
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default="adminpassword")
+    args = parser.parse_args()
+
+    token = login(args.base, args.email, args.password)
+    print("baseline (no streams):", measure(args.base, token, args.path, args.requests))
+
+    stop = threading.Event()
+    counters = [0] * args.streams
+    readers = [threading.Thread(target=stream_reader, args=(args.base, args.camera, stop, counters, i), daemon=True)
+               for i in range(args.streams)]
+    for reader in readers:
+        reader.start()
+    time.sleep(3) # Let the worker warm up
+    started = time.perf_counter()
+    frames_before = sum(counters)
+    print(f"with {args.streams} streams:", measure(args.base, token, args.path, args.requests))
+    elapsed = time.perf_counter() - started
+    print(f"streams delivered {(sum(counters) - frames_before) / elapsed:.1f} frames/s in total")
+    stop.set()
+
+
+if __name__ == "__main__":
+    main()
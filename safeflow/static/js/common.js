@@ -43,6 +43,138 @@ async function fetchWithAuth(url, options = {}) {
     return response;
 }
 
+// Live camera statuses pushed by the server: one snapshot, then only changed fields.
+// Keeps the merged { camera_id: status } map and calls onChange(statuses, changedIds) on every message.
+// Uses a WebSocket, falls back to Server-Sent Events, and reconnects (with a fresh snapshot) on loss.
+function subscribeLiveStatuses(onChange) {
+    const statuses = {};
+    let socket = null, source = null, retryDelay = 1000, closed = false, useSse = !('WebSocket' in window);
+
+    function handleMessage(raw) {
+        const message = JSON.parse(raw);
+        if (message.type === 'keepalive') return;
+        retryDelay = 1000;
+        if (message.type === 'snapshot') {
+            for (const camId in statuses) delete statuses[camId];
+        }
+        const changedIds = Object.keys(message.cameras || {});
+        changedIds.forEach(camId => { statuses[camId] = { ...(statuses[camId] || {}), ...message.cameras[camId] }; });
+        (message.removed || []).forEach(camId => { delete statuses[camId]; changedIds.push(String(camId)); });
+        onChange(statuses, changedIds);
+    }
+
+    function reconnect() {
+        if (closed) return;
+        setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+    }
+
+    function connect() {
+        const token = getToken();
+        if (!token || closed) return;
+        if (useSse) {
+            source = new EventSource(`${API_BASE_URL}/cameras/live_statuses/events?token=${encodeURIComponent(token)}`);
+            source.onmessage = (event) => handleMessage(event.data);
+            source.onerror = () => { source.close(); reconnect(); };
+            return;
+        }
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        let opened = false;
+        socket = new WebSocket(`${scheme}://${window.location.host}${API_BASE_URL}/cameras/live_statuses/ws?token=${encodeURIComponent(token)}`);
+        socket.onopen = () => { opened = true; };
+        socket.onmessage = (event) => handleMessage(event.data);
+        socket.onclose = () => {
+            if (!opened) useSse = true; // WebSockets blocked (e.g. by a proxy): try SSE instead
+            reconnect();
+        };
+    }
+
+    connect();
+    return {
+        statuses,
+        close() {
+            closed = true;
+            if (socket) socket.close();
+            if (source) source.close();
+        },
+    };
+}
+
+// Per-frame overlay metadata (boxes, track ids, tripwires, counts) of one camera, for cameras
+// whose server-side render mode is "raw" or "headless". Reconnects with backoff; returns {close()}.
+function subscribeOverlay(cameraId, onOverlay, fps = 0) {
+    let socket = null, retryDelay = 1000, closed = false;
+    const decoder = new TextDecoder();
+
+    function connect() {
+        const token = getToken();
+        if (!token || closed) return;
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        socket = new WebSocket(`${scheme}://${window.location.host}${API_BASE_URL}/stream/overlay/${cameraId}/ws?token=${encodeURIComponent(token)}&fps=${fps}`);
+        socket.binaryType = 'arraybuffer';
+        socket.onmessage = (event) => {
+            retryDelay = 1000;
+            onOverlay(JSON.parse(typeof event.data === 'string' ? event.data : decoder.decode(event.data)));
+        };
+        socket.onclose = () => {
+            if (closed) return;
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        };
+    }
+
+    connect();
+    return {
+        close() {
+            closed = true;
+            if (socket) socket.close();
+        },
+    };
+}
+
+// Draws an overlay message onto a canvas laid over an <img> with object-fit: contain
+// (or over nothing, for headless cameras), scaled from frame to canvas pixels.
+function drawOverlay(canvas, overlay) {
+    const rect = canvas.getBoundingClientRect();
+    if (canvas.width !== Math.round(rect.width) || canvas.height !== Math.round(rect.height)) {
+        canvas.width = Math.round(rect.width); canvas.height = Math.round(rect.height);
+    }
+    const ctx = canvas.getContext('2d');
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    if (!overlay.width || !overlay.height) return;
+    const scale = Math.min(canvas.width / overlay.width, canvas.height / overlay.height);
+    const offsetX = (canvas.width - overlay.width * scale) / 2, offsetY = (canvas.height - overlay.height * scale) / 2;
+    const x = (v) => offsetX + v * scale, y = (v) => offsetY + v * scale;
+    ctx.lineWidth = 2; ctx.font = '12px sans-serif';
+    (overlay.regions || []).forEach(region => {
+        ctx.strokeStyle = '#ffff00'; ctx.fillStyle = '#ffff00';
+        ctx.beginPath();
+        region.points.forEach(([px, py], i) => i ? ctx.lineTo(x(px), y(py)) : ctx.moveTo(x(px), y(py)));
+        ctx.closePath(); ctx.stroke();
+        const [lx, ly] = region.points.reduce(([mx, my], [px, py]) => [Math.min(mx, px), Math.min(my, py)], [Infinity, Infinity]);
+        const density = region.density !== null ? ` (${region.density.toFixed(2)} p/m2)` : '';
+        ctx.fillText(`${region.name}: ${region.person_count}${density}`, x(lx) + 4, y(ly) + 14);
+    });
+    overlay.boxes.forEach(([x1, y1, x2, y2, id]) => {
+        ctx.strokeStyle = '#ff3838'; ctx.strokeRect(x(x1), y(y1), (x2 - x1) * scale, (y2 - y1) * scale);
+        if (id >= 0) { ctx.fillStyle = '#ff3838'; ctx.fillText(`id ${id}`, x(x1) + 2, y(y1) - 3); }
+    });
+    const segment = (x1, y1, x2, y2, color) => {
+        ctx.strokeStyle = color; ctx.beginPath(); ctx.moveTo(x(x1), y(y1)); ctx.lineTo(x(x2), y(y2)); ctx.stroke();
+    };
+    overlay.tripwires.forEach(([x1, y1, x2, y2]) => segment(x1, y1, x2, y2, '#0000ff'));
+    overlay.crossings.forEach(([x1, y1, x2, y2, dir]) => segment(x1, y1, x2, y2, dir > 0 ? '#00ff00' : '#ff0000'));
+    const lines = overlay.mode === 'tripwire'
+        ? [`In: ${overlay.entries}`, `Out: ${overlay.exits}`, `Occupancy: ${overlay.occupancy}`]
+        : [`Persons: ${overlay.person_count}`, `Density: ${overlay.density.toFixed(2)} p/m2`];
+    if (overlay.alert) lines.push(`ALERT: ${overlay.alert_message}`);
+    ctx.font = '14px sans-serif';
+    lines.forEach((text, i) => {
+        ctx.fillStyle = overlay.alert && i === lines.length - 1 ? '#ff0000' : '#00ff00';
+        ctx.fillText(text, 8, 18 + i * 18);
+    });
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     const logoutButton = document.getElementById('logoutButton');
     const userEmailDisplay = document.getElementById('userEmailDisplay'); // In base.html's nav
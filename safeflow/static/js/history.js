@@ -52,6 +52,7 @@ async function initializeHistoryPage(loggedInUser) {
 
     let currentPage = 1;
     const limit = 20; // Records per page for the table
+    let pageCursors = [null]; // pageCursors[n - 1] is the keyset cursor that fetches page n
 
     async function populateAreaFilter() {
         console.log("--- populateAreaFilter: Attempting to load areas...");
@@ -117,7 +118,7 @@ async function initializeHistoryPage(loggedInUser) {
             data: {
                 labels: chartFormattedData.labels,
                 datasets: [{
-                    label: `Person Count: ${chartFormattedData.areaName || 'Selected Area'}`,
+                    label: `Avg Person Count: ${chartFormattedData.areaName || 'All Areas'}`,
                     data: chartFormattedData.personCounts,
                     borderColor: 'rgb(54, 162, 235)', // Blue
                     backgroundColor: 'rgba(54, 162, 235, 0.2)',
@@ -125,6 +126,15 @@ async function initializeHistoryPage(loggedInUser) {
                     fill: true,
                     pointRadius: 3, // Smaller points
                     pointHoverRadius: 5
+                }, {
+                    label: 'Peak Person Count',
+                    data: chartFormattedData.peakCounts || [],
+                    borderColor: 'rgb(255, 99, 132)', // Red
+                    backgroundColor: 'rgba(255, 99, 132, 0.1)',
+                    tension: 0.2,
+                    fill: false,
+                    pointRadius: 2,
+                    pointHoverRadius: 4
                 }]
             },
             options: {
@@ -170,7 +180,10 @@ async function initializeHistoryPage(loggedInUser) {
         const endDate = endDateFilter ? endDateFilter.value : '';
 
         // Fetch data for the table (paginated)
-        let tableUrl = `${API_BASE_URL}/logs/?skip=${(page - 1) * limit}&limit=${limit}`;
+        if (page === 1) pageCursors = [null]; // Filters may have changed; cursors only hold for one query
+        const cursor = pageCursors[page - 1];
+        let tableUrl = `${API_BASE_URL}/logs/?limit=${limit}`;
+        if (cursor) tableUrl += `&cursor=${encodeURIComponent(cursor)}`;
         if (area) tableUrl += `&area_name=${encodeURIComponent(area)}`;
         if (startDate) tableUrl += `&start_date=${startDate}`;
         if (endDate) tableUrl += `&end_date=${endDate}`;
@@ -184,12 +197,14 @@ async function initializeHistoryPage(loggedInUser) {
                 throw new Error(`Table data fetch failed: ${tableResponse.status}`);
             }
             const logs = await tableResponse.json();
+            const nextCursor = tableResponse.headers.get('X-Next-Cursor');
+            pageCursors[page] = nextCursor;
             console.log("--- fetchHistoryAndChartData: Logs received for table:", logs.length);
             populateHistoryTable(logs);
 
             if (currentPageSpan) currentPageSpan.textContent = `Page: ${page}`;
             if (prevPageButton) prevPageButton.disabled = (page === 1);
-            if (nextPageButton) nextPageButton.disabled = (logs.length < limit);
+            if (nextPageButton) nextPageButton.disabled = !nextCursor; // No cursor: this was the last page
             currentPage = page;
 
         } catch (error) {
@@ -197,12 +212,10 @@ async function initializeHistoryPage(loggedInUser) {
             if (historyTableBody) historyTableBody.innerHTML = `<tr><td colspan="8">Error loading history: ${error.message}</td></tr>`;
         }
 
-        // Fetch data for the chart
-        if (area && chartCanvas) {
-            console.log(`--- fetchHistoryAndChartData: Fetching chart data for area: ${area}`);
-            // Fetch more data for chart, ensure it's sorted by timestamp ascending from backend if possible.
-            // Otherwise, sort on frontend. Max 500 points for performance for now.
-            let chartDataUrl = `${API_BASE_URL}/logs/?area_name=${encodeURIComponent(area)}&limit=500&order_by=timestamp&order_dir=asc`;
+        // Fetch data for the chart: pre-aggregated time buckets, resolution picked by the server for the range
+        if (chartCanvas) {
+            let chartDataUrl = `${API_BASE_URL}/logs/aggregate?max_points=800`;
+            if (area) chartDataUrl += `&area_name=${encodeURIComponent(area)}`;
             if (startDate) chartDataUrl += `&start_date=${startDate}`;
             if (endDate) chartDataUrl += `&end_date=${endDate}`;
 
@@ -214,20 +227,19 @@ async function initializeHistoryPage(loggedInUser) {
                     console.error("--- fetchHistoryAndChartData: Chart data fetch HTTP error:", chartResponse.status, errText);
                     throw new Error(`Chart data fetch failed: ${chartResponse.status}`);
                 }
-                let chartLogs = await chartResponse.json();
-                console.log("--- fetchHistoryAndChartData: Logs received for chart:", chartLogs.length);
-
-                // If backend doesn't sort, sort here (ensure your API supports order_by and order_dir)
-                // If API already sorts ascending, this isn't strictly needed but harmless.
-                chartLogs.sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+                const aggregate = await chartResponse.json();
+                console.log(`--- fetchHistoryAndChartData: ${aggregate.buckets.length} chart buckets at ${aggregate.resolution}`);
 
                 const chartFormattedData = {
-                    labels: chartLogs.map(log => {
-                        const date = new Date(log.timestamp);
+                    labels: aggregate.buckets.map(bucket => {
+                        const date = new Date(bucket.bucket_start + 'Z'); // Buckets are UTC
+                        const day = `${date.toLocaleString('default', { month: 'short' })} ${date.getDate()}`;
+                        if (aggregate.resolution === '1d') return day;
                         // Format: HH:MM (Mon DD)
-                        return `${date.getHours().toString().padStart(2, '0')}:${date.getMinutes().toString().padStart(2, '0')} (${date.toLocaleString('default', { month: 'short' })} ${date.getDate()})`;
+                        return `${date.getHours().toString().padStart(2, '0')}:${date.getMinutes().toString().padStart(2, '0')} (${day})`;
                     }),
-                    personCounts: chartLogs.map(log => log.person_count),
+                    personCounts: aggregate.buckets.map(bucket => Math.round(bucket.person_count_avg * 10) / 10),
+                    peakCounts: aggregate.buckets.map(bucket => bucket.person_count_max),
                     areaName: area
                 };
                 updateChart(chartFormattedData);
@@ -236,9 +248,6 @@ async function initializeHistoryPage(loggedInUser) {
                 console.error('--- fetchHistoryAndChartData: Error fetching/processing data for chart:', error);
                 updateChart(null); // Clear or show error on chart
             }
-        } else if (chartCanvas) {
-            console.log("--- fetchHistoryAndChartData: No area selected for chart, or canvas missing. Clearing chart.");
-            updateChart(null);
         }
     }
 
@@ -309,6 +318,6 @@ async function initializeHistoryPage(loggedInUser) {
     // Initial load
     console.log("--- initializeHistoryPage: Performing initial data load...");
     await populateAreaFilter();
-    await fetchHistoryAndChartData(); // Initial fetch for table, chart will be blank until area selected
+    await fetchHistoryAndChartData(); // Initial fetch for table and chart (all areas, last 24 hours)
     console.log("--- initializeHistoryPage: Initial data load complete.");
 }
\ No newline at end of file
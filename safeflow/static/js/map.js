@@ -169,14 +169,17 @@ function initializeMap(loggedInUser) {
     async function updateLiveCameraStatusesOnMap() {
         console.log("Updating live camera statuses on map...");
         try {
-            // THIS ENDPOINT NEEDS TO BE CREATED ON YOUR BACKEND (/api/cameras/live_statuses/)
-            // It should return data from your live_status_manager
             const response = await fetchWithAuth(`${API_BASE_URL}/cameras/live_statuses/`);
             if (!response.ok) { console.warn("Failed to fetch live camera statuses."); return; }
             const liveStatuses = await response.json(); // Expected format: { camera_id: {is_over_threshold: true/false, person_count: X, ...}, ... }
-            console.log("Live statuses received:", liveStatuses);
+            applyLiveStatusesToMap(liveStatuses, Object.keys(liveStatuses));
+        } catch (error) {
+            console.error("Error updating live camera statuses on map:", error);
+        }
+    }
 
-            for (const camId in liveStatuses) {
+    function applyLiveStatusesToMap(liveStatuses, changedIds) {
+            for (const camId of changedIds) {
                 if (cameraMarkers[camId] && liveStatuses.hasOwnProperty(camId)) {
                     const status = liveStatuses[camId];
                     const marker = cameraMarkers[camId];
@@ -202,9 +205,6 @@ function initializeMap(loggedInUser) {
                     }
                 }
             }
-        } catch (error) {
-            console.error("Error updating live camera statuses on map:", error);
-        }
     }
 
 
@@ -338,7 +338,7 @@ function initializeMap(loggedInUser) {
         
         // Start live status updates after initial load
         await updateLiveCameraStatusesOnMap(); // Initial status update
-        setInterval(updateLiveCameraStatusesOnMap, 15000); // Then update every 15 seconds
+        subscribeLiveStatuses(applyLiveStatusesToMap); // Then changes are pushed as they happen
     }
 
     // Initial Load
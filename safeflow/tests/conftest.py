@@ -0,0 +1,8 @@
+# tests/conftest.py
+import os
+import sys
+
+# Settings require the notification variables (normally from .env); blank ones disable those channels
+for name in ("SMTP_SERVER", "SMTP_USERNAME", "SMTP_PASSWORD", "ALERT_EMAIL_RECEIVER", "TELEGRAM_BOT_TOKEN", "TELEGRAM_CHAT_ID"):
+    os.environ.setdefault(name, "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # safeflow/, where `app` lives
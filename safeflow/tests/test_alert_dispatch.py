@@ -0,0 +1,138 @@
+# tests/test_alert_dispatch.py
+# Alert dispatch against local stand-ins: a minimal SMTP server and a fake Telegram Bot API that
+# fails the first call (502) and rate-limits the second (429 + retry_after). Every alert must be
+# delivered, all emails over one pooled SMTP connection, Telegram after exactly two retries.
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.alert_dispatcher import AlertDispatcher, EmailChannel, TelegramChannel
+
+ALERTS = 10
+SLOW_SMTP_SECONDS = 0.05
+
+
+class StandInSmtpServer:
+    """Just enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, NOOP, RSET, QUIT) for smtplib, no TLS/auth."""
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = []
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        threading.Thread(target=self._run, args=(started,), daemon=True).start()
+        started.wait()
+
+    def _run(self, started):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._session, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        started.set()
+        self.loop.run_forever()
+
+    async def _session(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 stand-in ESMTP\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                writer.write(b"250 stand-in\r\n")
+            elif command == "DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = []
+                while (chunk := await reader.readline()) not in (b".\r\n", b""):
+                    data.append(chunk)
+                await asyncio.sleep(SLOW_SMTP_SECONDS) # A slow mail server
+                self.messages.append(b"".join(data))
+                writer.write(b"250 OK queued\r\n")
+            elif command == "QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else: # MAIL, RCPT, NOOP, RSET
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real API
+    calls = 0
+    delivered = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        FakeTelegramHandler.calls += 1
+        if FakeTelegramHandler.calls == 1:
+            status, body = 502, {"ok": False, "description": "Bad Gateway"}
+        elif FakeTelegramHandler.calls == 2:
+            status, body = 429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 1}}
+        else:
+            FakeTelegramHandler.delivered.append(payload["text"])
+            status, body = 200, {"ok": True, "result": {}}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def smtp():
+    server = StandInSmtpServer()
+    yield server
+    server.loop.call_soon_threadsafe(server.loop.stop)
+
+
+@pytest.fixture
+def telegram_server():
+    FakeTelegramHandler.calls = 0
+    FakeTelegramHandler.delivered = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegramHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def test_all_alerts_delivered_with_pooled_smtp_and_telegram_retries(smtp, telegram_server):
+    email = EmailChannel("127.0.0.1", smtp.port, None, None, "ops@example.com", starttls=False, timeout=5)
+    telegram = TelegramChannel("TOKEN", "42", f"http://127.0.0.1:{telegram_server.server_address[1]}", timeout=5)
+    dispatcher = AlertDispatcher([email, telegram], retry_base_seconds=0.2,
+                                 rates_per_minute={"email": 0, "telegram": 0}, workers={"email": 1, "telegram": 1})
+    results = []
+    try:
+        for i in range(ALERTS):
+            assert dispatcher.submit(f"Alert {i}", f"Crowd over threshold ({i})",
+                                     on_result=lambda ok, error, retryable: results.append(ok))
+        assert dispatcher.drain(timeout=ALERTS * SLOW_SMTP_SECONDS + 30)
+        stats = dispatcher.stats()
+    finally:
+        dispatcher.stop()
+
+    assert len(smtp.messages) == ALERTS
+    assert smtp.connections == 1 # STARTTLS/login once, not per email
+    assert sorted(FakeTelegramHandler.delivered) == sorted(f"Crowd over threshold ({i})" for i in range(ALERTS))
+    assert stats["telegram"]["retried"] == 2 and stats["telegram"]["failed"] == 0
+    assert results.count(True) == 2 * ALERTS # One result per channel and alert
+
+
+def test_unconfigured_channel_reports_failure():
+    dispatcher = AlertDispatcher([EmailChannel(None, 25, None, None, None)])
+    results = []
+    try:
+        dispatcher.submit("Alert", "body", channel="email", on_result=lambda ok, error, retryable: results.append((ok, error)))
+        assert dispatcher.drain(timeout=5)
+    finally:
+        dispatcher.stop()
+    assert results == [(False, "email alerts not configured")]
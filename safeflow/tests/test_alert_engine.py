@@ -0,0 +1,119 @@
+# tests/test_alert_engine.py
+# Alert engine over a throwaway SQLite database; notifications are read back from alert_outbox.
+import threading
+import time
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base, create_engines
+from app.schemas.alert import AlertData
+from app.services.alert_engine import AlertEngine
+from app.services.log_writer import DetectionLogWriter
+
+CAMERAS = 12
+THRESHOLD = 10
+WINDOW_SECONDS = 0.5
+
+
+def alert(camera_id: int, value: float) -> AlertData:
+    return AlertData(camera_id=camera_id, camera_name=f"Cam {camera_id}", area_name=f"Area {camera_id % 3}",
+                     mode=models.CameraMode.GENERAL, message="Crowd threshold exceeded",
+                     current_value=value, threshold_value=THRESHOLD)
+
+
+class Outbox:
+    """The writer plus a reader for subjects queued in alert_outbox since the last read."""
+
+    def __init__(self, tmp_path):
+        writer_engine, _ = create_engines(f"sqlite:///{tmp_path / 'alerts.db'}")
+        Base.metadata.create_all(bind=writer_engine)
+        self.session_factory = sessionmaker(bind=writer_engine)
+        self.writer = DetectionLogWriter(session_factory=self.session_factory, flush_interval_ms=100)
+        self.seen = 0
+
+    def engine(self) -> AlertEngine:
+        return AlertEngine(writer=self.writer, channels=["email"], session_factory=self.session_factory,
+                           window_seconds=WINDOW_SECONDS, dedup_seconds=600, resolve_seconds=120)
+
+    def sent(self):
+        time.sleep(WINDOW_SECONDS * 2) # Let the engine evaluate the last window
+        self.writer.flush()
+        with self.session_factory() as db:
+            rows = db.execute(select(models.AlertOutbox.id, models.AlertOutbox.subject)
+                              .where(models.AlertOutbox.id > self.seen).order_by(models.AlertOutbox.id)).all()
+        if rows:
+            self.seen = rows[-1].id
+        return [row.subject for row in rows]
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(tmp_path)
+    yield outbox
+    outbox.writer.stop()
+
+
+def storm(engine: AlertEngine, threads: int = 4, seconds: float = 0.3):
+    alerts = [alert(camera_id, THRESHOLD + 2) for camera_id in range(1, CAMERAS + 1)]
+    stop = threading.Event()
+
+    def reporter(index):
+        i = index
+        while not stop.is_set():
+            engine.submit(alerts[i % CAMERAS])
+            i += threads
+
+    workers = [threading.Thread(target=reporter, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+
+def test_storm_collapses_into_one_digest(outbox):
+    engine = outbox.engine()
+    try:
+        storm(engine)
+        messages = outbox.sent()
+    finally:
+        engine.stop()
+    assert len(messages) == 1
+    assert "digest" in messages[0] and f"{CAMERAS} alerts" in messages[0]
+
+
+def test_escalation_is_notified_at_once(outbox):
+    engine = outbox.engine()
+    try:
+        engine.submit(alert(1, THRESHOLD + 2))
+        assert len(outbox.sent()) == 1
+        engine.submit(alert(1, THRESHOLD + 2)) # Same severity: deduplicated
+        assert outbox.sent() == []
+        engine.submit(alert(1, THRESHOLD * 2)) # Crosses the critical ratio (1.5x)
+        escalated = outbox.sent()
+    finally:
+        engine.stop()
+    assert len(escalated) == 1 and "ESCALATED CRITICAL" in escalated[0]
+
+
+def test_restart_does_not_renotify_open_incidents(outbox):
+    engine = outbox.engine()
+    try:
+        storm(engine)
+        assert len(outbox.sent()) == 1
+    finally:
+        engine.stop()
+    outbox.writer.flush()
+
+    restarted = outbox.engine()
+    try:
+        for camera_id in range(1, CAMERAS + 1):
+            restarted.submit(alert(camera_id, THRESHOLD + 2))
+        assert len(restarted.active_incidents()) == CAMERAS
+        assert outbox.sent() == []
+    finally:
+        restarted.stop()
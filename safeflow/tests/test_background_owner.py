@@ -0,0 +1,61 @@
+# tests/test_background_owner.py
+# One API process owns the cameras and background services; the others stream the frames it
+# shares in shared memory.
+import os
+from multiprocessing import resource_tracker
+
+import cv2
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import background_owner, frame_publisher, shm_frames
+
+
+def test_only_one_process_holds_the_lock(tmp_path):
+    path = str(tmp_path / "background.lock")
+    owner = background_owner._try_lock(path)
+    assert owner is not None
+    assert background_owner._try_lock(path) is None # A second open file description, as in another process
+    owner.close()
+    successor = background_owner._try_lock(path)
+    assert successor is not None
+    successor.close()
+
+
+@pytest.fixture
+def shared_name(monkeypatch):
+    monkeypatch.setattr(settings, "LIVE_STATUS_SHM_NAME", f"safeflow_test_{os.getpid()}")
+
+
+def test_frames_are_shared_only_while_another_process_reads(shared_name):
+    ring = shm_frames.create(7)
+    reader = shm_frames.attach(7)
+    resource_tracker.register(ring.shm._name, "shared_memory") # attach() dropped it; here the owner is this process
+    try:
+        publisher = frame_publisher.FramePublisher()
+        publisher.shared = ring
+        frame = np.full((48, 64, 3), 128, dtype=np.uint8)
+        overlay = {"boxes": [[1, 2, 30, 40, 5]], "alert": False}
+
+        publisher.publish_frame(frame, {"person_count": 1}, overlay)
+        assert ring.write_seq == 0 # No reader, no viewer: nothing encoded
+
+        reader.mark_read()
+        publisher.publish_frame(frame, {"person_count": np.int64(2)}, overlay)
+        seq, payload = reader.read_latest(0, as_array=False)
+        jpeg, metrics, shared_overlay = shm_frames.unpack(payload)
+        assert seq == 1 and metrics == {"person_count": 2} and shared_overlay == overlay
+        assert cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR).shape == frame.shape
+
+        publisher.publish_frame(None, {"person_count": 3}, overlay) # Headless
+        _, payload = reader.read_latest(seq, as_array=False)
+        assert shm_frames.unpack(payload) == (None, {"person_count": 3}, overlay)
+    finally:
+        reader.close()
+        ring.close()
+    assert shm_frames.attach(7) is None # Unlinked with the owner's ring
+
+
+def test_torn_payload_is_skipped():
+    assert shm_frames.unpack(b"\xff\xff\x00\x00{") is None
@@ -0,0 +1,94 @@
+# tests/test_log_rollup.py
+# The rollup backfill folds raw logs that predate the rollups exactly once: an interrupted run
+# resumes from its high-water mark, and rows the log writer already rolled up are not counted again.
+import datetime
+import os
+import threading
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base, create_engines
+from app.services import log_rollup
+
+RAW_ROWS = 12000
+
+
+def _rows(count, start):
+    return [{"camera_id": 1 + i % 3, "area_name": f"Area {i % 2}", "mode": models.CameraMode.GENERAL,
+             "person_count": i % 7, "density": 0.1, "entry_count": 0, "exit_count": 0,
+             "timestamp": start + datetime.timedelta(seconds=30 * i)} for i in range(count)]
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    writer_engine, reader_engine = create_engines(f"sqlite:///{os.fspath(tmp_path / 'rollup.db')}")
+    Base.metadata.create_all(bind=writer_engine)
+    yield sessionmaker(bind=writer_engine)
+    writer_engine.dispose()
+    reader_engine.dispose()
+
+
+def _rolled_up_samples(session_factory):
+    table = models.DetectionLogRollup
+    with session_factory() as db: # Short sessions: the writer pool has one connection, the backfill needs it
+        return db.execute(select(func.sum(table.samples)).where(table.resolution == "1d", table.camera_id != 0)).scalar() or 0
+
+
+def _state(session_factory):
+    with session_factory() as db:
+        return log_rollup.backfill_state(db)
+
+
+def _run_backfill(session_factory):
+    threads_before = set(threading.enumerate())
+    log_rollup.start_backfill(session_factory)
+    for thread in set(threading.enumerate()) - threads_before:
+        thread.join(timeout=30)
+
+
+def test_interrupted_backfill_resumes_without_double_counting(session_factory, monkeypatch):
+    with session_factory() as db:
+        db.execute(insert(models.DetectionLog), _rows(RAW_ROWS, datetime.datetime(2026, 1, 1)))
+        db.commit()
+
+    apply_rollups = log_rollup.apply_rollups
+    calls = {"n": 0}
+
+    def failing_apply(db, rows):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("interrupted")
+        apply_rollups(db, rows)
+
+    monkeypatch.setattr(log_rollup, "apply_rollups", failing_apply)
+    _run_backfill(session_factory) # Fails on its second chunk
+    monkeypatch.setattr(log_rollup, "apply_rollups", apply_rollups)
+    assert _rolled_up_samples(session_factory) == log_rollup.BACKFILL_CHUNK_ROWS
+
+    # Meanwhile the log writer rolls up new rows as it inserts them; they are above the cutoff
+    fresh = _rows(100, datetime.datetime(2026, 6, 1))
+    with session_factory() as db:
+        db.execute(insert(models.DetectionLog), fresh)
+        apply_rollups(db, fresh)
+        db.commit()
+
+    _run_backfill(session_factory) # Restart: resumes after the first chunk
+    assert _rolled_up_samples(session_factory) == RAW_ROWS + len(fresh)
+    assert _state(session_factory) == (RAW_ROWS, RAW_ROWS)
+
+    _run_backfill(session_factory) # Nothing left to do
+    assert _rolled_up_samples(session_factory) == RAW_ROWS + len(fresh)
+
+
+def test_existing_rollups_without_state_are_taken_as_backfilled(session_factory):
+    rows = _rows(50, datetime.datetime(2026, 1, 1))
+    with session_factory() as db:
+        db.execute(insert(models.DetectionLog), rows)
+        log_rollup.apply_rollups(db, rows)
+        db.commit()
+    _run_backfill(session_factory)
+    assert _rolled_up_samples(session_factory) == 50
+    assert _state(session_factory) == (50, 50)
@@ -0,0 +1,76 @@
+# tests/test_query_plans.py
+# The history queries from app.crud.log, run against a seeded throwaway SQLite database, must be
+# served by an index (EXPLAIN QUERY PLAN): no full table scan and no temporary B-tree sort.
+# Run from the safeflow/ directory:  python -m pytest -q tests
+import datetime
+import os
+
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import log as crud_log
+from app.db import models
+from app.db.database import Base, create_engines
+
+SEED_ROWS = 20000
+TODAY = datetime.date.today()
+CASES = {
+    "latest logs": lambda db: crud_log.get_logs(db),
+    "area only": lambda db: crud_log.get_logs_filtered(db, area_name="Area 3"),
+    "area + date range": lambda db: crud_log.get_logs_filtered(
+        db, area_name="Area 3", start_date=TODAY - datetime.timedelta(days=7), end_date=TODAY),
+    "area + range, oldest first": lambda db: crud_log.get_logs_filtered(
+        db, area_name="Area 3", start_date=TODAY - datetime.timedelta(days=7), end_date=TODAY,
+        order_by="timestamp", order_dir="asc"),
+    "date range only": lambda db: crud_log.get_logs_filtered(
+        db, start_date=TODAY - datetime.timedelta(days=1), end_date=TODAY),
+    "keyset page, area": lambda db: crud_log.get_logs_page(
+        db, area_name="Area 3", cursor=crud_log.encode_cursor(datetime.datetime.utcnow() - datetime.timedelta(days=3), 5000)),
+    "keyset page, oldest first": lambda db: crud_log.get_logs_page(
+        db, order_dir="asc", cursor=crud_log.encode_cursor(datetime.datetime.utcnow() - datetime.timedelta(days=3), 5000)),
+}
+
+
+@pytest.fixture(scope="module")
+def reader_engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    writer_engine, reader_engine = create_engines(f"sqlite:///{os.fspath(path)}")
+    Base.metadata.create_all(bind=writer_engine)
+    now = datetime.datetime.utcnow()
+    with writer_engine.begin() as conn:
+        conn.execute(insert(models.DetectionLog), [
+            {"camera_id": 1 + i % 8, "area_name": f"Area {i % 8}", "mode": models.CameraMode.GENERAL,
+             "person_count": i % 40, "density": (i % 40) / 20.0, "timestamp": now - datetime.timedelta(minutes=i)}
+            for i in range(SEED_ROWS)
+        ])
+    with writer_engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    yield reader_engine
+    writer_engine.dispose()
+    reader_engine.dispose()
+
+
+def _query_plan(engine, run_query):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    db = sessionmaker(bind=engine)()
+    try:
+        run_query(db)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", capture)
+    statement, parameters = next((s, p) for s, p in captured if s.lstrip().upper().startswith("SELECT"))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_history_query_uses_index(reader_engine, name):
+    plan = _query_plan(reader_engine, CASES[name])
+    assert not any(line.startswith("SCAN") and "INDEX" not in line for line in plan), f"full table scan: {plan}"
+    assert not any("TEMP B-TREE" in line for line in plan), f"sort without an index: {plan}"
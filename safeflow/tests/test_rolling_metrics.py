@@ -0,0 +1,50 @@
+# tests/test_rolling_metrics.py
+# RollingMetrics against a brute-force recomputation over the raw samples (random frame gaps,
+# including idle gaps longer than the longest window).
+import random
+
+import pytest
+
+from app.services.rolling_metrics import RollingMetrics
+
+SAMPLES = 20000
+CHECK_EVERY = 250
+WINDOWS = (10, 60, 300)
+
+
+def brute_force(samples, now, window):
+    in_window = [(count, entries) for timestamp, count, entries in samples if int(timestamp) > int(now) - window]
+    counts = [count for count, _ in in_window]
+    return len(counts), (sum(counts) / len(counts) if counts else 0.0), max(counts, default=0), sum(e for _, e in in_window)
+
+
+def test_windows_match_brute_force():
+    rng = random.Random(7)
+    metrics = RollingMetrics(WINDOWS)
+    samples = []
+    now = 1_700_000_000.0
+    for i in range(SAMPLES):
+        now += rng.choice((1 / 30, 1 / 30, 1 / 30, 0.5, 3.0))
+        if rng.random() < 0.0005:
+            now += 400 # Camera paused longer than every window
+        count, entries = rng.randint(0, 40), rng.randint(0, 1)
+        metrics.add(now, count, entries)
+        samples.append((now, count, entries))
+        samples = samples[-20000:] # Enough to cover 300 s at these frame gaps
+        if i % CHECK_EVERY:
+            continue
+        for window in metrics.windows:
+            expected_samples, expected_mean, expected_peak, _ = brute_force(samples, now, window)
+            stats = metrics.window_stats(window, now)
+            assert (stats["samples"], stats["peak"]) == (expected_samples, expected_peak), (i, window)
+            assert stats["mean"] == pytest.approx(expected_mean, abs=1e-9)
+            assert metrics.mean(window) == pytest.approx(expected_mean, abs=1e-9)
+
+
+def test_idle_gap_empties_every_window():
+    metrics = RollingMetrics(WINDOWS)
+    metrics.add(1000.0, 30, 1)
+    metrics.add(1000.0 + max(WINDOWS) + 5, 2, 0)
+    for window in WINDOWS:
+        assert metrics.window_stats(window, 1000.0 + max(WINDOWS) + 5)["samples"] == 1
+        assert metrics.mean(window) == 2